@@ -5,6 +5,9 @@ import time
 import numpy as np
 from pathlib import Path
 
+import latency
+import model_loader
+
 class ASRProcessor:
     def __init__(self, model_dir=None, preloaded_recognizer=None, preloaded_punct=None):
         self.model_dir = model_dir or self._get_default_model_dir()
@@ -15,44 +18,26 @@ class ASRProcessor:
         self.is_running = False
         self.thread = None
         self.sample_rate = 16000
+        self.result_callback = None
+        self.audio_source = None
+        self.feed_frames = 1600
+        self.decode_interval = 0.0
+        self.frames_accepted = 0
+        self.glossary = None
+        self.finished = threading.Event()
         
         if preloaded_recognizer is None:
             self._init_model()
     
     def _get_default_model_dir(self):
-        base_dir = Path(__file__).parent
-        return base_dir / "sherpa-onnx-streaming-zipformer-bilingual-zh-en-2023-02-20"
+        return model_loader.ASR_MODEL_DIR
     
     def _init_model(self):
         try:
-            import sherpa_onnx
-            
-            model_path = Path(self.model_dir)
-            
-            encoder = str(model_path / "encoder-epoch-99-avg-1.int8.onnx")
-            decoder = str(model_path / "decoder-epoch-99-avg-1.int8.onnx")
-            joiner = str(model_path / "joiner-epoch-99-avg-1.int8.onnx")
-            tokens = str(model_path / "tokens.txt")
-            
-            if not all(Path(p).exists() for p in [encoder, decoder, joiner, tokens]):
-                encoder = str(model_path / "encoder-epoch-99-avg-1.onnx")
-                decoder = str(model_path / "decoder-epoch-99-avg-1.onnx")
-                joiner = str(model_path / "joiner-epoch-99-avg-1.onnx")
-            
-            self.recognizer = sherpa_onnx.OnlineRecognizer.from_transducer(
-                encoder=encoder,
-                decoder=decoder,
-                joiner=joiner,
-                tokens=tokens,
-                num_threads=4,
-                sample_rate=16000,
-                feature_dim=80,
-                decoding_method="greedy_search",
-                enable_endpoint_detection=True,
-                rule1_min_trailing_silence=2.4,
-                rule2_min_trailing_silence=1.2,
-                rule3_min_utterance_length=30.0
-            )
+            if Path(self.model_dir) == model_loader.ASR_MODEL_DIR:
+                self.recognizer = model_loader.get_recognizer()
+            else:
+                self.recognizer = model_loader.create_recognizer(self.model_dir)
             
             self._init_punct_model()
             
@@ -65,24 +50,26 @@ class ASRProcessor:
             raise
     
     def _init_punct_model(self):
-        try:
-            import sherpa_onnx
-            
-            base_dir = Path(__file__).parent
-            punct_dir = base_dir / "sherpa-onnx-punct-ct-transformer-zh-en-vocab272727-2024-04-12"
-            punct_model_path = str(punct_dir / "model.onnx")
-            
-            if punct_dir.exists():
-                model_config = sherpa_onnx.OfflinePunctuationModelConfig(
-                    ct_transformer=punct_model_path,
-                    num_threads=2
-                )
-                config = sherpa_onnx.OfflinePunctuationConfig(model=model_config)
-                self.punct_model = sherpa_onnx.OfflinePunctuation(config)
-                print("[ASR] 标点模型加载成功")
-        except Exception as e:
-            print(f"[ASR] 标点模型加载失败 (可选): {e}")
-            self.punct_model = None
+        self.punct_model = model_loader.get_punct_model()
+    
+    def set_audio_source(self, ring_buffer, feed_frames=None):
+        self.audio_source = ring_buffer
+        if feed_frames:
+            self.feed_frames = feed_frames
+    
+    def apply_latency_profile(self, profile):
+        self.feed_frames = profile["feed_frames"]
+        self.decode_interval = profile["decode_interval"]
+    
+    def _next_audio(self, timeout):
+        if self.audio_source is None:
+            return self.audio_queue.get(timeout=timeout)
+        if not self.audio_source.wait(self.feed_frames, timeout=timeout):
+            if self.audio_source.closed:
+                # the source has ended and everything it wrote was accepted
+                return None
+            raise queue.Empty
+        return self.audio_source.peek()
     
     def add_audio(self, audio_data):
         try:
@@ -94,18 +81,45 @@ class ASRProcessor:
         stream = self.recognizer.create_stream()
         last_result = ""
         audio_count = 0
+        last_decode = 0.0
+        pending_capture = None
+        hop_capture = None
+        timing = {}
+        self.frames_accepted = 0
         
         print("[ASR] 开始处理音频流...")
         
         while self.is_running:
             try:
-                audio_data = self.audio_queue.get(timeout=0.2)
+                audio_data = self._next_audio(timeout=0.2)
+                if audio_data is None:
+                    self._finish_stream(stream, timing)
+                    break
                 audio_count += 1
                 
                 if audio_data.dtype != np.float32:
                     audio_data = audio_data.astype(np.float32)
                 
+                capture_time = self.audio_source.capture_time() if self.audio_source is not None else None
                 stream.accept_waveform(self.sample_rate, audio_data)
+                if self.audio_source is not None:
+                    self.audio_source.advance(len(audio_data))
+                self.frames_accepted += len(audio_data)
+                
+                now = latency.now()
+                capture_time = capture_time or now
+                latency.tracker.record("capture→asr_accept(块)", now - capture_time)
+                if pending_capture is None:
+                    pending_capture = capture_time
+                if "capture" not in timing:
+                    timing["capture"] = capture_time
+                    timing["asr_accept"] = now
+                
+                if now - last_decode < self.decode_interval:
+                    continue
+                last_decode = now
+                hop_capture = pending_capture
+                pending_capture = None
                 
                 while self.recognizer.is_ready(stream):
                     self.recognizer.decode_stream(stream)
@@ -117,29 +131,24 @@ class ASRProcessor:
                     text = result.strip()
                     if text:
                         print(f"[ASR] 实时识别: {text}")
-                        self.result_queue.put({
+                        partial_time = latency.now()
+                        latency.tracker.record("capture→partial(块)", partial_time - hop_capture)
+                        timing.setdefault("first_partial", partial_time)
+                        # capture time of the hop that first produced text: "capture" is the
+                        # first chunk after the last endpoint and may be trailing silence
+                        timing.setdefault("speech_start", hop_capture)
+                        self._emit_result({
                             "text": text,
                             "is_final": False
                         })
                 
                 if self.recognizer.is_endpoint(stream):
-                    result = self.recognizer.get_result(stream)
-                    if result and result.strip():
-                        text = result.strip()
-                        if self.punct_model:
-                            try:
-                                text = self.punct_model.add_punctuation(text)
-                            except:
-                                pass
-                        
-                        print(f"[ASR] 最终结果: {text}")
-                        self.result_queue.put({
-                            "text": text,
-                            "is_final": True
-                        })
+                    timing["endpoint"] = latency.now()
+                    self._emit_final(self.recognizer.get_result(stream), timing)
                     
                     self.recognizer.reset(stream)
                     last_result = ""
+                    timing = {}
                 
             except queue.Empty:
                 if self.recognizer.is_ready(stream):
@@ -150,7 +159,9 @@ class ASRProcessor:
                         text = result.strip()
                         if text:
                             print(f"[ASR] 实时识别(空): {text}")
-                            self.result_queue.put({
+                            if hop_capture is not None:
+                                timing.setdefault("speech_start", hop_capture)
+                            self._emit_result({
                                 "text": text,
                                 "is_final": False
                             })
@@ -159,19 +170,75 @@ class ASRProcessor:
                 print(f"[ASR] 处理错误: {e}")
                 import traceback
                 traceback.print_exc()
+        self.finished.set()
+    
+    def _emit_final(self, result, timing):
+        if not result or not result.strip():
+            return
+        text = result.strip()
+        if self.glossary is not None:
+            # hotword correction before punctuation so aliases are not split by it
+            text = self.glossary.correct(text)
+        if self.punct_model:
+            try:
+                text = self.punct_model.add_punctuation(text)
+            except:
+                pass
+            timing["punctuation"] = latency.now()
+        
+        print(f"[ASR] 最终结果: {text}")
+        self._emit_result({
+            "text": text,
+            "is_final": True,
+            "timing": timing
+        })
+    
+    def _finish_stream(self, stream, timing):
+        # a finite source has ended: decode the padded tail and emit what is
+        # left as the last final instead of waiting for an endpoint
+        stream.input_finished()
+        while self.recognizer.is_ready(stream):
+            self.recognizer.decode_stream(stream)
+        timing["endpoint"] = latency.now()
+        self._emit_final(self.recognizer.get_result(stream), timing)
+        print("[ASR] 音频流结束")
+    
+    def wait_finished(self, timeout=None):
+        return self.finished.wait(timeout)
     
     def start(self):
         if self.is_running:
             return
         self.is_running = True
+        self.finished.clear()
         self.thread = threading.Thread(target=self._process_thread, daemon=True)
         self.thread.start()
     
     def stop(self):
         self.is_running = False
+        if self.audio_source is not None:
+            self.audio_source.notify()
         if self.thread:
             self.thread.join(timeout=2)
     
+    def _emit_result(self, result):
+        if self.glossary is not None and not result["is_final"]:
+            # partials get the same correction so speculation can match the final
+            result["text"] = self.glossary.correct(result["text"])
+        if self.result_callback:
+            try:
+                self.result_callback(result)
+            except Exception as e:
+                print(f"[ASR] 结果回调错误: {e}")
+            return
+        self.result_queue.put(result)
+    
+    def set_glossary(self, glossary):
+        self.glossary = glossary
+    
+    def set_result_callback(self, callback):
+        self.result_callback = callback
+    
     def get_result(self, timeout=None):
         try:
             return self.result_queue.get(timeout=timeout)
@@ -1,28 +1,19 @@
-import threading
-import queue
 import numpy as np
 import time
 
+from audio_source import AudioSource
+
 try:
     import pyaudiowpatch as pyaudio
 except ImportError:
     import pyaudio
 
-class AudioCapture:
+class AudioCapture(AudioSource):
     def __init__(self, sample_rate=16000, channels=1, chunk_size=4096):
-        self.target_sample_rate = sample_rate
+        super().__init__(sample_rate=sample_rate, chunk_size=chunk_size)
         self.channels = channels
-        self.chunk_size = chunk_size
-        self.sample_rate = sample_rate
-        self.audio_queue = queue.Queue(maxsize=100)
-        self.is_capturing = False
-        self.is_initialized = False
-        self.init_error = None
         self.pyaudio_instance = None
         self.stream = None
-        self.thread = None
-        self.buffer = []
-        self.buffer_size = 8
         
     def _get_loopback_device(self, p):
         try:
@@ -43,33 +34,8 @@ class AudioCapture:
             print(f"[Audio] 获取设备列表错误: {e}")
             return None
     
-    def _resample(self, audio_data, orig_sr, target_sr):
-        if orig_sr == target_sr:
-            return audio_data
-        ratio = target_sr / orig_sr
-        new_length = int(len(audio_data) * ratio)
-        indices = np.linspace(0, len(audio_data) - 1, new_length)
-        return np.interp(indices, np.arange(len(audio_data)), audio_data)
-    
     def _callback(self, in_data, frame_count, time_info, status):
-        audio_data = np.frombuffer(in_data, dtype=np.float32)
-        
-        if self.sample_rate != self.target_sample_rate:
-            audio_data = self._resample(audio_data, self.sample_rate, self.target_sample_rate)
-        
-        self.buffer.append(audio_data)
-        if len(self.buffer) >= self.buffer_size:
-            combined = np.concatenate(self.buffer)
-            self.buffer = []
-            try:
-                self.audio_queue.put_nowait(combined)
-            except queue.Full:
-                try:
-                    self.audio_queue.get_nowait()
-                    self.audio_queue.put_nowait(combined)
-                except:
-                    pass
-        
+        self._push(np.frombuffer(in_data, dtype=np.float32))
         return (in_data, pyaudio.paContinue)
     
     def _capture_thread(self):
@@ -86,7 +52,7 @@ class AudioCapture:
                 print(f"[Audio] 错误: {self.init_error}")
                 return
             
-            self.sample_rate = int(device.get("defaultSampleRate", 48000))
+            self._set_source_rate(device.get("defaultSampleRate", 48000))
             print(f"[Audio] 使用设备: {device['name']} (index={device['index']}, rate={self.sample_rate})")
             
             print("[Audio] 打开音频流...")
@@ -131,43 +97,3 @@ class AudioCapture:
             except:
                 pass
             self.pyaudio_instance = None
-    
-    def start(self):
-        if self.is_capturing:
-            return
-        self.is_capturing = True
-        self.is_initialized = False
-        self.init_error = None
-        self.thread = threading.Thread(target=self._capture_thread, daemon=True)
-        self.thread.start()
-    
-    def wait_initialized(self, timeout=5.0):
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            if self.is_initialized:
-                return True
-            if self.init_error:
-                return False
-            time.sleep(0.05)
-        self.init_error = "初始化超时"
-        return False
-    
-    def stop(self):
-        self.is_capturing = False
-        self._cleanup()
-        if self.thread:
-            self.thread.join(timeout=2)
-            self.thread = None
-    
-    def get_audio_chunk(self, timeout=None):
-        try:
-            return self.audio_queue.get(timeout=timeout)
-        except queue.Empty:
-            return None
-    
-    def get_status(self):
-        if self.init_error:
-            return {"ok": False, "error": self.init_error}
-        if self.is_initialized:
-            return {"ok": True, "error": None}
-        return {"ok": False, "error": "未初始化"}
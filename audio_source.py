@@ -0,0 +1,199 @@
+import threading
+import time
+import wave
+from pathlib import Path
+import numpy as np
+
+from resampler import StreamingResampler
+from ring_buffer import RingBuffer
+
+class AudioSource:
+    def __init__(self, sample_rate=16000, chunk_size=4096):
+        self.target_sample_rate = sample_rate
+        self.chunk_size = chunk_size
+        self.sample_rate = sample_rate
+        self.ring_buffer = RingBuffer(sample_rate * 10)
+        self.is_capturing = False
+        self.is_initialized = False
+        self.init_error = None
+        self.thread = None
+        self.resampler = None
+
+    def _set_source_rate(self, sample_rate):
+        self.sample_rate = int(sample_rate)
+        if self.sample_rate != self.target_sample_rate:
+            self.resampler = StreamingResampler(self.sample_rate, self.target_sample_rate, block_size=self.chunk_size)
+        else:
+            self.resampler = None
+
+    def _push(self, audio_data):
+        if self.resampler:
+            audio_data = self.resampler.process(audio_data)
+        return self.ring_buffer.write(audio_data)
+
+    def _capture_thread(self):
+        raise NotImplementedError
+
+    def _cleanup(self):
+        pass
+
+    def start(self):
+        if self.is_capturing:
+            return
+        self.is_capturing = True
+        self.is_initialized = False
+        self.init_error = None
+        self.ring_buffer.reset()
+        self.thread = threading.Thread(target=self._capture_thread, daemon=True)
+        self.thread.start()
+
+    def wait_initialized(self, timeout=5.0):
+        start_time = time.time()
+        while time.time() - start_time < timeout:
+            if self.is_initialized:
+                return True
+            if self.init_error:
+                return False
+            time.sleep(0.05)
+        self.init_error = "初始化超时"
+        return False
+
+    def stop(self):
+        self.is_capturing = False
+        self._cleanup()
+        if self.thread:
+            self.thread.join(timeout=2)
+            self.thread = None
+
+    def get_audio_chunk(self, timeout=None):
+        if not self.ring_buffer.wait(timeout=timeout):
+            return None
+        return self.ring_buffer.read()
+
+    def get_stats(self):
+        return self.ring_buffer.get_stats()
+
+    def get_status(self):
+        if self.init_error:
+            return {"ok": False, "error": self.init_error}
+        if self.is_initialized:
+            return {"ok": True, "error": None}
+        return {"ok": False, "error": "未初始化"}
+
+def _decode_pcm(raw, dtype, channels):
+    if dtype == "int16":
+        audio = np.frombuffer(raw, dtype=np.int16).astype(np.float32) / 32768.0
+    elif dtype == "int32":
+        audio = np.frombuffer(raw, dtype=np.int32).astype(np.float32) / 2147483648.0
+    elif dtype == "uint8":
+        audio = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    else:
+        audio = np.frombuffer(raw, dtype=np.float32)
+    if channels > 1:
+        audio = audio[:len(audio) - len(audio) % channels].reshape(-1, channels).mean(axis=1)
+    return audio.astype(np.float32, copy=False)
+
+WAV_DTYPES = {1: "uint8", 2: "int16", 4: "int32"}
+
+class FileAudioSource(AudioSource):
+    # speed=1.0 replays in real time, speed<=0 as fast as the consumer drains the ring.
+    def __init__(self, source, sample_rate=16000, chunk_size=4096, speed=1.0, loop=False,
+                 raw_sample_rate=16000, raw_dtype="int16", raw_channels=1):
+        super().__init__(sample_rate=sample_rate, chunk_size=chunk_size)
+        self.source = source
+        self.speed = speed
+        self.loop = loop
+        self.raw_sample_rate = raw_sample_rate
+        self.raw_dtype = raw_dtype
+        self.raw_channels = raw_channels
+        self.frames_read = 0
+        self.replay_start = 0.0
+        self.finished = threading.Event()
+        self._reader = None
+
+    def _is_wav(self):
+        if isinstance(self.source, (str, Path)):
+            return str(self.source).lower().endswith(".wav")
+        head = self.source.read(4)
+        self.source.seek(-len(head), 1)
+        return head == b"RIFF"
+
+    def _open(self):
+        if self._is_wav():
+            wf = wave.open(str(self.source) if isinstance(self.source, (str, Path)) else self.source, "rb")
+            self._reader = wf
+            dtype = WAV_DTYPES.get(wf.getsampwidth())
+            if dtype is None:
+                raise ValueError(f"不支持的WAV采样位宽: {wf.getsampwidth() * 8}bit")
+            channels = wf.getnchannels()
+            self._set_source_rate(wf.getframerate())
+            return lambda n: _decode_pcm(wf.readframes(n), dtype, channels)
+
+        f = open(self.source, "rb") if isinstance(self.source, (str, Path)) else self.source
+        self._reader = f
+        width = np.dtype(self.raw_dtype).itemsize * self.raw_channels
+        self._set_source_rate(self.raw_sample_rate)
+        return lambda n: _decode_pcm(f.read(n * width), self.raw_dtype, self.raw_channels)
+
+    def _rewind(self):
+        if isinstance(self._reader, wave.Wave_read):
+            self._reader.rewind()
+        else:
+            self._reader.seek(0)
+
+    def _capture_thread(self):
+        try:
+            read_block = self._open()
+            print(f"[Audio] 回放音频: {self.source} (rate={self.sample_rate}, speed={self.speed})")
+            self.frames_read = 0
+            self.is_initialized = True
+
+            self.replay_start = time.perf_counter()
+            while self.is_capturing:
+                block = read_block(self.chunk_size)
+                if len(block) == 0:
+                    if self.loop:
+                        self._rewind()
+                        continue
+                    break
+
+                if self.speed > 0:
+                    delay = self.replay_start + (self.frames_read + len(block)) / self.sample_rate / self.speed - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                else:
+                    needed = len(block) * self.target_sample_rate // self.sample_rate + 1
+                    while self.is_capturing and self.ring_buffer.free() < needed:
+                        time.sleep(0.002)
+
+                self._push(block)
+                self.frames_read += len(block)
+
+            print(f"[Audio] 回放结束: {self.frames_read / self.sample_rate:.1f}s")
+        except Exception as e:
+            print(f"[Audio] 回放错误: {e}")
+            import traceback
+            traceback.print_exc()
+            self.init_error = str(e)
+            self.is_capturing = False
+        finally:
+            self._close_reader()
+            # lets the consumer take the tail that is shorter than its hop
+            self.ring_buffer.close()
+            self.finished.set()
+
+    def _close_reader(self):
+        if self._reader is not None and isinstance(self.source, (str, Path)):
+            try:
+                self._reader.close()
+            except:
+                pass
+        self._reader = None
+
+    def start(self):
+        if not self.is_capturing:
+            self.finished.clear()
+        super().start()
+
+    def wait_finished(self, timeout=None):
+        return self.finished.wait(timeout)
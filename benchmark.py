@@ -0,0 +1,1001 @@
+import argparse
+import os
+import queue
+import random
+import tempfile
+import threading
+import time
+import tracemalloc
+import numpy as np
+
+from asr_processor import ASRProcessor
+from translator import Translator, ContextWindow, create_translator, estimate_tokens
+from speculation import SpeculativeTranslator
+from translation_cache import TranslationCache
+from session_store import SessionStore
+from glossary import Glossary, get_glossary
+import exporter
+from resampler import StreamingResampler
+from ring_buffer import RingBuffer
+from config import LATENCY_PROFILES, load_config, get_latency_profile
+from audio_source import FileAudioSource
+import model_loader
+import latency
+
+class _FakeStream:
+    def __init__(self):
+        self.chunk_id = 0
+
+    def accept_waveform(self, sample_rate, audio_data):
+        self.chunk_id = int(audio_data[-1])
+
+    def input_finished(self):
+        pass
+
+class _FakeRecognizer:
+    def create_stream(self):
+        return _FakeStream()
+
+    def is_ready(self, stream):
+        return False
+
+    def decode_stream(self, stream):
+        pass
+
+    def get_result(self, stream):
+        return f"chunk {stream.chunk_id}"
+
+    def is_endpoint(self, stream):
+        return True
+
+    def reset(self, stream):
+        pass
+
+class _FakeMessage:
+    def __init__(self, content):
+        self.content = content
+
+class _FakeChoice:
+    def __init__(self, content):
+        self.message = _FakeMessage(content)
+
+class _FakeResponse:
+    def __init__(self, content):
+        self.choices = [_FakeChoice(content)]
+
+class _FakeDelta:
+    def __init__(self, content):
+        self.content = content
+
+class _FakeStreamChoice:
+    def __init__(self, content):
+        self.delta = _FakeDelta(content)
+
+class _FakeChunk:
+    def __init__(self, content):
+        self.choices = [_FakeStreamChoice(content)]
+
+class _FakeCompletions:
+    def __init__(self, delay, jitter=0.0, token_delay=0.0, tokens=1):
+        self.delay = delay
+        self.jitter = jitter
+        self.token_delay = token_delay
+        self.tokens = tokens
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self._prefixes = set()
+
+    def _stream(self, content):
+        step = -(-len(content) // self.tokens)
+        for i in range(0, len(content), step):
+            if i:
+                time.sleep(self.token_delay)
+            yield _FakeChunk(content[i:i + step])
+
+    def create(self, model, messages, stream=False, **kwargs):
+        self.calls += 1
+        self.prompt_tokens += sum(estimate_tokens(m["content"]) for m in messages)
+        # provider-style prefix cache: the longest message prefix seen before is free
+        prefix = ()
+        tokens = 0
+        cached = 0
+        for m in messages:
+            prefix += ((m["role"], m["content"]),)
+            tokens += estimate_tokens(m["content"])
+            if prefix in self._prefixes:
+                cached = tokens
+            self._prefixes.add(prefix)
+        self.cached_tokens += cached
+        time.sleep(self.delay + random.uniform(0, self.jitter))
+        content = messages[-1]["content"]
+        if stream:
+            return self._stream(content)
+        time.sleep(self.token_delay * (self.tokens - 1))
+        return _FakeResponse(content)
+
+class _FakeChat:
+    def __init__(self, delay, jitter=0.0, token_delay=0.0, tokens=1):
+        self.completions = _FakeCompletions(delay, jitter, token_delay, tokens)
+
+class _FakeClient:
+    def __init__(self, delay, jitter=0.0, token_delay=0.0, tokens=1):
+        self.chat = _FakeChat(delay, jitter, token_delay, tokens)
+
+class _FlakyCompletions(_FakeCompletions):
+    # a share of requests fails outright and another share hangs in the tail
+    def __init__(self, delay, error_rate, tail_rate, tail_delay, rng):
+        super().__init__(delay)
+        self.error_rate = error_rate
+        self.tail_rate = tail_rate
+        self.tail_delay = tail_delay
+        self.rng = rng
+
+    def create(self, model, messages, stream=False, **kwargs):
+        roll = self.rng.random()
+        if roll < self.error_rate:
+            time.sleep(self.delay)
+            raise RuntimeError("simulated 503")
+        if roll < self.error_rate + self.tail_rate:
+            time.sleep(self.tail_delay)
+        return super().create(model, messages, stream, **kwargs)
+
+class _FlakyClient:
+    def __init__(self, delay, error_rate, tail_rate, tail_delay, seed):
+        self.chat = _FakeChat(delay)
+        self.chat.completions = _FlakyCompletions(delay, error_rate, tail_rate, tail_delay, random.Random(seed))
+
+def _build_pipeline(api_delay):
+    ring = RingBuffer(16000 * 10)
+    asr = ASRProcessor(preloaded_recognizer=_FakeRecognizer())
+    translator = Translator(translate_api_key="bench")
+    translator.translate_client = _FakeClient(api_delay)
+    return ring, asr, translator
+
+def _polling_loop(audio_queue, asr, translator, state):
+    while state["running"]:
+        try:
+            asr.add_audio(audio_queue.get(timeout=0.1))
+        except queue.Empty:
+            pass
+        asr_result = asr.get_result(timeout=0.05)
+        if asr_result and asr_result.get("is_final"):
+            translator.add_text(asr_result["text"])
+        translate_result = translator.get_result(timeout=0.05)
+        if translate_result:
+            state["on_done"](translate_result)
+
+def bench_pipeline(mode, chunks, interval, api_delay):
+    ring, asr, translator = _build_pipeline(api_delay)
+    sent = {}
+    latencies = []
+    done = threading.Event()
+
+    def on_done(result):
+        chunk_id = int(result["original"].split()[-1])
+        latencies.append(time.perf_counter() - sent[chunk_id])
+        if chunk_id == chunks - 1:
+            done.set()
+
+    state = {"running": True, "on_done": on_done}
+    audio_queue = queue.Queue()
+    loop_thread = None
+    if mode == "push":
+        asr.set_audio_source(ring, feed_frames=1600)
+        asr.set_result_callback(lambda r: r.get("is_final") and translator.add_text(r["text"]))
+        translator.set_result_callback(on_done)
+        feed = ring.write
+    else:
+        loop_thread = threading.Thread(target=_polling_loop, args=(audio_queue, asr, translator, state), daemon=True)
+        feed = audio_queue.put
+
+    asr.start()
+    translator.start()
+    if loop_thread:
+        loop_thread.start()
+
+    for i in range(chunks):
+        chunk = np.full(1600, float(i), dtype=np.float32)
+        sent[i] = time.perf_counter()
+        feed(chunk)
+        time.sleep(interval)
+
+    done.wait(timeout=chunks * (interval + api_delay) + 10)
+    state["running"] = False
+    asr.stop()
+    translator.stop()
+    return latencies
+
+def _report(name, latencies):
+    if not latencies:
+        print(f"{name:>10}: 无结果")
+        return
+    arr = np.array(latencies) * 1000
+    print(f"{name:>10}: n={len(arr)} mean={arr.mean():.1f}ms p50={np.percentile(arr, 50):.1f}ms "
+          f"p95={np.percentile(arr, 95):.1f}ms max={arr.max():.1f}ms")
+
+def run_pipeline(args):
+    print(f"[Bench] 管线延迟: chunks={args.chunks}, interval={args.interval}s, api_delay={args.api_delay}s")
+    for mode in ("polling", "push"):
+        _report(mode, bench_pipeline(mode, args.chunks, args.interval, args.api_delay))
+
+def _interp_resample(audio_data, orig_sr, target_sr):
+    ratio = target_sr / orig_sr
+    new_length = int(len(audio_data) * ratio)
+    indices = np.linspace(0, len(audio_data) - 1, new_length)
+    return np.interp(indices, np.arange(len(audio_data)), audio_data)
+
+def bench_resample(orig_sr, block_size, seconds, tone_hz):
+    t = np.arange(int(orig_sr * seconds)) / orig_sr
+    signal = np.sin(2 * np.pi * tone_hz * t).astype(np.float32)
+    blocks = [signal[i:i + block_size] for i in range(0, len(signal) - block_size + 1, block_size)]
+
+    start = time.perf_counter()
+    interp_out = np.concatenate([_interp_resample(b, orig_sr, 16000) for b in blocks])
+    interp_time = time.perf_counter() - start
+
+    resampler = StreamingResampler(orig_sr, 16000, block_size=block_size)
+    start = time.perf_counter()
+    poly_out = np.concatenate([resampler.process(b).copy() for b in blocks])
+    poly_time = time.perf_counter() - start
+
+    audio_seconds = len(blocks) * block_size / orig_sr
+    skip = 1600
+    return {
+        "interp": (interp_time / audio_seconds, np.sqrt(np.mean(interp_out[skip:] ** 2))),
+        "polyphase": (poly_time / audio_seconds, np.sqrt(np.mean(poly_out[skip:] ** 2)))
+    }
+
+def run_resample(args):
+    print(f"[Bench] 重采样: block={args.block_size}, 测试音={args.tone}Hz (高于8kHz时输出即为混叠)")
+    for orig_sr in (48000, 44100):
+        for name, (cost, rms) in bench_resample(orig_sr, args.block_size, args.seconds, args.tone).items():
+            print(f"{orig_sr:>6} {name:>10}: CPU {cost * 1000:.2f}ms/音频秒, 输出RMS={rms:.6f}")
+
+def bench_profile(wav, profile, speed):
+    source = FileAudioSource(wav, chunk_size=profile["chunk_size"], speed=speed)
+    latencies = []
+
+    asr = ASRProcessor(preloaded_recognizer=model_loader.get_recognizer())
+    asr.set_audio_source(source.ring_buffer)
+    asr.apply_latency_profile(profile)
+
+    def on_result(result):
+        if result.get("is_final"):
+            return
+        # playback time of the oldest frame in the hop that produced this partial
+        frame = max(asr.frames_accepted - profile["feed_frames"], 0)
+        latencies.append(time.perf_counter() - (source.replay_start + frame / 16000 / speed))
+
+    asr.set_result_callback(on_result)
+    cpu_start = time.process_time()
+    source.start()
+    source.wait_initialized()
+    asr.start()
+    source.wait_finished()
+    asr.wait_finished(timeout=10)
+    wall = time.perf_counter() - source.replay_start
+    cpu = time.process_time() - cpu_start
+    asr.stop()
+    source.stop()
+    return latencies, cpu / wall
+
+def run_profiles(args):
+    print(f"[Bench] 延迟模式: {args.wav}, speed={args.speed}x")
+    for name, profile in LATENCY_PROFILES.items():
+        latencies, cpu = bench_profile(args.wav, profile, args.speed)
+        _report(name, latencies)
+        print(f"{'':>10}  CPU占用={cpu * 100:.1f}% (单核)")
+
+def _replay_translated(result):
+    timing = result.get("timing")
+    if timing:
+        timing["ui_emit"] = latency.now()
+        latency.tracker.record_timing(timing)
+    print(f"[Replay] 译文: {result['translated']}")
+
+def run_replay(args):
+    config = load_config()
+    source = FileAudioSource(args.source, speed=args.speed, raw_sample_rate=args.raw_rate,
+                             raw_dtype=args.raw_dtype, raw_channels=args.raw_channels)
+    asr = ASRProcessor(preloaded_recognizer=model_loader.get_recognizer(),
+                       preloaded_punct=model_loader.get_punct_model())
+    asr.set_audio_source(source.ring_buffer)
+    asr.apply_latency_profile(get_latency_profile(config.get("latency_profile", "balanced")))
+    if config.get("glossary_enabled", True):
+        asr.set_glossary(get_glossary())
+
+    translator = None
+    if not args.no_translate:
+        translator = create_translator(config)
+        translator.set_result_callback(_replay_translated)
+        translator.start()
+
+    finals = []
+
+    def on_result(result):
+        if not result.get("is_final"):
+            return
+        finals.append(result["text"])
+        if translator:
+            translator.add_text(result["text"], config.get("target_language", "中文"), result.get("timing"))
+
+    asr.set_result_callback(on_result)
+    source.start()
+    if not source.wait_initialized():
+        print(f"[Replay] 音频源失败: {source.get_status()['error']}")
+        return
+    asr.start()
+    # the recognizer flushes the tail shorter than its hop once the source closes the ring
+    source.wait_finished()
+    asr.wait_finished()
+    wall = time.perf_counter() - source.replay_start
+    asr.stop()
+    if translator:
+        # in-flight translations too, not just the queue
+        while not translator.is_idle():
+            time.sleep(0.1)
+        translator.stop()
+    source.stop()
+
+    audio_seconds = source.frames_read / source.sample_rate
+    print(f"[Replay] 音频 {audio_seconds:.1f}s, 用时 {wall:.1f}s ({audio_seconds / wall:.1f}x 实时), "
+          f"最终结果 {len(finals)} 条, 溢出 {source.get_stats()['overruns']} 次")
+    for metric, stats in latency.tracker.summary().items():
+        print(f"[Replay] {metric}: n={stats['count']} p50={stats['p50']:.1f}ms p90={stats['p90']:.1f}ms p99={stats['p99']:.1f}ms")
+    if args.latency_json:
+        latency.tracker.export_json(args.latency_json)
+
+def bench_translate_pool(workers, utterances, api_delay, jitter, endpoint_concurrency):
+    translator = Translator(translate_api_key="bench", workers=workers, endpoint_concurrency=endpoint_concurrency)
+    translator.translate_client = _FakeClient(api_delay, jitter)
+    received = []
+    done = threading.Event()
+
+    def on_result(result):
+        received.append(int(result["original"].split()[-1]))
+        if len(received) == utterances:
+            done.set()
+
+    translator.set_result_callback(on_result)
+    translator.start()
+    start = time.perf_counter()
+    for i in range(utterances):
+        translator.add_text(f"utterance {i}")
+    done.wait(timeout=utterances * (api_delay + jitter) + 10)
+    elapsed = time.perf_counter() - start
+    translator.stop()
+    return elapsed, received == list(range(utterances))
+
+def bench_stream(stream_output, utterances, first_token, token_delay, tokens):
+    translator = Translator(translate_api_key="bench", stream_output=stream_output)
+    translator.translate_client = _FakeClient(first_token, token_delay=token_delay, tokens=tokens)
+    sent = {}
+    first_visible = {}
+    done = threading.Event()
+
+    def on_visible(original, text):
+        first_visible.setdefault(original, time.perf_counter() - sent[original])
+
+    def on_result(result):
+        on_visible(result["original"], result["translated"])
+        if len(first_visible) == utterances:
+            done.set()
+
+    translator.set_delta_callback(on_visible)
+    translator.set_result_callback(on_result)
+    translator.start()
+    for i in range(utterances):
+        text = f"utterance {i} " + "x" * tokens
+        sent[text] = time.perf_counter()
+        translator.add_text(text)
+        done.wait(timeout=first_token + token_delay * tokens + 5)
+        done.clear()
+        if len(first_visible) == utterances:
+            break
+    translator.stop()
+    return list(first_visible.values())
+
+def run_stream(args):
+    print(f"[Bench] 流式翻译: 首token {args.first_token}s, 每token {args.token_delay}s, {args.tokens} tokens")
+    for name, stream_output in (("完整响应", False), ("流式输出", True)):
+        _report(name, bench_stream(stream_output, args.utterances, args.first_token, args.token_delay, args.tokens))
+
+def bench_speculation(enabled, utterances, api_delay, endpoint_silence):
+    translator = Translator(translate_api_key="bench", stream_output=False)
+    translator.translate_client = _FakeClient(api_delay, token_delay=0.01, tokens=5)
+    speculator = SpeculativeTranslator(translator, target_language="中文") if enabled else None
+    finals = {}
+    latencies = []
+    done = threading.Event()
+
+    def on_result(result):
+        latencies.append(time.perf_counter() - finals[result["original"]])
+        if len(latencies) == utterances:
+            done.set()
+
+    translator.set_result_callback(on_result)
+    translator.start()
+    if speculator:
+        speculator.start()
+
+    words = "the quick brown fox jumps over the lazy dog again".split()
+    for i in range(utterances):
+        partial = ""
+        for j, word in enumerate(words):
+            # occasionally the recognizer revises the last word
+            if j % 4 == 3 and speculator:
+                speculator.on_partial((partial + " wrong").strip())
+                time.sleep(0.15)
+            partial = (partial + " " + word).strip()
+            if speculator:
+                speculator.on_partial(f"{partial} {i}")
+            time.sleep(0.15)
+        time.sleep(endpoint_silence)
+        final = f"{partial} {i}."
+        finals[final] = time.perf_counter()
+        speculation = speculator.on_final(final) if speculator else None
+        translator.add_text(final, speculation=speculation)
+
+    done.wait(timeout=utterances * api_delay + 10)
+    stats = speculator.get_stats() if speculator else None
+    if speculator:
+        speculator.stop()
+    translator.stop()
+    return latencies, stats
+
+def run_speculation(args):
+    print(f"[Bench] 预翻译: api_delay={args.api_delay}s, 端点静音={args.endpoint_silence}s")
+    for name, enabled in (("关闭", False), ("开启", True)):
+        latencies, stats = bench_speculation(enabled, args.utterances, args.api_delay, args.endpoint_silence)
+        _report(name, latencies)
+        if stats:
+            print(f"{'':>10}  请求 {stats['requests']} 次, 取消 {stats['cancelled']} 次, 复用 {stats['reused']} 次")
+
+def bench_cache(cache, utterances, phrases, api_delay):
+    # the live path: finals through add_text with the rolling context filling up
+    translator = Translator(translate_api_key="bench", stream_output=False, cache=cache)
+    translator.translate_client = _FakeClient(api_delay)
+    received = []
+    done = threading.Event()
+
+    def on_result(result):
+        received.append(result)
+        if len(received) == utterances:
+            done.set()
+
+    translator.set_result_callback(on_result)
+    translator.start()
+    rng = random.Random(0)
+    start = time.perf_counter()
+    for _ in range(utterances):
+        translator.add_text(f"phrase {rng.randrange(phrases)}")
+    done.wait(timeout=utterances * api_delay + 10)
+    elapsed = time.perf_counter() - start
+    context = len(translator.context) if translator.context is not None else 0
+    translator.stop()
+    return elapsed, context
+
+def run_cache(args):
+    print(f"[Bench] 翻译缓存: {args.utterances} 条, {args.phrases} 种不同句子, api_delay={args.api_delay}s")
+    elapsed, _ = bench_cache(None, args.utterances, args.phrases, args.api_delay)
+    print(f"{'无缓存':>10}  用时 {elapsed:.2f}s")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cache.db")
+        for name in ("冷启动", "重启后"):
+            cache = TranslationCache(path)
+            elapsed, context = bench_cache(cache, args.utterances, args.phrases, args.api_delay)
+            stats = cache.get_stats()
+            print(f"{name:>10}  用时 {elapsed:.2f}s, 内存命中 {stats['memory_hits']}, 磁盘命中 {stats['disk_hits']}, "
+                  f"未命中 {stats['misses']}, 上下文 {context} 句")
+            cache._conn.close()
+
+def bench_batching(batching, utterances, api_delay, workers):
+    translator = Translator(translate_api_key="bench", workers=workers, stream_output=False, batching=batching)
+    client = _FakeClient(api_delay)
+    translator.translate_client = client
+    received = []
+    done = threading.Event()
+
+    def on_result(result):
+        received.append(result["translated"])
+        if len(received) == utterances:
+            done.set()
+
+    translator.set_result_callback(on_result)
+    start = time.perf_counter()
+    for i in range(utterances):
+        translator.add_text(f"this is utterance number {i}.")
+    translator.start()
+    done.wait(timeout=utterances * api_delay + 10)
+    elapsed = time.perf_counter() - start
+    translator.stop()
+    ordered = received == [f"this is utterance number {i}." for i in range(utterances)]
+    return elapsed, client.chat.completions, ordered
+
+def run_batching(args):
+    print(f"[Bench] 批量翻译: {args.utterances} 条积压, api_delay={args.api_delay}s, workers={args.workers}")
+    for name, batching in (("逐条", False), ("批量", True)):
+        elapsed, completions, ordered = bench_batching(batching, args.utterances, args.api_delay, args.workers)
+        print(f"{name:>10}  用时 {elapsed:.2f}s, {args.utterances / elapsed:.1f} 条/秒, 请求 {completions.calls} 次, "
+              f"提示词约 {completions.prompt_tokens} tokens, 顺序{'正确' if ordered else '错误'}")
+
+class _SlidingWindow(ContextWindow):
+    # naive variant for comparison: drops one pair at a time, so the prefix
+    # shifts on every request once the window is full
+    def add(self, source, target, language):
+        with self._lock:
+            self.language = language
+            self._pairs.append((source, target, estimate_tokens(source) + estimate_tokens(target)))
+            while len(self._pairs) > self.max_pairs or sum(p[2] for p in self._pairs) > self.max_tokens:
+                self._pairs.pop(0)
+
+def bench_context(window, utterances):
+    translator = Translator(translate_api_key="bench", stream_output=False, batching=False)
+    client = _FakeClient(0.0)
+    translator.translate_client = client
+    translator.context = window
+    done = threading.Event()
+    received = []
+
+    def on_result(result):
+        received.append(result)
+        if len(received) == utterances:
+            done.set()
+
+    translator.set_result_callback(on_result)
+    translator.start()
+    rng = random.Random(0)
+    for i in range(utterances):
+        # one at a time, as live captions arrive
+        translator.add_text(f"sentence {i} about topic {rng.randrange(50)} with a few more words.")
+        while len(received) <= i and not done.is_set():
+            time.sleep(0.001)
+    done.wait(timeout=10)
+    translator.stop()
+    return client.chat.completions
+
+def run_context(args):
+    print(f"[Bench] 上下文翻译: {args.utterances} 条, 窗口 {args.pairs} 句 / {args.tokens} tokens")
+    setups = (
+        ("无上下文", None),
+        ("逐句滑动", _SlidingWindow(args.pairs, args.tokens)),
+        ("整段淘汰", ContextWindow(args.pairs, args.tokens))
+    )
+    for name, window in setups:
+        completions = bench_context(window, args.utterances)
+        per_request = completions.prompt_tokens / completions.calls
+        ratio = completions.cached_tokens / completions.prompt_tokens * 100
+        uncached = (completions.prompt_tokens - completions.cached_tokens) / completions.calls
+        print(f"{name:>10}  每次提示词 {per_request:.0f} tokens, 前缀缓存命中 {ratio:.1f}%, "
+              f"未命中部分每次 {uncached:.0f} tokens")
+
+def _naive_terms(entries, text):
+    lowered = text.lower()
+    return [e["source"] for e in entries if any(p.lower() in lowered for p in [e["source"]] + e["aliases"])]
+
+def run_glossary(args):
+    rng = random.Random(0)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = ["".join(rng.choice(letters) for _ in range(rng.randint(5, 10))) for _ in range(args.entries)]
+    entries = [
+        {"source": w, "target": "".join(chr(rng.randint(0x4e00, 0x9fa5)) for _ in range(3)),
+         "aliases": [w[:3] + " " + w[3:]]}
+        for w in words
+    ]
+    start = time.perf_counter()
+    glossary = Glossary(path=None, entries=entries)
+    build = time.perf_counter() - start
+    texts = [
+        "这次会议讨论了 " + " 和 ".join(rng.sample(words, 3)) + " 的进展，以及下一阶段的计划安排。"
+        for _ in range(args.utterances)
+    ]
+    print(f"[Bench] 术语表: {args.entries} 条, {args.utterances} 句, 编译 {build * 1000:.0f}ms")
+    start = time.perf_counter()
+    for text in texts:
+        _naive_terms(glossary.entries, text)
+    naive = (time.perf_counter() - start) / len(texts)
+    start = time.perf_counter()
+    for text in texts:
+        corrected = glossary.correct(text)
+        glossary.terms(corrected, "中文")
+        glossary.post_edit(corrected, corrected, "中文")
+    matched = (time.perf_counter() - start) / len(texts)
+    print(f"{'逐条查找':>10}  每句 {naive * 1000:.3f}ms (仅查找术语)")
+    print(f"{'自动机':>10}  每句 {matched * 1000:.3f}ms (纠错 + 查找术语 + 译后替换)")
+
+def run_local(args):
+    from local_mt import LocalEngine, available_pairs, model_dir_for
+    pairs = available_pairs()
+    if args.pair not in pairs:
+        print(f"[Bench] 未找到本地翻译模型 {model_dir_for(args.pair)}，已有: {', '.join(pairs) or '无'}")
+        return
+    engine = LocalEngine(model_dir_for(args.pair), threads=args.threads, max_batch=args.batch)
+    rng = random.Random(0)
+    words = "we will discuss the results of the new model and how latency changes in the next release".split()
+    texts = [" ".join(rng.choice(words) for _ in range(rng.randint(6, 16))) + "." for _ in range(args.utterances)]
+    engine.translate(texts[:1])
+    print(f"[Bench] 本地翻译 {args.pair}: {args.utterances} 句, threads={args.threads}, batch={args.batch}")
+    samples = []
+    for text in texts:
+        start = time.perf_counter()
+        engine.translate([text])
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    print(f"{'逐句':>10}  p50 {samples[len(samples) // 2]:.1f}ms, p90 {samples[int(len(samples) * 0.9)]:.1f}ms")
+    start = time.perf_counter()
+    for i in range(0, len(texts), args.batch):
+        engine.translate(texts[i:i + args.batch])
+    elapsed = time.perf_counter() - start
+    print(f"{'批量':>10}  {len(texts) / elapsed:.1f} 句/秒")
+
+def bench_organize(concurrency, lines, api_delay):
+    translator = Translator(organize_api_key="bench", organize_concurrency=concurrency)
+    translator.organize_client = _FakeClient(api_delay)
+    translations = [{"translated": f"这是第{i}句整理测试文本，内容用于模拟一段较长的会议记录。"} for i in range(lines)]
+    updates = []
+    start = time.perf_counter()
+    result, error = translator.organize_results(translations, progress_callback=lambda text, stage: updates.append(
+        time.perf_counter() - start))
+    return time.perf_counter() - start, updates[1] if len(updates) > 1 else None, error
+
+def run_organize(args):
+    print(f"[Bench] 整理: {args.lines} 行, api_delay={args.api_delay}s")
+    for concurrency in (1, 4, 8):
+        elapsed, first, error = bench_organize(concurrency, args.lines, args.api_delay)
+        first_text = f"{first:.2f}s" if first is not None else "-"
+        print(f"并发={concurrency}: 总用时 {elapsed:.2f}s, 首段结果 {first_text}{', 错误: ' + error if error else ''}")
+
+    translator = Translator(organize_api_key="bench", organize_concurrency=4)
+    client = _FakeClient(args.api_delay)
+    translator.organize_client = client
+    translations = [{"translated": f"这是第{i}句整理测试文本，内容用于模拟一段较长的会议记录。"} for i in range(args.lines)]
+    translator.organize_results(translations)
+    for added in (50, 0):
+        translations += [{"translated": f"新增的第{i}句。"} for i in range(added)]
+        calls = client.chat.completions.calls
+        start = time.perf_counter()
+        translator.organize_results(translations)
+        print(f"增量整理(新增 {added} 行): 用时 {time.perf_counter() - start:.2f}s, "
+              f"请求 {client.chat.completions.calls - calls} 次")
+
+def run_store(args):
+    print(f"[Bench] 会话存储: {args.entries} 条结果")
+    result = {"original": "This is a fairly typical caption line from a long meeting.",
+              "translated": "这是一次长时间会议中相当典型的一行字幕。", "success": True}
+    tracemalloc.start()
+    results = [dict(result, original=f"{result['original']} {i}") for i in range(args.entries)]
+    list_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del results
+    print(f"{'内存列表':>10}  占用 {list_bytes / 1024 / 1024:.1f} MB")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tracemalloc.start()
+        store = SessionStore(os.path.join(tmp, "sessions.db"), window=200)
+        start = time.perf_counter()
+        for i in range(args.entries):
+            store.append(dict(result, original=f"{result['original']} {i}"))
+        elapsed = time.perf_counter() - start
+        store_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        start = time.perf_counter()
+        page = store.page(args.entries // 2, 500)
+        page_ms = (time.perf_counter() - start) * 1000
+        print(f"{'会话存储':>10}  占用 {store_bytes / 1024 / 1024:.1f} MB, 写入 {elapsed / args.entries * 1e6:.0f}us/条, "
+              f"读取中间一页({len(page)}条) {page_ms:.1f}ms")
+        store.close()
+
+def run_search(args):
+    print(f"[Bench] 历史搜索: {args.sessions} 个会话 x {args.entries} 条")
+    rng = random.Random(0)
+    words = ["产品", "路线图", "发布", "预算", "客户", "延迟", "服务器", "会议", "季度", "目标", "测试", "部署"]
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SessionStore(os.path.join(tmp, "sessions.db"))
+        start = time.perf_counter()
+        for _ in range(args.sessions):
+            store.new_session()
+            with store._lock:
+                for i in range(args.entries):
+                    text = "".join(rng.choice(words) for _ in range(8))
+                    if rng.random() < 0.001:
+                        text += "数据库迁移"
+
+                    store._conn.execute(
+                        "INSERT INTO entries (session_id, idx, original, translated, start, end, created) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (store.session_id, i + 1, f"meeting note {i} about the roadmap", text, 0, 0, 0)
+                    )
+                store._conn.commit()
+        print(f"写入 {args.sessions * args.entries} 条用时 {time.perf_counter() - start:.1f}s")
+
+        # "迁移" is a rare two-character term: without the bigram index it cannot stop early
+        for query in ("数据库迁移", "路线图发布", "roadmap", "迁移", "迁移 note", "预算"):
+            for name, fts in (("全文索引", True), ("逐条匹配", False)):
+                store.fts_available = store.bigram_available = fts
+                start = time.perf_counter()
+                hits = store.find(query, limit=200)
+                print(f"{query:>12} {name}: {len(hits)} 条, {(time.perf_counter() - start) * 1000:.1f}ms")
+        store.fts_available = store.bigram_available = True
+        store.close()
+
+def run_export(args):
+    print(f"[Bench] 导出: {args.entries} 条")
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SessionStore(os.path.join(tmp, "sessions.db"))
+        with store._lock:
+            now = time.time()
+            for i in range(args.entries):
+                store._conn.execute(
+                    "INSERT INTO entries (session_id, idx, original, translated, start, end, created) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (store.session_id, i + 1, f"This is caption line number {i} of a long session.",
+                     f"这是长会话中的第 {i} 行字幕。", now + i * 3, now + i * 3 + 2.5, now)
+                )
+            store._conn.commit()
+        store._count = args.entries
+        for ext in exporter.WRITERS:
+            path = os.path.join(tmp, "out" + ext)
+            start = time.perf_counter()
+            exporter.export_session(store, path)
+            elapsed = time.perf_counter() - start
+            # second pass under tracemalloc, which slows it down too much to time
+            tracemalloc.start()
+            exporter.export_session(store, path)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{ext:>8}  用时 {elapsed:.2f}s, 峰值内存 {peak / 1024 / 1024:.1f} MB, "
+                  f"文件 {os.path.getsize(path) / 1024 / 1024:.1f} MB")
+        store.close()
+
+def bench_failover(routing, stream_output, utterances, api_delay, error_rate, tail_rate, tail_delay):
+    translator = Translator(
+        translate_api_key="bench", stream_output=stream_output, batching=False,
+        failover=routing, hedging=routing, request_retries=2 if routing else 0
+    )
+    translator.translate_client = _FlakyClient(api_delay, error_rate, tail_rate, tail_delay, 1)
+    translator.client = _FlakyClient(api_delay, error_rate, tail_rate, tail_delay, 2)
+    translator.model = "secondary"
+    translator.api_base = "https://secondary.example"
+    if stream_output:
+        # the live path the app runs: queued finals streamed to a caption bar
+        results = queue.Queue()
+        translator.set_delta_callback(lambda original, text: None)
+        translator.set_result_callback(results.put)
+        translator.start()
+
+        def translate(text):
+            translator.add_text(text)
+            return results.get()
+    else:
+        translate = translator.translate_sync
+    samples = []
+    errors = 0
+    for i in range(utterances):
+        start = time.perf_counter()
+        result = translate(f"utterance {i}")
+        samples.append((time.perf_counter() - start) * 1000)
+        errors += not result["success"]
+    translator.stop()
+    return sorted(samples), errors, translator.router.get_stats()
+
+def run_failover(args):
+    print(f"[Bench] 故障转移: {args.utterances} 条, api_delay={args.api_delay}s, 失败率 {args.error_rate:.0%}, "
+          f"长尾 {args.tail_rate:.0%} x {args.tail_delay}s")
+    for mode, stream_output in (("流式", True), ("完整", False)):
+        for name, routing in (("单端点", False), ("转移+对冲", True)):
+            samples, errors, stats = bench_failover(routing, stream_output, args.utterances, args.api_delay,
+                                                    args.error_rate, args.tail_rate, args.tail_delay)
+            pct = lambda q: samples[min(len(samples) - 1, int(len(samples) * q))]
+            print(f"{mode + name:>10}  p50 {pct(0.5):.0f}ms, p95 {pct(0.95):.0f}ms, p99 {pct(0.99):.0f}ms, "
+                  f"错误 {errors}/{len(samples)}, 对冲 {stats['hedges']} 次 (胜 {stats['hedge_wins']}), "
+                  f"转移 {stats['failovers']} 次")
+
+class _RateLimitError(Exception):
+    status_code = 429
+
+    def __init__(self, retry_after):
+        super().__init__("simulated 429")
+        self.response = type("Response", (), {"headers": {"retry-after": f"{retry_after:.3f}"}})()
+
+class _LimitedCompletions(_FakeCompletions):
+    # the provider allows `limit` requests per fixed window and answers 429 beyond it
+    def __init__(self, delay, limit, window):
+        super().__init__(delay)
+        self.limit = limit
+        self.window = window
+        self.rejected = 0
+        self._window_start = time.monotonic()
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def create(self, model, messages, stream=False, **kwargs):
+        with self._lock:
+            now = time.monotonic()
+            if now - self._window_start >= self.window:
+                self._window_start = now
+                self._count = 0
+            self._count += 1
+            if self._count > self.limit:
+                self.rejected += 1
+                raise _RateLimitError(self._window_start + self.window - now)
+        return super().create(model, messages, stream, **kwargs)
+
+def bench_ratelimit(limited, utterances, interval, organize_threads, api_delay, server_rps):
+    translator = Translator(
+        translate_api_key="bench", organize_api_key="bench", stream_output=False, batching=False,
+        rate_limit_rpm=server_rps * 60 * 0.9 if limited else 0
+    )
+    # the benchmark's provider window is one second, so the burst is scaled down to match
+    translator.rate_limiter.burst_seconds = 0.15
+    completions = _LimitedCompletions(api_delay, server_rps, 1.0)
+    translator.translate_client = translator.organize_client = _FakeClient(api_delay)
+    translator.translate_client.chat.completions = completions
+    translator.organize_api_base = translator.translate_api_base
+    running = True
+    organized = [0]
+
+    def organize_loop():
+        with translator._endpoints("organize") as endpoints:
+            while running:
+                result, _ = translator._organize_request(endpoints, [{"role": "user", "content": "整理 " * 200}])
+                if result is not None:
+                    organized[0] += 1
+
+    threads = [threading.Thread(target=organize_loop, daemon=True) for _ in range(organize_threads)]
+    for t in threads:
+        t.start()
+    time.sleep(1.0)
+    samples = []
+    errors = 0
+    began = time.perf_counter()
+    for i in range(utterances):
+        start = time.perf_counter()
+        result = translator.translate_sync(f"utterance {i}")
+        samples.append((time.perf_counter() - start) * 1000)
+        errors += not result["success"]
+        time.sleep(interval)
+    running = False
+    elapsed = time.perf_counter() - began
+    for t in threads:
+        t.join()
+    return sorted(samples), errors, completions.rejected, organized[0] / elapsed, translator.get_usage_stats()["rate_limits"]
+
+def run_ratelimit(args):
+    print(f"[Bench] 限速: {args.utterances} 条实时字幕, 间隔 {args.interval}s, {args.organize_threads} 个整理线程, "
+          f"服务端上限 {args.server_rps} 请求/秒, api_delay={args.api_delay}s")
+    for name, limited in (("不限速", False), ("客户端限速", True)):
+        samples, errors, rejected, organized, stats = bench_ratelimit(
+            limited, args.utterances, args.interval, args.organize_threads, args.api_delay, args.server_rps)
+        pct = lambda q: samples[min(len(samples) - 1, int(len(samples) * q))]
+        waits = max((s["max_wait"] for s in stats.values()), default=0.0)
+        print(f"{name:>8}  实时 p50 {pct(0.5):.0f}ms, p95 {pct(0.95):.0f}ms, p99 {pct(0.99):.0f}ms, "
+              f"错误 {errors}/{len(samples)}, 429 {rejected} 次, 整理 {organized:.1f} 段/秒, 最长排队 {waits * 1000:.0f}ms")
+
+def run_translate_pool(args):
+    print(f"[Bench] 翻译并发: {args.utterances} 条积压, api_delay={args.api_delay}s, jitter={args.jitter}s, "
+          f"端点并发上限={args.endpoint_concurrency}")
+    for workers in (1, 2, 4, 8):
+        elapsed, ordered = bench_translate_pool(workers, args.utterances, args.api_delay, args.jitter, args.endpoint_concurrency)
+        print(f"workers={workers}: 用时 {elapsed:.2f}s, {args.utterances / elapsed:.1f} 条/秒, 顺序{'正确' if ordered else '错误'}")
+
+def main():
+    parser = argparse.ArgumentParser(description="LiveCaption 性能基准")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("pipeline", help="对比轮询与推送管线的端到端延迟")
+    p.add_argument("--chunks", type=int, default=50)
+    p.add_argument("--interval", type=float, default=0.2)
+    p.add_argument("--api-delay", type=float, default=0.05)
+    p.set_defaults(func=run_pipeline)
+
+    p = sub.add_parser("resample", help="对比线性插值与多相流式重采样")
+    p.add_argument("--block-size", type=int, default=4096)
+    p.add_argument("--seconds", type=float, default=30.0)
+    p.add_argument("--tone", type=float, default=10000.0)
+    p.set_defaults(func=run_resample)
+
+    p = sub.add_parser("translate-pool", help="对比不同翻译并发数下的积压消化速度")
+    p.add_argument("--utterances", type=int, default=40)
+    p.add_argument("--api-delay", type=float, default=0.3)
+    p.add_argument("--jitter", type=float, default=0.2)
+    p.add_argument("--endpoint-concurrency", type=int, default=8)
+    p.set_defaults(func=run_translate_pool)
+
+    p = sub.add_parser("failover", help="对比单端点与故障转移+对冲请求下的翻译尾延迟和错误率")
+    p.add_argument("--utterances", type=int, default=500)
+    p.add_argument("--api-delay", type=float, default=0.1)
+    p.add_argument("--error-rate", type=float, default=0.05)
+    p.add_argument("--tail-rate", type=float, default=0.03)
+    p.add_argument("--tail-delay", type=float, default=1.5)
+    p.set_defaults(func=run_failover)
+
+    p = sub.add_parser("ratelimit", help="对比有无客户端限速时整理任务并发下实时字幕的 429 次数和延迟")
+    p.add_argument("--utterances", type=int, default=100)
+    p.add_argument("--interval", type=float, default=0.1)
+    p.add_argument("--organize-threads", type=int, default=6)
+    p.add_argument("--api-delay", type=float, default=0.05)
+    p.add_argument("--server-rps", type=int, default=20)
+    p.set_defaults(func=run_ratelimit)
+
+    p = sub.add_parser("batch", help="对比逐条与批量翻译下的积压消化速度和提示词开销")
+    p.add_argument("--utterances", type=int, default=40)
+    p.add_argument("--api-delay", type=float, default=0.3)
+    p.add_argument("--workers", type=int, default=2)
+    p.set_defaults(func=run_batching)
+
+    p = sub.add_parser("context", help="对比不同上下文窗口策略下的提示词长度和前缀缓存命中率")
+    p.add_argument("--utterances", type=int, default=300)
+    p.add_argument("--pairs", type=int, default=20)
+    p.add_argument("--tokens", type=int, default=1200)
+    p.set_defaults(func=run_context)
+
+    p = sub.add_parser("glossary", help="对比逐条查找与多模式匹配下每句的术语处理耗时")
+    p.add_argument("--entries", type=int, default=5000)
+    p.add_argument("--utterances", type=int, default=2000)
+    p.set_defaults(func=run_glossary)
+
+    p = sub.add_parser("local", help="测量本地翻译模型的单句延迟和批量吞吐（需要 mt-models 下的模型）")
+    p.add_argument("--pair", default="en-zh")
+    p.add_argument("--utterances", type=int, default=100)
+    p.add_argument("--threads", type=int, default=2)
+    p.add_argument("--batch", type=int, default=16)
+    p.set_defaults(func=run_local)
+
+    p = sub.add_parser("organize", help="对比不同并发数下长文本整理的总用时和首段出现时间")
+    p.add_argument("--lines", type=int, default=2000)
+    p.add_argument("--api-delay", type=float, default=0.5)
+    p.set_defaults(func=run_organize)
+
+    p = sub.add_parser("store", help="对比内存列表与会话存储的内存占用和分页读取耗时")
+    p.add_argument("--entries", type=int, default=50000)
+    p.set_defaults(func=run_store)
+
+    p = sub.add_parser("search", help="对比全文索引与逐条匹配的历史搜索耗时")
+    p.add_argument("--sessions", type=int, default=100)
+    p.add_argument("--entries", type=int, default=2000)
+    p.set_defaults(func=run_search)
+
+    p = sub.add_parser("export", help="测量各导出格式的耗时和峰值内存")
+    p.add_argument("--entries", type=int, default=100000)
+    p.set_defaults(func=run_export)
+
+    p = sub.add_parser("stream", help="对比流式与完整响应下首个译文字符的出现时间")
+    p.add_argument("--utterances", type=int, default=10)
+    p.add_argument("--first-token", type=float, default=0.3)
+    p.add_argument("--token-delay", type=float, default=0.03)
+    p.add_argument("--tokens", type=int, default=30)
+    p.set_defaults(func=run_stream)
+
+    p = sub.add_parser("speculation", help="对比开启预翻译前后从最终结果到译文的延迟")
+    p.add_argument("--utterances", type=int, default=5)
+    p.add_argument("--api-delay", type=float, default=0.5)
+    p.add_argument("--endpoint-silence", type=float, default=1.2)
+    p.set_defaults(func=run_speculation)
+
+    p = sub.add_parser("cache", help="对比有无翻译缓存时重复句子的翻译耗时（开启上下文的实时翻译路径）")
+    p.add_argument("--utterances", type=int, default=100)
+    p.add_argument("--phrases", type=int, default=30)
+    p.add_argument("--api-delay", type=float, default=0.05)
+    p.set_defaults(func=run_cache)
+
+    p = sub.add_parser("profiles", help="在录音文件上对比各延迟模式的实时识别延迟与CPU占用")
+    p.add_argument("wav")
+    p.add_argument("--speed", type=float, default=1.0)
+    p.set_defaults(func=run_profiles)
+
+    p = sub.add_parser("replay", help="无界面回放音频文件，运行完整的识别→翻译管线")
+    p.add_argument("source", help="WAV 文件或原始 PCM 文件")
+    p.add_argument("--speed", type=float, default=0.0, help="回放速度，0 表示尽可能快")
+    p.add_argument("--raw-rate", type=int, default=16000)
+    p.add_argument("--raw-dtype", default="int16", choices=["int16", "int32", "float32", "uint8"])
+    p.add_argument("--raw-channels", type=int, default=1)
+    p.add_argument("--no-translate", action="store_true")
+    p.add_argument("--latency-json", help="将各阶段延迟统计导出到 JSON 文件")
+    p.set_defaults(func=run_replay)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -18,9 +18,61 @@ DEFAULT_CONFIG = {
     "translate_model": "Qwen/Qwen3-8B",
     "organize_api_key": "",
     "organize_api_base": "https://api.deepseek.com",
-    "organize_model": "deepseek-chat"
+    "organize_model": "deepseek-chat",
+    "latency_profile": "balanced",
+    "translate_workers": 3,
+    "endpoint_max_concurrency": 4,
+    "stream_translation": True,
+    "speculative_translation": False,
+    "speculation_debounce": 0.4,
+    "speculation_min_interval": 1.0,
+    "speculation_min_chars": 6,
+    "translation_cache": True,
+    "translation_cache_max_entries": 100000,
+    "translation_cache_max_age_days": 30,
+    "translation_cache_with_context": False,
+    "translation_cache_context_max_tokens": 16,
+    "batch_translation": True,
+    "batch_max_items": 8,
+    "batch_max_tokens": 800,
+    "batch_max_wait": 0.05,
+    "organize_concurrency": 4,
+    "organize_chunk_tokens": 3000,
+    "organize_retries": 2,
+    "rolling_organize": False,
+    "rolling_organize_interval": 120,
+    "session_memory_window": 200,
+    "session_retention_days": 30,
+    "translation_context": True,
+    "context_max_pairs": 20,
+    "context_max_tokens": 1200,
+    "glossary_enabled": True,
+    "local_translation_pairs": [],
+    "local_translation_threads": 2,
+    "local_translation_batch": 16,
+    "local_translation_fallback": True,
+    "endpoint_failover": True,
+    "hedged_requests": True,
+    "request_retries": 2,
+    "circuit_failure_threshold": 3,
+    "circuit_reset_seconds": 30,
+    "rate_limit_rpm": 0,
+    "rate_limit_tpm": 0,
+    "rate_limits": {
+        "https://api.siliconflow.cn/v1": {"rpm": 1000, "tpm": 50000}
+    },
+    "rate_limit_reserve": 0.2
 }
 
+LATENCY_PROFILES = {
+    "ultra-low": {"chunk_size": 512, "feed_frames": 800, "decode_interval": 0.0},
+    "balanced": {"chunk_size": 1024, "feed_frames": 1600, "decode_interval": 0.1},
+    "throughput": {"chunk_size": 4096, "feed_frames": 8000, "decode_interval": 0.4}
+}
+
+def get_latency_profile(name):
+    return LATENCY_PROFILES.get(name, LATENCY_PROFILES[DEFAULT_CONFIG["latency_profile"]])
+
 def load_config():
     if CONFIG_FILE.exists():
         with open(CONFIG_FILE, "r", encoding="utf-8") as f:
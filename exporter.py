@@ -0,0 +1,209 @@
+import json
+import os
+import queue
+import threading
+from datetime import datetime
+
+FORMATS = {
+    ".srt": "SRT字幕",
+    ".vtt": "WebVTT字幕",
+    ".jsonl": "JSON Lines",
+    ".txt": "文本文件",
+    ".json": "JSON文件"
+}
+
+MIN_CUE_SECONDS = 1.0
+
+def _timestamp(seconds, separator):
+    ms = max(0, int(round(seconds * 1000)))
+    h, ms = divmod(ms, 3600000)
+    m, ms = divmod(ms, 60000)
+    s, ms = divmod(ms, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d}{separator}{ms:03d}"
+
+class _Writer:
+    def __init__(self, f, origin, bilingual=True):
+        self.f = f
+        self.origin = origin
+        self.bilingual = bilingual
+
+    def _span(self, entry):
+        start = max(0.0, entry["start"] - self.origin)
+        end = max(entry["end"] - self.origin, start + MIN_CUE_SECONDS)
+        return start, end
+
+    def _cue_text(self, entry):
+        if self.bilingual and entry["original"]:
+            return f"{entry['translated']}\n{entry['original']}"
+        return entry["translated"]
+
+    def begin(self):
+        pass
+
+    def write(self, entry):
+        raise NotImplementedError
+
+    def end(self, organized=None):
+        pass
+
+class SrtWriter(_Writer):
+    def write(self, entry):
+        start, end = self._span(entry)
+        self.f.write(f"{entry['index']}\n{_timestamp(start, ',')} --> {_timestamp(end, ',')}\n"
+                     f"{self._cue_text(entry)}\n\n")
+
+class VttWriter(_Writer):
+    def begin(self):
+        self.f.write("WEBVTT\n\n")
+
+    def write(self, entry):
+        start, end = self._span(entry)
+        self.f.write(f"{entry['index']}\n{_timestamp(start, '.')} --> {_timestamp(end, '.')}\n"
+                     f"{self._cue_text(entry)}\n\n")
+
+class JsonlWriter(_Writer):
+    def write(self, entry):
+        start, end = self._span(entry)
+        record = {
+            "index": entry["index"],
+            "start": round(start, 3),
+            "end": round(end, 3),
+            "time": datetime.fromtimestamp(entry["start"]).isoformat(timespec="milliseconds"),
+            "original": entry["original"],
+            "translated": entry["translated"]
+        }
+        self.f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+class TxtWriter(_Writer):
+    def begin(self):
+        self.f.write("=== 原始翻译 ===\n\n")
+
+    def write(self, entry):
+        self.f.write(f"[{entry['index']}] 原文: {entry['original']}\n    译文: {entry['translated']}\n\n")
+
+    def end(self, organized=None):
+        if organized:
+            self.f.write(f"\n=== 整理后 ===\n{organized}\n")
+
+class JsonWriter(_Writer):
+    # same document shape as the old export, written element by element
+    def begin(self):
+        self.first = True
+        self.f.write('{\n  "translations": [')
+
+    def write(self, entry):
+        record = {
+            "original": entry["original"],
+            "translated": entry["translated"],
+            "start": entry["start"],
+            "end": entry["end"]
+        }
+        self.f.write(("\n    " if self.first else ",\n    ") + json.dumps(record, ensure_ascii=False))
+        self.first = False
+
+    def end(self, organized=None):
+        self.f.write(f"\n  ],\n  \"organized\": {json.dumps(organized or None, ensure_ascii=False)}\n}}\n")
+
+WRITERS = {
+    ".srt": SrtWriter,
+    ".vtt": VttWriter,
+    ".jsonl": JsonlWriter,
+    ".txt": TxtWriter,
+    ".json": JsonWriter
+}
+
+def _writer_for(path, f, origin, bilingual):
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in WRITERS:
+        ext = ".txt"
+    return WRITERS[ext](f, origin, bilingual)
+
+def export_session(store, path, session_id=None, organized=None, bilingual=True):
+    # entries are read page by page and written as they come; memory stays flat
+    # regardless of session length
+    session_id = store.session_id if session_id is None else session_id
+    origin = store.session_started(session_id)
+    count = 0
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        writer = _writer_for(path, f, origin, bilingual)
+        writer.begin()
+        for entry in store.iter_entries(session_id):
+            writer.write(entry)
+            count += 1
+        writer.end(organized)
+    return count
+
+class LiveExporter:
+    # writes the current session so far and then every new entry as it is
+    # stored; the store listener only enqueues so translation is never blocked
+    def __init__(self, store, path, bilingual=True):
+        self.store = store
+        self.path = path
+        self.bilingual = bilingual
+        self.session_id = store.session_id
+        self.count = 0
+        self._queue = queue.Queue()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def _listener(self, entry):
+        if self.store.session_id == self.session_id:
+            self._queue.put(entry)
+
+    def start(self):
+        self.store.add_listener(self._listener)
+        self._thread = threading.Thread(target=self._process_thread, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.store.remove_listener(self._listener)
+        self._stopping.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _process_thread(self):
+        with open(self.path, "w", encoding="utf-8", newline="\n") as f:
+            writer = _writer_for(self.path, f, self.store.session_started(self.session_id), self.bilingual)
+            writer.begin()
+            written = 0
+            for entry in self.store.iter_entries(self.session_id):
+                writer.write(entry)
+                written = entry["index"]
+                self.count += 1
+            f.flush()
+            while not (self._stopping.is_set() and self._queue.empty()):
+                try:
+                    entry = self._queue.get(timeout=0.2)
+                except queue.Empty:
+                    continue
+                if entry["index"] <= written:
+                    continue
+                writer.write(entry)
+                written = entry["index"]
+                self.count += 1
+                f.flush()
+            writer.end()
+        print(f"[Export] 实时导出结束: {self.path}, {self.count} 条")
+
+_live_exporters = {}
+
+def start_live_export(store, path, bilingual=True):
+    stop_live_export(store)
+    exporter = LiveExporter(store, path, bilingual)
+    exporter.start()
+    _live_exporters[id(store)] = exporter
+    return exporter
+
+def get_live_export(store):
+    return _live_exporters.get(id(store))
+
+def stop_live_export(store):
+    exporter = _live_exporters.pop(id(store), None)
+    if exporter:
+        exporter.stop()
+    return exporter
+
+def stop_all_live_exports():
+    for exporter in list(_live_exporters.values()):
+        exporter.stop()
+    _live_exporters.clear()
@@ -0,0 +1,243 @@
+import hashlib
+import json
+import threading
+from collections import deque
+from pathlib import Path
+
+GLOSSARY_FILE = Path(__file__).parent / "glossary.json"
+
+def _lower(text):
+    # matching is case-insensitive but positions must line up with the original
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return "".join(c.lower() if len(c.lower()) == 1 else c for c in text)
+
+def _is_word_char(c):
+    return c.isascii() and c.isalnum()
+
+def _split_list(value):
+    if isinstance(value, str):
+        value = value.replace("，", ",").split(",")
+    return [v.strip() for v in value or [] if v and v.strip()]
+
+class PatternMatcher:
+    # Aho-Corasick automaton compiled once; a scan costs one pass over the text
+    # no matter how many patterns there are
+    def __init__(self, patterns):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for pattern, value in patterns:
+            key = _lower(pattern)
+            if not key:
+                continue
+            state = 0
+            for c in key:
+                nxt = self._goto[state].get(c)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][c] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = nxt
+            # ASCII words only match on word boundaries, CJK terms anywhere
+            self._out[state].append((len(key), value, _is_word_char(key[0]), _is_word_char(key[-1])))
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for c, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and c not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(c, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+        self.size = len(self._goto)
+
+    def find(self, text):
+        # leftmost-longest, non-overlapping matches as (start, end, value)
+        if self.size == 1 or not text:
+            return []
+        lowered = _lower(text)
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+        hits = []
+        state = 0
+        for i, c in enumerate(lowered):
+            while state and c not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(c, 0)
+            for length, value, word_start, word_end in out[state]:
+                start = i + 1 - length
+                if word_start and start > 0 and _is_word_char(lowered[start - 1]):
+                    continue
+                if word_end and i + 1 < len(lowered) and _is_word_char(lowered[i + 1]):
+                    continue
+                hits.append((start, i + 1, value))
+        if len(hits) > 1:
+            hits.sort(key=lambda h: (h[0], h[0] - h[1]))
+        result = []
+        end = 0
+        for hit in hits:
+            if hit[0] >= end:
+                result.append(hit)
+                end = hit[1]
+        return result
+
+def _replace(text, hits, replacement):
+    parts = []
+    pos = 0
+    for start, end, value in hits:
+        new = replacement(text[start:end], value)
+        if new is None:
+            continue
+        parts.append(text[pos:start])
+        parts.append(new)
+        pos = end
+    if not parts:
+        return text
+    parts.append(text[pos:])
+    return "".join(parts)
+
+class Glossary:
+    # entries: {"source": term, "target": translation or {language: translation},
+    # "aliases": common misrecognitions, "variants": unwanted translations}
+    def __init__(self, path=GLOSSARY_FILE, entries=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries = []
+        self.corrections = 0
+        self.post_edits = 0
+        if entries is None:
+            entries = self._read()
+        self.set_entries(entries)
+
+    def _read(self):
+        if self.path is None or not Path(self.path).exists():
+            return []
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"[Glossary] 读取术语表失败: {e}")
+            return []
+
+    def set_entries(self, entries):
+        cleaned = []
+        for entry in entries:
+            source = (entry.get("source") or "").strip()
+            if not source:
+                continue
+            target = entry.get("target") or ""
+            cleaned.append({
+                "source": source,
+                "target": {k: v.strip() for k, v in target.items() if v and v.strip()}
+                if isinstance(target, dict) else target.strip(),
+                "aliases": _split_list(entry.get("aliases")),
+                "variants": _split_list(entry.get("variants"))
+            })
+
+        asr = PatternMatcher((alias, i) for i, e in enumerate(cleaned) for alias in e["aliases"])
+        terms = PatternMatcher(
+            (pattern, i) for i, e in enumerate(cleaned) for pattern in [e["source"]] + e["aliases"]
+        )
+        # targets are patterns too, so a variant inside a correct target is not rewritten
+        output = PatternMatcher(
+            (pattern, i) for i, e in enumerate(cleaned)
+            for pattern in [e["source"]] + e["aliases"] + e["variants"] + self._targets(e)
+        )
+        with self._lock:
+            self.entries = cleaned
+            # swapped as one tuple so readers never pair new entries with old matchers
+            self._state = (cleaned, asr, terms, output)
+        print(f"[Glossary] 术语表: {len(cleaned)} 条, 状态 {terms.size}")
+
+    def _targets(self, entry):
+        target = entry["target"]
+        if isinstance(target, dict):
+            return list(target.values())
+        return [target] if target else []
+
+    def save(self, entries):
+        self.set_entries(entries)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=2)
+
+    def target_for(self, entry, target_language):
+        target = entry["target"]
+        if isinstance(target, dict):
+            return target.get(target_language)
+        return target or None
+
+    def correct(self, text):
+        # rewrite known misrecognitions to the canonical term
+        entries, asr, _, _ = self._state
+        hits = asr.find(text)
+        if not hits:
+            return text
+        self.corrections += len(hits)
+        return _replace(text, hits, lambda _, i: entries[i]["source"])
+
+    def terms(self, text, target_language):
+        # glossary terms found in `text` that have a translation for the language
+        entries, _, terms, _ = self._state
+        seen = set()
+        result = []
+        for _, _, i in terms.find(text):
+            if i in seen:
+                continue
+            seen.add(i)
+            target = self.target_for(entries[i], target_language)
+            if target:
+                result.append((entries[i]["source"], target))
+        return result
+
+    def signature(self, text, target_language):
+        # changes only when the terms relevant to this utterance change, so editing
+        # the glossary does not invalidate unrelated cached translations
+        terms = self.terms(text, target_language)
+        if not terms:
+            return ""
+        raw = "\x1f".join(f"{s}\x1e{t}" for s, t in terms)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:12]
+
+    def post_edit(self, original, translated, target_language):
+        # replace untranslated source terms, misrecognitions and unwanted
+        # translations of terms that actually occur in the original
+        entries, _, terms, output = self._state
+        wanted = {}
+        for _, _, i in terms.find(original):
+            target = self.target_for(entries[i], target_language)
+            if target:
+                wanted[i] = target
+        if not wanted:
+            return translated
+
+        def replacement(found, i):
+            target = wanted.get(i)
+            if target is None or found == target:
+                return None
+            self.post_edits += 1
+            return target
+        return _replace(translated, output.find(translated), replacement)
+
+    def get_stats(self):
+        return {
+            "entries": len(self.entries),
+            "corrections": self.corrections,
+            "post_edits": self.post_edits
+        }
+
+_glossary = None
+_glossary_lock = threading.Lock()
+
+def get_glossary(path=GLOSSARY_FILE):
+    global _glossary
+    with _glossary_lock:
+        if _glossary is None:
+            _glossary = Glossary(path)
+        return _glossary
@@ -0,0 +1,109 @@
+import threading
+import httpx
+from openai import OpenAI
+
+try:
+    import h2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+KEEPALIVE_EXPIRY = 120.0
+MAX_CONNECTIONS = 16
+# same read timeout as the SDK default: a long non-streamed organize reply can
+# send nothing for minutes; only connecting is expected to be quick
+READ_TIMEOUT = 600.0
+CONNECT_TIMEOUT = 10.0
+
+class _PooledClient:
+    def __init__(self, key, client, http_client):
+        self.key = key
+        self.client = client
+        self.http_client = http_client
+        self.refs = 0
+
+_lock = threading.Lock()
+_clients = {}
+_by_id = {}
+
+def _build(api_key, api_base, bypass_proxy):
+    http_client = httpx.Client(
+        http2=HTTP2_AVAILABLE,
+        trust_env=not bypass_proxy,
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY
+        ),
+        timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT)
+    )
+    # EndpointRouter owns retries, backoff and failover; SDK retries would hide
+    # failures and 429s from it and inflate the latencies it hedges on
+    client = OpenAI(api_key=api_key, base_url=api_base, http_client=http_client, max_retries=0)
+    return client, http_client
+
+def acquire(api_key, api_base, bypass_proxy):
+    # one OpenAI client (and one connection pool) per endpoint/key/proxy mode,
+    # shared by every user until the last one releases it
+    if not api_key:
+        return None
+    key = (api_base.rstrip("/"), api_key, bool(bypass_proxy))
+    with _lock:
+        pooled = _clients.get(key)
+        if pooled is None:
+            client, http_client = _build(api_key, api_base, bypass_proxy)
+            pooled = _PooledClient(key, client, http_client)
+            _clients[key] = pooled
+            _by_id[id(client)] = pooled
+        pooled.refs += 1
+        return pooled.client
+
+def release(client):
+    if client is None:
+        return
+    with _lock:
+        pooled = _by_id.get(id(client))
+        if pooled is None:
+            return
+        pooled.refs -= 1
+        if pooled.refs > 0:
+            return
+        del _clients[pooled.key]
+        del _by_id[id(client)]
+    try:
+        pooled.http_client.close()
+    except Exception as e:
+        print(f"[HttpPool] 关闭连接失败: {e}")
+
+def warm_up(client, timeout=5.0):
+    # open the TCP/TLS (and HTTP/2) connection ahead of the first real request;
+    # any HTTP status counts, only the established connection matters
+    with _lock:
+        pooled = _by_id.get(id(client))
+    if pooled is None:
+        return False
+    try:
+        pooled.http_client.head(str(client.base_url), timeout=timeout)
+        return True
+    except Exception as e:
+        print(f"[HttpPool] 预热连接失败 {client.base_url}: {e}")
+        return False
+
+def get_stats():
+    with _lock:
+        return {
+            "http2": HTTP2_AVAILABLE,
+            "clients": len(_clients),
+            "refs": sum(p.refs for p in _clients.values())
+        }
+
+def close_all():
+    with _lock:
+        pooled = list(_clients.values())
+        _clients.clear()
+        _by_id.clear()
+    for p in pooled:
+        try:
+            p.http_client.close()
+        except Exception:
+            pass
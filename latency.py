@@ -0,0 +1,89 @@
+import json
+import threading
+import time
+from collections import deque
+import numpy as np
+
+STAGES = [
+    "capture",
+    "asr_accept",
+    "first_partial",
+    "endpoint",
+    "punctuation",
+    "translate_request",
+    "translate_first_token",
+    "translate_response",
+    "ui_emit"
+]
+
+HISTOGRAM_EDGES_MS = [0, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+
+def now():
+    return time.monotonic()
+
+class LatencyTracker:
+    def __init__(self, max_samples=5000):
+        self.max_samples = max_samples
+        self._samples = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, metric, seconds):
+        if seconds is None or seconds < 0:
+            return
+        with self._lock:
+            if metric not in self._samples:
+                self._samples[metric] = deque(maxlen=self.max_samples)
+                self._counts[metric] = 0
+            self._samples[metric].append(seconds * 1000.0)
+            self._counts[metric] += 1
+
+    def record_timing(self, timing):
+        # consecutive stage deltas plus the two end-to-end spans we care about
+        previous = None
+        for stage in STAGES:
+            if stage not in timing:
+                continue
+            if previous is not None:
+                self.record(f"{previous}→{stage}", timing[stage] - timing[previous])
+            previous = stage
+        if "endpoint" in timing and "ui_emit" in timing:
+            self.record("endpoint→ui_emit(总)", timing["ui_emit"] - timing["endpoint"])
+        if "capture" in timing and "ui_emit" in timing:
+            self.record("capture→ui_emit(总)", timing["ui_emit"] - timing["capture"])
+
+    def summary(self):
+        with self._lock:
+            snapshot = {k: (list(v), self._counts[k]) for k, v in self._samples.items()}
+        result = {}
+        for metric, (values, count) in snapshot.items():
+            if not values:
+                continue
+            arr = np.asarray(values)
+            hist, _ = np.histogram(arr, bins=HISTOGRAM_EDGES_MS + [np.inf])
+            result[metric] = {
+                "count": count,
+                "mean": float(arr.mean()),
+                "p50": float(np.percentile(arr, 50)),
+                "p90": float(np.percentile(arr, 90)),
+                "p99": float(np.percentile(arr, 99)),
+                "max": float(arr.max()),
+                "histogram": hist.tolist()
+            }
+        return result
+
+    def export_json(self, path):
+        data = {
+            "unit": "ms",
+            "histogram_edges": HISTOGRAM_EDGES_MS,
+            "metrics": self.summary()
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+
+tracker = LatencyTracker()
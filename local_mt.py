@@ -0,0 +1,238 @@
+import queue
+import threading
+from pathlib import Path
+
+import latency
+
+BASE_DIR = Path(__file__).parent
+MT_MODEL_DIR = BASE_DIR / "mt-models"
+
+# local results are cached under their own model name; bump when the decoding changes
+CACHE_VERSION = 1
+
+LANGUAGE_CODES = {
+    "中文": "zh", "英文": "en", "日文": "ja", "韩文": "ko", "法文": "fr", "德文": "de",
+    "西班牙文": "es", "俄文": "ru", "葡萄牙文": "pt", "意大利文": "it"
+}
+
+def detect_language(text):
+    # the recognizer is bilingual zh/en, so a CJK share is enough to tell them apart
+    cjk = sum(1 for c in text if "一" <= c <= "鿿")
+    letters = sum(1 for c in text if c.isalpha())
+    return "zh" if letters and cjk * 2 >= letters else "en"
+
+def language_pair(text, target_language):
+    source = detect_language(text)
+    target = LANGUAGE_CODES.get(target_language, target_language)
+    return f"{source}-{target}"
+
+def model_dir_for(pair, root=MT_MODEL_DIR):
+    # OPUS-MT models converted with ct2-transformers-converter, e.g. mt-models/opus-mt-en-zh
+    return Path(root) / f"opus-mt-{pair}"
+
+def available_pairs(root=MT_MODEL_DIR):
+    root = Path(root)
+    if not root.exists():
+        return []
+    return sorted(
+        p.name[len("opus-mt-"):] for p in root.iterdir()
+        if p.name.startswith("opus-mt-") and (p / "model.bin").exists()
+    )
+
+class LocalEngine:
+    # one CTranslate2 model on its own worker thread; requests arriving while a
+    # batch runs are decoded together in the next one
+    def __init__(self, model_dir, threads=2, max_batch=16, beam_size=2):
+        self.model_dir = Path(model_dir)
+        self.threads = threads
+        self.max_batch = max_batch
+        self.beam_size = beam_size
+        self.batches = 0
+        self.sentences = 0
+        self._queue = queue.Queue()
+        self._load()
+        self._thread = threading.Thread(target=self._process_thread, daemon=True)
+        self._thread.start()
+
+    def _load(self):
+        import ctranslate2
+        import sentencepiece
+
+        self._model = ctranslate2.Translator(
+            str(self.model_dir),
+            device="cpu",
+            compute_type="int8",
+            inter_threads=1,
+            intra_threads=self.threads
+        )
+        self._source_sp = sentencepiece.SentencePieceProcessor(model_file=str(self.model_dir / "source.spm"))
+        self._target_sp = sentencepiece.SentencePieceProcessor(model_file=str(self.model_dir / "target.spm"))
+        # multi-target OPUS-MT models expect a language token such as >>cmn_Hans<<
+        prefix_file = self.model_dir / "source_prefix.txt"
+        self._prefix = prefix_file.read_text(encoding="utf-8").split() if prefix_file.exists() else []
+
+    def translate(self, texts, timeout=30):
+        done = threading.Event()
+        request = {"texts": texts, "done": done, "result": None, "error": None}
+        self._queue.put(request)
+        if not done.wait(timeout):
+            raise TimeoutError("本地翻译超时")
+        if request["error"] is not None:
+            raise request["error"]
+        return request["result"]
+
+    def _process_thread(self):
+        while True:
+            requests = [self._queue.get()]
+            count = len(requests[0]["texts"])
+            while count < self.max_batch:
+                try:
+                    request = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                requests.append(request)
+                count += len(request["texts"])
+
+            texts = [text for request in requests for text in request["texts"]]
+            try:
+                tokens = [self._prefix + self._source_sp.encode(text, out_type=str) + ["</s>"] for text in texts]
+                results = self._model.translate_batch(
+                    tokens,
+                    beam_size=self.beam_size,
+                    max_batch_size=self.max_batch,
+                    max_decoding_length=256
+                )
+                outputs = [self._target_sp.decode(r.hypotheses[0]).strip() for r in results]
+                self.batches += 1
+                self.sentences += len(texts)
+            except Exception as e:
+                outputs = None
+                for request in requests:
+                    request["error"] = e
+            for request in requests:
+                if outputs is not None:
+                    request["result"] = outputs[:len(request["texts"])]
+                    outputs = outputs[len(request["texts"]):]
+                request["done"].set()
+
+class LocalBackend:
+    # translation backend (see translator.ApiBackend) for the configured pairs,
+    # and a fallback for any pair with a model; each model loads on first use
+    name = "local"
+
+    def __init__(self, root=MT_MODEL_DIR, pairs=(), threads=2, max_batch=16, cache=None):
+        self.root = Path(root)
+        self.pairs = set(pairs)
+        self.threads = threads
+        self.max_batch = max_batch
+        self.cache = cache
+        self.translations = 0
+        self._engines = {}
+        self._failed = set()
+        self._lock = threading.Lock()
+
+    def _has_model(self, pair):
+        return pair not in self._failed and (model_dir_for(pair, self.root) / "model.bin").exists()
+
+    def supports(self, pair):
+        return pair in self.pairs and self._has_model(pair)
+
+    def accepts_fallback(self, pair):
+        return self._has_model(pair)
+
+    def engine(self, pair):
+        with self._lock:
+            if pair not in self._engines:
+                try:
+                    self._engines[pair] = LocalEngine(model_dir_for(pair, self.root), self.threads, self.max_batch)
+                    print(f"[LocalMT] 本地翻译模型加载成功: {pair}")
+                except Exception as e:
+                    self._failed.add(pair)
+                    print(f"[LocalMT] 本地翻译模型加载失败: {pair}: {e}")
+                    return None
+            return self._engines[pair]
+
+    def translate(self, items, check_cache=True):
+        results = [None] * len(items)
+        groups = {}
+        for i, item in enumerate(items):
+            groups.setdefault(language_pair(item["text"], item["target_language"]), []).append(i)
+        for pair, indices in groups.items():
+            for i, result in zip(indices, self._translate_pair([items[i] for i in indices], pair, check_cache)):
+                results[i] = result
+        return results
+
+    def _translate_pair(self, items, pair, check_cache):
+        target_language = items[0]["target_language"]
+        model = f"local:{pair}"
+        results = [None] * len(items)
+        pending = []
+        for i, item in enumerate(items):
+            cached = self.cache.get(item["text"], target_language, model, CACHE_VERSION) \
+                if check_cache and self.cache is not None else None
+            if cached is not None:
+                timing = item.get("timing")
+                if timing is not None:
+                    timing["translate_request"] = timing["translate_response"] = latency.now()
+                results[i] = {"original": item["text"], "translated": cached, "success": True,
+                              "cached": True, "backend": self.name, "timing": timing}
+            else:
+                pending.append(i)
+        if not pending:
+            return results
+
+        sent = latency.now()
+        try:
+            engine = self.engine(pair)
+            if engine is None:
+                raise RuntimeError(f"本地翻译模型不可用: {pair}")
+            translated = engine.translate([items[i]["text"] for i in pending])
+            error = None
+        except Exception as e:
+            print(f"[LocalMT] 本地翻译错误: {e}")
+            translated = [None] * len(pending)
+            error = e
+        received = latency.now()
+        for i, text in zip(pending, translated):
+            item = items[i]
+            timing = item.get("timing")
+            if timing is not None:
+                timing["translate_request"] = sent
+                timing["translate_response"] = received
+            if error is not None:
+                results[i] = {"original": item["text"], "translated": f"[翻译错误: {error}]",
+                              "success": False, "timing": timing}
+                continue
+            self.translations += 1
+            if self.cache is not None and text:
+                self.cache.put(item["text"], text, target_language, model, CACHE_VERSION)
+            results[i] = {"original": item["text"], "translated": text, "success": True,
+                          "backend": self.name, "timing": timing}
+        return results
+
+    def translate_cancellable(self, text, target_language, is_cancelled, on_send=None):
+        # local translation is fast enough that speculating ahead of the final is not worth it
+        return None
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                pair: {"batches": e.batches, "sentences": e.sentences}
+                for pair, e in self._engines.items()
+            }
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def get_local_backend(pairs=(), threads=2, max_batch=16, root=MT_MODEL_DIR, cache=None):
+    # loaded engines survive settings changes; new thread settings apply to models loaded later
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = LocalBackend(root, pairs, threads, max_batch, cache)
+        else:
+            _backend.pairs = set(pairs)
+            _backend.threads = threads
+            _backend.max_batch = max_batch
+            _backend.cache = cache
+        return _backend
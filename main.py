@@ -1,22 +1,31 @@
 import os
 import sys
 import threading
-import time
 from PySide6.QtWidgets import QApplication
 from PySide6.QtCore import QTimer, Signal, QObject
 
-from config import load_config, save_config
+from config import load_config, save_config, get_latency_profile
 from audio_capture import AudioCapture
 from asr_processor import ASRProcessor
-from translator import Translator
+import model_loader
+import latency
+from translator import create_translator, translator_options
+import http_pool
+import exporter
+from speculation import SpeculativeTranslator
+from organizer import RollingOrganizer
 from ui_main import TranslationBar
 from ui_settings import SettingsDialog
 from ui_result import ResultDialog
 from ui_splash import SplashScreen
+from ui_stats import StatsDialog
+from ui_glossary import GlossaryDialog
+from glossary import get_glossary
 
 class SignalBridge(QObject):
     original_updated = Signal(str)
     translated_updated = Signal(str, str)
+    translated_delta = Signal(str, str)
     status_updated = Signal(str)
     start_finished = Signal(bool)
 
@@ -26,21 +35,11 @@ class RealtimeTranslator:
         
         self.audio_capture = None
         self.asr_processor = None
-        self.translator = Translator(
-            api_key=self.config.get("api_key", ""),
-            api_base=self.config.get("api_base", "https://api.deepseek.com"),
-            model=self.config.get("model", "deepseek-chat"),
-            bypass_proxy=self.config.get("bypass_proxy", False),
-            translate_api_key=self.config.get("translate_api_key", ""),
-            translate_api_base=self.config.get("translate_api_base", "https://api.siliconflow.cn/v1"),
-            translate_model=self.config.get("translate_model", "Qwen/Qwen3-8B"),
-            organize_api_key=self.config.get("organize_api_key", ""),
-            organize_api_base=self.config.get("organize_api_base", "https://api.deepseek.com"),
-            organize_model=self.config.get("organize_model", "deepseek-chat")
-        )
+        self.speculator = None
+        self.rolling_organizer = None
+        self.translator = create_translator(self.config)
         
         self.is_running = False
-        self.process_thread = None
         
         self.signal_bridge = SignalBridge()
     
@@ -52,9 +51,13 @@ class RealtimeTranslator:
         def init_thread():
             try:
                 print("[DEBUG] 开始初始化...")
+                threading.Thread(target=self.translator.warm_up, daemon=True).start()
                 
+                profile = get_latency_profile(self.config.get("latency_profile", "balanced"))
                 if self.audio_capture is None:
-                    self.audio_capture = AudioCapture(sample_rate=16000)
+                    self.audio_capture = AudioCapture(sample_rate=16000, chunk_size=profile["chunk_size"])
+                else:
+                    self.audio_capture.chunk_size = profile["chunk_size"]
                 
                 self.signal_bridge.status_updated.emit("正在初始化音频...")
                 print("[DEBUG] 启动音频捕获...")
@@ -74,8 +77,10 @@ class RealtimeTranslator:
                 
                 if self.asr_processor is None:
                     try:
-                        self.asr_processor = ASRProcessor()
-                        self.asr_processor.start()
+                        self.asr_processor = ASRProcessor(
+                            preloaded_recognizer=model_loader.get_recognizer(),
+                            preloaded_punct=model_loader.get_punct_model()
+                        )
                     except Exception as e:
                         print(f"[DEBUG] ASR初始化失败: {e}")
                         self.signal_bridge.status_updated.emit(f"模型加载失败: {str(e)[:50]}")
@@ -83,11 +88,35 @@ class RealtimeTranslator:
                         return
                 
                 self.signal_bridge.status_updated.emit("正在启动翻译引擎...")
+                self.translator.set_result_callback(self._on_translate_result)
+                self.translator.set_delta_callback(self._on_translate_delta)
                 self.translator.start()
                 
+                if self.config.get("speculative_translation", False):
+                    self.speculator = SpeculativeTranslator(
+                        self.translator,
+                        target_language=self.config.get("target_language", "中文"),
+                        debounce=self.config.get("speculation_debounce", 0.4),
+                        min_interval=self.config.get("speculation_min_interval", 1.0),
+                        min_chars=self.config.get("speculation_min_chars", 6),
+                        display_callback=self._on_translate_delta
+                    )
+                    self.speculator.start()
+                
+                if self.config.get("rolling_organize", False):
+                    self.rolling_organizer = RollingOrganizer(
+                        self.translator,
+                        interval=self.config.get("rolling_organize_interval", 120)
+                    )
+                    self.rolling_organizer.start()
+                
                 self.is_running = True
-                self.process_thread = threading.Thread(target=self._process_loop, daemon=True)
-                self.process_thread.start()
+                self.translator.store.mark_recording_start()
+                self.asr_processor.set_result_callback(self._on_asr_result)
+                self.asr_processor.set_glossary(self.translator.glossary)
+                self.asr_processor.set_audio_source(self.audio_capture.ring_buffer)
+                self.asr_processor.apply_latency_profile(profile)
+                self.asr_processor.start()
                 
                 self.signal_bridge.status_updated.emit("运行中")
                 self.signal_bridge.start_finished.emit(True)
@@ -109,42 +138,41 @@ class RealtimeTranslator:
             self.audio_capture.stop()
         if self.asr_processor:
             self.asr_processor.stop()
+        if self.speculator:
+            self.speculator.stop()
+            self.speculator = None
+        if self.rolling_organizer:
+            self.rolling_organizer.stop()
+            self.rolling_organizer = None
         self.translator.stop()
         
-        if self.process_thread:
-            self.process_thread.join(timeout=2)
-        
         self.signal_bridge.status_updated.emit("已停止")
     
-    def _process_loop(self):
-        while self.is_running:
-            try:
-                if not self.audio_capture:
-                    time.sleep(0.1)
-                    continue
-                    
-                audio_chunk = self.audio_capture.get_audio_chunk(timeout=0.1)
-                if audio_chunk is not None and self.asr_processor:
-                    self.asr_processor.add_audio(audio_chunk)
-                
-                if self.asr_processor:
-                    asr_result = self.asr_processor.get_result(timeout=0.05)
-                    if asr_result:
-                        text = asr_result["text"]
-                        self.signal_bridge.original_updated.emit(text)
-                        if asr_result.get("is_final"):
-                            self.translator.add_text(text, self.config.get("target_language", "中文"))
-                
-                translate_result = self.translator.get_result(timeout=0.05)
-                if translate_result:
-                    self.signal_bridge.translated_updated.emit(
-                        translate_result["original"],
-                        translate_result["translated"]
-                    )
-                    
-            except Exception as e:
-                print(f"处理循环错误: {e}")
-                time.sleep(0.1)
+    def _on_asr_result(self, asr_result):
+        if not self.is_running:
+            return
+        text = asr_result["text"]
+        self.signal_bridge.original_updated.emit(text)
+        speculator = self.speculator
+        if not asr_result.get("is_final"):
+            if speculator:
+                speculator.on_partial(text)
+            return
+        speculation = speculator.on_final(text) if speculator else None
+        self.translator.add_text(text, self.config.get("target_language", "中文"), asr_result.get("timing"), speculation)
+    
+    def _on_translate_delta(self, original, partial):
+        self.signal_bridge.translated_delta.emit(original, partial)
+    
+    def _on_translate_result(self, translate_result):
+        timing = translate_result.get("timing")
+        if timing:
+            timing["ui_emit"] = latency.now()
+            latency.tracker.record_timing(timing)
+        self.signal_bridge.translated_updated.emit(
+            translate_result["original"],
+            translate_result["translated"]
+        )
 
 class MainWindow(TranslationBar):
     def __init__(self):
@@ -153,14 +181,19 @@ class MainWindow(TranslationBar):
         self.translator = RealtimeTranslator()
         self.settings_dialog = None
         self.result_dialog = None
+        self.stats_dialog = None
+        self.glossary_dialog = None
         
         self.start_clicked.connect(self.on_start_clicked)
         self.stop_clicked.connect(self.on_stop_clicked)
         self.settings_clicked.connect(self.on_settings_clicked)
         self.result_clicked.connect(self.on_result_clicked)
+        self.stats_clicked.connect(self.on_stats_clicked)
+        self.glossary_clicked.connect(self.on_glossary_clicked)
         
         self.translator.signal_bridge.original_updated.connect(self.update_original_text)
         self.translator.signal_bridge.translated_updated.connect(self.update_translated_text)
+        self.translator.signal_bridge.translated_delta.connect(self.update_translated_delta)
         self.translator.signal_bridge.status_updated.connect(self.update_status)
         self.translator.signal_bridge.start_finished.connect(self.on_start_finished)
     
@@ -178,23 +211,31 @@ class MainWindow(TranslationBar):
     def on_config_saved(self, config):
         save_config(config)
         self.translator.config = config
-        self.translator.translator = Translator(
-            api_key=config.get("api_key", ""),
-            api_base=config.get("api_base", "https://api.deepseek.com"),
-            model=config.get("model", "deepseek-chat"),
-            bypass_proxy=config.get("bypass_proxy", False),
-            translate_api_key=config.get("translate_api_key", ""),
-            translate_api_base=config.get("translate_api_base", "https://api.siliconflow.cn/v1"),
-            translate_model=config.get("translate_model", "Qwen/Qwen3-8B"),
-            organize_api_key=config.get("organize_api_key", ""),
-            organize_api_base=config.get("organize_api_base", "https://api.deepseek.com"),
-            organize_model=config.get("organize_model", "deepseek-chat")
-        )
+        translator = self.translator.translator
+        translator.update_config(**translator_options(config))
+        if self.translator.asr_processor:
+            self.translator.asr_processor.set_glossary(translator.glossary)
+        if self.translator.speculator:
+            self.translator.speculator.target_language = config.get("target_language", "中文")
+        if translator.is_running:
+            threading.Thread(target=translator.warm_up, daemon=True).start()
     
     def on_result_clicked(self):
-        self.result_dialog = ResultDialog(self.translator.translator.get_all_results(), self.translator.translator)
+        self.result_dialog = ResultDialog(self.translator.translator.store, self.translator.translator)
         self.result_dialog.exec()
     
+    def on_stats_clicked(self):
+        self.stats_dialog = StatsDialog(
+            latency.tracker,
+            self.translator.translator.get_cache_stats,
+            self.translator.translator.get_usage_stats
+        )
+        self.stats_dialog.exec()
+    
+    def on_glossary_clicked(self):
+        self.glossary_dialog = GlossaryDialog(get_glossary())
+        self.glossary_dialog.exec()
+    
     def on_start_finished(self, success):
         self.set_running(success)
     
@@ -204,6 +245,9 @@ class MainWindow(TranslationBar):
     def update_translated_text(self, original, translated):
         self.set_translated_text(original, translated)
     
+    def update_translated_delta(self, original, partial):
+        self.set_translated_partial(partial)
+    
     def update_status(self, status):
         self.set_status(status)
 
@@ -223,4 +267,7 @@ if __name__ == "__main__":
     splash.loading_finished.connect(on_loading_finished)
     splash.start_loading()
     
-    sys.exit(app.exec())
+    exit_code = app.exec()
+    exporter.stop_all_live_exports()
+    http_pool.close_all()
+    sys.exit(exit_code)
@@ -0,0 +1,89 @@
+import threading
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent
+ASR_MODEL_DIR = BASE_DIR / "sherpa-onnx-streaming-zipformer-bilingual-zh-en-2023-02-20"
+PUNCT_MODEL_DIR = BASE_DIR / "sherpa-onnx-punct-ct-transformer-zh-en-vocab272727-2024-04-12"
+
+ENDPOINT_CONFIG = {
+    "enable_endpoint_detection": True,
+    "rule1_min_trailing_silence": 2.4,
+    "rule2_min_trailing_silence": 1.2,
+    "rule3_min_utterance_length": 30.0
+}
+
+_lock = threading.Lock()
+_recognizer = None
+_punct_model = None
+_punct_loaded = False
+
+def _model_files(model_dir):
+    model_path = Path(model_dir)
+
+    encoder = str(model_path / "encoder-epoch-99-avg-1.int8.onnx")
+    decoder = str(model_path / "decoder-epoch-99-avg-1.int8.onnx")
+    joiner = str(model_path / "joiner-epoch-99-avg-1.int8.onnx")
+    tokens = str(model_path / "tokens.txt")
+
+    if not all(Path(p).exists() for p in [encoder, decoder, joiner, tokens]):
+        encoder = str(model_path / "encoder-epoch-99-avg-1.onnx")
+        decoder = str(model_path / "decoder-epoch-99-avg-1.onnx")
+        joiner = str(model_path / "joiner-epoch-99-avg-1.onnx")
+
+    return encoder, decoder, joiner, tokens
+
+def create_recognizer(model_dir=None):
+    import sherpa_onnx
+
+    encoder, decoder, joiner, tokens = _model_files(model_dir or ASR_MODEL_DIR)
+
+    return sherpa_onnx.OnlineRecognizer.from_transducer(
+        encoder=encoder,
+        decoder=decoder,
+        joiner=joiner,
+        tokens=tokens,
+        num_threads=4,
+        sample_rate=16000,
+        feature_dim=80,
+        decoding_method="greedy_search",
+        **ENDPOINT_CONFIG
+    )
+
+def create_punct_model(punct_dir=None):
+    punct_dir = Path(punct_dir or PUNCT_MODEL_DIR)
+    if not punct_dir.exists():
+        return None
+
+    try:
+        import sherpa_onnx
+
+        model_config = sherpa_onnx.OfflinePunctuationModelConfig(
+            ct_transformer=str(punct_dir / "model.onnx"),
+            num_threads=2
+        )
+        config = sherpa_onnx.OfflinePunctuationConfig(model=model_config)
+        return sherpa_onnx.OfflinePunctuation(config)
+    except Exception as e:
+        print(f"[Models] 标点模型加载失败 (可选): {e}")
+        return None
+
+def get_recognizer():
+    global _recognizer
+    with _lock:
+        if _recognizer is None:
+            _recognizer = create_recognizer()
+            print(f"[Models] 识别模型加载成功: {ASR_MODEL_DIR}")
+        return _recognizer
+
+def get_punct_model():
+    global _punct_model, _punct_loaded
+    with _lock:
+        if not _punct_loaded:
+            _punct_model = create_punct_model()
+            _punct_loaded = True
+            if _punct_model:
+                print("[Models] 标点模型加载成功")
+        return _punct_model
+
+def is_loaded():
+    return _recognizer is not None and _punct_loaded
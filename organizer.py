@@ -0,0 +1,266 @@
+import hashlib
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from translator import estimate_tokens
+
+OVERLAP_LINES = 2
+
+def split_chunks(lines, max_tokens, overlap_lines=OVERLAP_LINES):
+    # line-aligned chunks of at most max_tokens; each chunk carries the last
+    # `overlap_lines` lines of the previous one as read-only context
+    chunks = []
+    current = []
+    current_tokens = 0
+    for line in lines:
+        cost = estimate_tokens(line) + 1
+        if current and current_tokens + cost > max_tokens:
+            chunks.append(current)
+            current = []
+            current_tokens = 0
+        current.append(line)
+        current_tokens += cost
+    if current:
+        chunks.append(current)
+
+    result = []
+    for i, chunk in enumerate(chunks):
+        context = chunks[i - 1][-overlap_lines:] if i and overlap_lines else []
+        result.append(("\n".join(context), "\n".join(chunk)))
+    return result
+
+def _content_key(kind, model, *parts):
+    raw = "\x1f".join([kind, model or ""] + list(parts))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+def group_for_reduce(texts, max_tokens):
+    groups = []
+    current = []
+    current_tokens = 0
+    for text in texts:
+        cost = estimate_tokens(text)
+        if current and current_tokens + cost > max_tokens:
+            groups.append(current)
+            current = []
+            current_tokens = 0
+        current.append(text)
+        current_tokens += cost
+    if current:
+        groups.append(current)
+    return groups
+
+class OrganizeCache:
+    # content hash -> organized text, shared by every run of one translator. The
+    # cache holds one transcript's worth of chunks instead of growing all day:
+    # once the last of a set of overlapping runs finishes, entries none of them
+    # used are dropped, so a rolling and a manual run never prune each other's
+    def __init__(self):
+        self._entries = {}
+        self._used = set()
+        self._active = 0
+        self._completed = False
+        self._lock = threading.Lock()
+
+    def begin(self):
+        with self._lock:
+            self._active += 1
+
+    def end(self, completed):
+        # cancelled runs keep the cache as it was
+        with self._lock:
+            self._active -= 1
+            self._completed = self._completed or completed
+            if self._active:
+                return
+            if self._completed:
+                for key in [k for k in self._entries if k not in self._used]:
+                    del self._entries[key]
+            self._used.clear()
+            self._completed = False
+
+    def get(self, key):
+        with self._lock:
+            self._used.add(key)
+            return self._entries.get(key)
+
+    def put(self, key, text):
+        with self._lock:
+            self._used.add(key)
+            self._entries[key] = text
+
+    def __len__(self):
+        return len(self._entries)
+
+class OrganizePipeline:
+    def __init__(self, translator, endpoints, concurrency=4, chunk_tokens=3000, reduce_tokens=6000,
+                 retries=2, progress_callback=None, is_cancelled=None, cache=None):
+        self.translator = translator
+        self.endpoints = endpoints
+        self.concurrency = max(1, concurrency)
+        self.chunk_tokens = chunk_tokens
+        self.reduce_tokens = reduce_tokens
+        self.retries = retries
+        self.progress_callback = progress_callback
+        self.is_cancelled = is_cancelled or (lambda: False)
+        self.failed_chunks = 0
+        # chunks are split greedily from the start, so appending lines only
+        # changes the tail and earlier chunks hit
+        self.cache = cache if cache is not None else OrganizeCache()
+        self.reused = 0
+        self.requests = 0
+
+    def _cached_call(self, key, func, *args):
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.reused += 1
+            return cached, None
+        self.requests += 1
+        result, error = self._call(func, *args)
+        if error is None:
+            self.cache.put(key, result)
+        return result, error
+
+    def _call(self, func, *args):
+        error = None
+        for attempt in range(self.retries + 1):
+            if self.is_cancelled():
+                return None, "已取消"
+            result, error = func(*args)
+            if error is None:
+                return result, None
+            print(f"[Organizer] 第 {attempt + 1} 次请求失败: {error}")
+            if attempt < self.retries:
+                time.sleep(min(8.0, 2 ** attempt) * random.uniform(0.5, 1.0))
+        return None, error
+
+    def _progress(self, parts, stage):
+        if self.progress_callback:
+            try:
+                self.progress_callback("\n\n".join(parts), stage)
+            except Exception as e:
+                print(f"[Organizer] 进度回调错误: {e}")
+
+    def run(self, translations):
+        self.cache.begin()
+        completed = False
+        try:
+            result = self._run(translations)
+            completed = result[1] is None
+            return result
+        finally:
+            self.cache.end(completed)
+
+    def _run(self, translations):
+        lines = [t.get("translated", "") for t in translations]
+        chunks = split_chunks(lines, self.chunk_tokens)
+        total = len(chunks)
+        print(f"[Organizer] 分段整理: {total} 段, 并发 {self.concurrency}")
+
+        model = self.endpoints[0][1]
+        parts = []
+        pending = []
+        for i, (context, chunk) in enumerate(chunks):
+            key = _content_key("chunk", model, context, chunk)
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.reused += 1
+                parts.append(cached)
+            else:
+                parts.append(f"[第{i + 1}段整理中...]")
+                pending.append((i, key))
+        done = total - len(pending)
+        self._progress(parts, f"整理中 {done}/{total}")
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            futures = {
+                pool.submit(self._cached_call, key, self.translator._organize_chunk,
+                            chunks[i][1], self.endpoints, chunks[i][0]): i
+                for i, key in pending
+            }
+            for future in as_completed(futures):
+                i = futures[future]
+                result, error = future.result()
+                if error is not None:
+                    # keep the unorganized text rather than losing the whole run
+                    self.failed_chunks += 1
+                    result = chunks[i][1]
+                parts[i] = result
+                done += 1
+                self._progress(parts, f"整理中 {done}/{total}")
+
+        if self.is_cancelled():
+            return None, "已取消"
+
+        texts = parts
+        level = 0
+        while len(texts) > 1:
+            groups = group_for_reduce(texts, self.reduce_tokens)
+            if all(len(g) == 1 for g in groups):
+                break
+            level += 1
+            print(f"[Organizer] 第 {level} 层整合: {len(texts)} -> {len(groups)} 段")
+            self._progress(texts, f"整合中 (第{level}层)")
+            with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                futures = [
+                    pool.submit(self._cached_call, _content_key("merge", model, *group),
+                                self.translator._merge_chunks, group, self.endpoints) if len(group) > 1
+                    else None
+                    for group in groups
+                ]
+                merged = []
+                for group, future in zip(groups, futures):
+                    if future is None:
+                        merged.append(group[0])
+                        continue
+                    result, error = future.result()
+                    merged.append(result if error is None else "\n\n".join(group))
+            if self.is_cancelled():
+                return None, "已取消"
+            texts = merged
+
+        if self.failed_chunks:
+            print(f"[Organizer] {self.failed_chunks} 段整理失败，已保留原文")
+        print(f"[Organizer] 完成: 请求 {self.requests} 次, 复用缓存 {self.reused} 段")
+        return "\n\n".join(texts), None
+
+class RollingOrganizer:
+    # re-organizes the live transcript in the background whenever enough new
+    # lines have arrived; only the changed tail costs requests thanks to the cache
+    def __init__(self, translator, interval=120.0, min_new_lines=10):
+        self.translator = translator
+        self.interval = interval
+        self.min_new_lines = min_new_lines
+        self.is_running = False
+        self.thread = None
+        self._wakeup = threading.Event()
+        self._organized_lines = 0
+
+    def start(self):
+        if self.is_running:
+            return
+        self.is_running = True
+        self._wakeup.clear()
+        self.thread = threading.Thread(target=self._process_thread, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.is_running = False
+        self._wakeup.set()
+        if self.thread:
+            self.thread.join(timeout=2)
+
+    def _process_thread(self):
+        while self.is_running:
+            self._wakeup.wait(timeout=self.interval)
+            if not self.is_running:
+                break
+            # counting is free; the session is only read back once enough is new
+            if self.translator.store.count() - self._organized_lines < self.min_new_lines:
+                continue
+            results = self.translator.get_all_results()
+            _, error = self.translator.organize_results(results, is_cancelled=lambda: not self.is_running)
+            if error:
+                print(f"[Organizer] 后台整理失败: {error}")
+            else:
+                self._organized_lines = len(results)
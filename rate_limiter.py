@@ -0,0 +1,203 @@
+import heapq
+import itertools
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+PRIORITY_LIVE = 0
+PRIORITY_SPECULATION = 1
+PRIORITY_ORGANIZE = 2
+
+PRIORITY_NAMES = {PRIORITY_LIVE: "实时", PRIORITY_SPECULATION: "预翻译", PRIORITY_ORGANIZE: "整理"}
+
+def retry_after_seconds(error):
+    # Retry-After may be seconds or an HTTP date; OpenAI-style APIs also send retry-after-ms
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class TokenBucket:
+    def __init__(self, per_minute, burst_seconds=10.0):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.tokens = self.capacity
+        self.last = time.monotonic()
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+
+    def wait_time(self, amount, floor=0.0):
+        # seconds until `amount` can be taken while keeping `floor` in the bucket
+        missing = amount + floor - self.tokens
+        return 0.0 if missing <= 0 else missing / self.rate
+
+class EndpointLimiter:
+    # requests-per-minute and tokens-per-minute buckets for one API base. Waiters
+    # are served strictly by priority, and lower priorities may not dip into the
+    # reserved share of either bucket, so organize jobs never starve live captions
+    def __init__(self, name, rpm=0, tpm=0, reserve=0.2, burst_seconds=10.0):
+        self.name = name
+        self.reserve = reserve
+        self.requests = TokenBucket(rpm, burst_seconds) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm, burst_seconds) if tpm > 0 else None
+        self.paused_until = 0.0
+        self._cond = threading.Condition()
+        self._waiters = []
+        self._order = itertools.count()
+        self.waiting = {}
+        self.acquired = 0
+        self.throttled = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.pauses = 0
+        self.cancelled = 0
+
+    def _buckets(self, cost):
+        return [(b, amount) for b, amount in ((self.requests, 1.0), (self.tokens, cost)) if b is not None]
+
+    def _wait_time(self, cost, priority, now):
+        wait = max(0.0, self.paused_until - now)
+        for bucket, amount in self._buckets(cost):
+            bucket.refill(now)
+            floor = bucket.capacity * self.reserve if priority > PRIORITY_LIVE else 0.0
+            # a single request larger than the bucket would otherwise wait forever
+            amount = min(amount, bucket.capacity - floor)
+            wait = max(wait, bucket.wait_time(amount, floor))
+        return wait
+
+    def acquire(self, cost, priority=PRIORITY_LIVE, is_cancelled=None):
+        # returns the seconds waited, or None if is_cancelled() turned true while
+        # queued, in which case nothing was taken from the buckets
+        start = time.monotonic()
+        entry = (priority, next(self._order))
+        cancelled = False
+        with self._cond:
+            heapq.heappush(self._waiters, entry)
+            self.waiting[priority] = self.waiting.get(priority, 0) + 1
+            try:
+                while True:
+                    if is_cancelled is not None and is_cancelled():
+                        self._waiters.remove(entry)
+                        heapq.heapify(self._waiters)
+                        cancelled = True
+                        break
+                    now = time.monotonic()
+                    wait = self._wait_time(cost, priority, now)
+                    if self._waiters[0] == entry and wait <= 0:
+                        for bucket, amount in self._buckets(cost):
+                            bucket.tokens -= min(amount, bucket.capacity)
+                        heapq.heappop(self._waiters)
+                        break
+                    # woken early whenever someone ahead is served or a pause changes;
+                    # cancellation is only a flag, so cancellable waiters also poll it
+                    timeout = wait if self._waiters[0] == entry else 0.5
+                    self._cond.wait(timeout=min(timeout, 0.1) if is_cancelled is not None else timeout)
+            finally:
+                self.waiting[priority] -= 1
+                self._cond.notify_all()
+        if cancelled:
+            self.cancelled += 1
+            return None
+        waited = time.monotonic() - start
+        self.acquired += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        if waited > 0.01:
+            self.throttled += 1
+        return waited
+
+    def refund(self, cost):
+        # give back a permit whose request was never sent
+        with self._cond:
+            for bucket, amount in self._buckets(cost):
+                bucket.tokens = min(bucket.capacity, bucket.tokens + min(amount, bucket.capacity))
+            self._cond.notify_all()
+
+    def settle(self, estimated, actual):
+        # charge or refund the difference once the real token count is known
+        if self.tokens is None or actual is None:
+            return
+        with self._cond:
+            self.tokens.tokens = min(self.tokens.capacity, self.tokens.tokens - (actual - estimated))
+            self._cond.notify_all()
+
+    def pause(self, seconds):
+        with self._cond:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.pauses += 1
+            self._cond.notify_all()
+        print(f"[RateLimit] {self.name} 被限流，暂停 {seconds:.1f}s")
+
+    def get_stats(self):
+        with self._cond:
+            return {
+                "queue": {PRIORITY_NAMES.get(p, p): n for p, n in self.waiting.items() if n},
+                "acquired": self.acquired,
+                "throttled": self.throttled,
+                "avg_wait": self.total_wait / self.acquired if self.acquired else 0.0,
+                "max_wait": self.max_wait,
+                "pauses": self.pauses,
+                "cancelled": self.cancelled
+            }
+
+class RateLimiter:
+    def __init__(self, rpm=0, tpm=0, overrides=None, reserve=0.2, burst_seconds=10.0):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.overrides = overrides or {}
+        self.reserve = reserve
+        self.burst_seconds = burst_seconds
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def limiter(self, api_base):
+        # provider limits apply per account, so all models on one base share a limiter
+        key = (api_base or "").rstrip("/")
+        with self._lock:
+            if key not in self._limiters:
+                limits = self.overrides.get(key, self.overrides.get(key + "/", {}))
+                self._limiters[key] = EndpointLimiter(
+                    key,
+                    rpm=limits.get("rpm", self.rpm),
+                    tpm=limits.get("tpm", self.tpm),
+                    reserve=self.reserve,
+                    burst_seconds=self.burst_seconds
+                )
+            return self._limiters[key]
+
+    def configure(self, rpm, tpm, overrides=None, reserve=0.2):
+        # limiters are rebuilt lazily with the new limits; unchanged settings keep
+        # the current buckets and their statistics
+        overrides = overrides or {}
+        with self._lock:
+            if (rpm, tpm, overrides, reserve) == (self.rpm, self.tpm, self.overrides, self.reserve):
+                return
+            self.rpm = rpm
+            self.tpm = tpm
+            self.overrides = overrides
+            self.reserve = reserve
+            self._limiters = {}
+
+    def get_stats(self):
+        with self._lock:
+            limiters = dict(self._limiters)
+        return {key: limiter.get_stats() for key, limiter in limiters.items()}
@@ -0,0 +1,134 @@
+from math import gcd
+
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+class StreamingResampler:
+    def __init__(self, orig_sr, target_sr, num_zeros=8, rolloff=0.9, beta=8.0, block_size=4096, min_period_outputs=32):
+        self.orig_sr = int(orig_sr)
+        self.target_sr = int(target_sr)
+
+        g = gcd(self.orig_sr, self.target_sr)
+        self.up = self.target_sr // g
+        self.down = self.orig_sr // g
+
+        self.filters = self._design_filters(num_zeros, rolloff, beta)
+        self.taps = self.filters.shape[1]
+
+        repeats = -(-min_period_outputs // self.up)
+        self.period_out = self.up * repeats
+        self.period_in = self.down * repeats
+        self.window = self.period_in + self.taps - 1
+        self.bands = self._build_bands(max(1, block_size // self.period_in))
+
+        self._history = self.taps - 1
+        self._count = self._history
+        self._capacity = 0
+        self._buf = None
+        self._out = None
+        self._reserve(block_size)
+
+    def _design_filters(self, num_zeros, rolloff, beta):
+        L, M = self.up, self.down
+        cutoff = rolloff * 0.5 / max(L, M)
+        half = num_zeros * max(L, M)
+        taps = -(-(2 * half + 1) // L)
+        length = taps * L
+
+        n = np.arange(length) - half
+        h = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(length, beta)
+        h *= L / h.sum()
+
+        # filters[p, j] multiplies x[base - (taps - 1 - j)] for output phase p
+        filters = h.reshape(taps, L).T[:, ::-1]
+        return np.ascontiguousarray(filters, dtype=np.float32)
+
+    def _band_rows(self, start, end):
+        # output k reads taps samples starting at offset (k * down) // up of the period window
+        first = (start * self.down) // self.up
+        return first, ((end - 1) * self.down) // self.up + self.taps - first
+
+    def _build_bands(self, periods_per_block):
+        # A single period matrix is mostly zeros (each column holds only taps values),
+        # so outputs are split into bands of consecutive columns, each reading just
+        # its own slice of the window. More bands waste fewer multiplies but cost a
+        # matmul call each; pick the count with the lowest estimate of both.
+        call_cost = 50000 / periods_per_block
+        best = None
+        for count in range(1, min(self.period_out, 32) + 1):
+            edges = [self.period_out * i // count for i in range(count + 1)]
+            macs = sum(self._band_rows(a, b)[1] * (b - a) for a, b in zip(edges, edges[1:]))
+            cost = macs + count * call_cost
+            if best is None or cost < best[0]:
+                best = (cost, edges)
+
+        edges = best[1]
+        bands = []
+        for start, end in zip(edges, edges[1:]):
+            first, rows = self._band_rows(start, end)
+            matrix = np.zeros((rows, end - start), dtype=np.float32)
+            for k in range(start, end):
+                offset = (k * self.down) // self.up - first
+                matrix[offset:offset + self.taps, k - start] = self.filters[(k * self.down) % self.up]
+            bands.append((first, start, end, matrix))
+        return bands
+
+    def _reserve(self, block_size):
+        if block_size <= self._capacity:
+            return
+        self._capacity = block_size
+
+        buf = np.zeros(self._history + self.period_in + block_size, dtype=np.float32)
+        if self._buf is not None:
+            buf[:self._count] = self._buf[:self._count]
+        self._buf = buf
+
+        max_periods = (len(buf) - self.window) // self.period_in + 1
+        self._out = np.empty((max_periods, self.period_out), dtype=np.float32)
+        # strided views of the buffer, one row per period, built once instead of per block
+        step = buf.strides[0]
+        self._views = [
+            as_strided(buf[first:], shape=(max_periods, matrix.shape[0]), strides=(self.period_in * step, step))
+            for first, _, _, matrix in self.bands
+        ]
+
+    def output_length(self, num_samples):
+        periods = (self._count + num_samples - self._history) // self.period_in
+        return max(periods, 0) * self.period_out
+
+    def process(self, samples, out=None):
+        if self.up == self.down:
+            if out is None:
+                return samples
+            out[:len(samples)] = samples
+            return out[:len(samples)]
+
+        count = len(samples)
+        self._reserve(count)
+        buf = self._buf
+        end = self._count + count
+        buf[self._count:end] = samples
+
+        periods = (end - self._history) // self.period_in
+        n = periods * self.period_out
+
+        if periods > 0:
+            rows = self._out[:periods]
+            for view, (_, start, stop, matrix) in zip(self._views, self.bands):
+                np.matmul(view[:periods], matrix, out=rows[:, start:stop])
+
+        consumed = periods * self.period_in
+        remaining = end - consumed
+        buf[:remaining] = buf[consumed:end]
+        self._count = remaining
+
+        result = self._out.reshape(-1)[:n]
+        if out is None:
+            return result
+        out[:n] = result
+        return out[:n]
+
+    def reset(self):
+        if self._buf is not None:
+            self._buf[:self._history] = 0.0
+        self._count = self._history
@@ -0,0 +1,125 @@
+import threading
+import time
+from collections import deque
+import numpy as np
+
+class RingBuffer:
+    # Single producer / single consumer. The storage is mirrored (every frame is
+    # written twice, capacity apart) so any readable span is one contiguous view.
+    def __init__(self, capacity, dtype=np.float32):
+        self.capacity = int(capacity)
+        self._data = np.zeros(self.capacity * 2, dtype=dtype)
+        self._write_pos = 0
+        self._read_pos = 0
+        self._event = threading.Event()
+        self._timestamps = deque(maxlen=4096)
+        self.overruns = 0
+        self.dropped_frames = 0
+        # set by the producer once a finite stream has ended
+        self.closed = False
+
+    def available(self):
+        return self._write_pos - self._read_pos
+
+    def frames_written(self):
+        return self._write_pos
+
+    def free(self):
+        return self.capacity - self.available()
+
+    def write(self, samples):
+        count = len(samples)
+        free = self.free()
+        if count > free:
+            self.overruns += 1
+            self.dropped_frames += count - free
+            samples = samples[:free]
+            count = free
+        if count == 0:
+            return 0
+
+        cap = self.capacity
+        idx = self._write_pos % cap
+        data = self._data
+        end = idx + count
+        head = min(end, cap)
+        data[idx:end] = samples
+        data[idx + cap:head + cap] = samples[:head - idx]
+        if end > cap:
+            data[:end - cap] = samples[head - idx:]
+
+        self._write_pos += count
+        self._timestamps.append((self._write_pos, time.monotonic()))
+        self._event.set()
+        return count
+
+    def peek(self, count=None):
+        available = self.available()
+        if count is None or count > available:
+            count = available
+        idx = self._read_pos % self.capacity
+        return self._data[idx:idx + count]
+
+    def advance(self, count):
+        self._read_pos += min(count, self.available())
+
+    def capture_time(self):
+        # monotonic time at which the oldest unread frame was written
+        pos = self._read_pos
+        timestamps = self._timestamps
+        while len(timestamps) > 1 and timestamps[0][0] <= pos:
+            timestamps.popleft()
+        if timestamps and timestamps[0][0] > pos:
+            return timestamps[0][1]
+        return None
+
+    def read(self, count=None):
+        view = self.peek(count)
+        chunk = view.copy()
+        self.advance(len(chunk))
+        return chunk
+
+    def _ready(self, min_frames):
+        # a closed stream hands out whatever is left, however short
+        available = self.available()
+        return available >= min_frames or (self.closed and available > 0)
+
+    def wait(self, min_frames=1, timeout=None):
+        # False on timeout, or at once when the stream is closed and drained
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if self._ready(min_frames):
+                return True
+            self._event.clear()
+            if self._ready(min_frames):
+                return True
+            if self.closed:
+                return False
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            if not self._event.wait(remaining):
+                return self._ready(min_frames)
+
+    def close(self):
+        self.closed = True
+        self._event.set()
+
+    def notify(self):
+        self._event.set()
+
+    def reset(self):
+        self._write_pos = 0
+        self._read_pos = 0
+        self.closed = False
+        self._timestamps.clear()
+        self.overruns = 0
+        self.dropped_frames = 0
+
+    def get_stats(self):
+        return {
+            "capacity": self.capacity,
+            "available": self.available(),
+            "overruns": self.overruns,
+            "dropped_frames": self.dropped_frames
+        }
@@ -0,0 +1,340 @@
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, wait, FIRST_COMPLETED
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# client errors that neither a retry nor another endpoint can fix
+PERMANENT_STATUS = {400, 401, 403, 404, 422}
+
+def endpoint_key(endpoint):
+    _, model, api_base = endpoint
+    return f"{(api_base or '').rstrip('/')}|{model}"
+
+def status_code(error):
+    return getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+
+class RequestCancelled(Exception):
+    # raised by a request function that gave up before a response arrived; the
+    # attempt says nothing about the endpoint and is neither retried nor recorded
+    pass
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+class StreamRace:
+    # streamed attempts at the same request race to their first token: the first
+    # to claim() owns the output, and the responses of the others are closed so
+    # they stop before emitting anything
+    def __init__(self, on_claim=None):
+        self.winner = None
+        self.first_token_at = None
+        self.on_claim = on_claim
+        self._responses = []
+        self._lock = threading.Lock()
+
+    def attach(self, response):
+        with self._lock:
+            if self.winner is None:
+                self._responses.append(response)
+                return
+        _close(response)
+
+    def claim(self, response):
+        with self._lock:
+            if self.winner is None:
+                self.winner = response
+                self.first_token_at = time.monotonic()
+                losers = [r for r in self._responses if r is not response]
+            elif self.winner is not response:
+                return False
+            else:
+                return True
+        for loser in losers:
+            _close(loser)
+        if self.on_claim is not None:
+            self.on_claim()
+        return True
+
+    def lost(self, response):
+        with self._lock:
+            return self.winner is not None and self.winner is not response
+
+def _close(response):
+    close = getattr(response, "close", None)
+    if close:
+        try:
+            close()
+        except Exception:
+            pass
+
+class EndpointHealth:
+    def __init__(self, window=200):
+        # complete responses and full streams take very different times, so
+        # complete requests are hedged on the former and streams on their first token
+        self.latencies = deque(maxlen=window)
+        self.stream_latencies = deque(maxlen=window)
+        self.first_token_latencies = deque(maxlen=window)
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.open_until = 0.0
+        self.probing = False
+        self.last_error = None
+
+    def samples(self, stream=False, first_token=False):
+        if first_token:
+            return self.first_token_latencies
+        return self.stream_latencies if stream else self.latencies
+
+    def p95(self, stream=False, first_token=False):
+        samples = self.samples(stream, first_token)
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+class EndpointRouter:
+    # failover across an ordered list of (client, model, api_base) endpoints:
+    # failures trip a per-endpoint circuit, retries move on to the next healthy
+    # endpoint after a jittered backoff, and a slow primary can be hedged
+    def __init__(self, retries=2, failure_threshold=3, reset_seconds=30.0, hedging=True,
+                 hedge_min_samples=20, hedge_min_delay=0.3, backoff_base=0.2, backoff_max=2.0):
+        self.retries = retries
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.hedging = hedging
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_min_delay = hedge_min_delay
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+        self._health = {}
+        self._lock = threading.Lock()
+
+    def health(self, endpoint):
+        key = endpoint_key(endpoint)
+        with self._lock:
+            if key not in self._health:
+                self._health[key] = EndpointHealth()
+            return self._health[key]
+
+    def p95(self, endpoint, stream=False):
+        health = self.health(endpoint)
+        with self._lock:
+            return health.p95(stream)
+
+    def _available(self, endpoint, now):
+        # closed, or open past its reset time with no probe in flight yet
+        health = self.health(endpoint)
+        with self._lock:
+            return health.state == CLOSED or (not health.probing and now >= health.open_until)
+
+    def order(self, endpoints):
+        # healthy endpoints in their configured order; if every circuit is open,
+        # still try the one that opened first rather than failing outright
+        now = time.monotonic()
+        ready = [e for e in endpoints if self._available(e, now)]
+        if ready:
+            return ready
+        return sorted(endpoints, key=lambda e: (self.health(e).probing, self.health(e).open_until))[:1]
+
+    def _claim(self, endpoint):
+        # an open circuit past its reset time admits exactly one probe, whose
+        # outcome closes or re-opens it; everyone else keeps seeing it open.
+        # Returns whether this attempt is the probe
+        health = self.health(endpoint)
+        with self._lock:
+            if health.state == CLOSED:
+                return False
+            if health.probing:
+                raise CircuitOpenError(f"端点熔断中: {endpoint_key(endpoint)}")
+            if time.monotonic() >= health.open_until:
+                health.state = HALF_OPEN
+                health.probing = True
+                return True
+            # every circuit is open and this one was picked anyway
+            return False
+
+    def _release(self, endpoint):
+        # a probe that ended without a verdict lets the next caller probe instead
+        health = self.health(endpoint)
+        with self._lock:
+            health.probing = False
+
+    def record_success(self, endpoint, elapsed, stream=False):
+        health = self.health(endpoint)
+        with self._lock:
+            health.samples(stream).append(elapsed)
+            health.successes += 1
+            health.probing = False
+            health.consecutive_failures = 0
+            if health.state != CLOSED:
+                print(f"[Router] 端点恢复: {endpoint_key(endpoint)}")
+            health.state = CLOSED
+
+    def record_first_token(self, endpoint, elapsed):
+        health = self.health(endpoint)
+        with self._lock:
+            health.first_token_latencies.append(elapsed)
+
+    def record_failure(self, endpoint, error):
+        health = self.health(endpoint)
+        with self._lock:
+            health.failures += 1
+            health.consecutive_failures += 1
+            health.last_error = str(error)
+            health.probing = False
+            if health.state == HALF_OPEN or health.consecutive_failures >= self.failure_threshold:
+                if health.state != OPEN:
+                    print(f"[Router] 端点熔断 {self.reset_seconds:.0f}s: {endpoint_key(endpoint)}: {error}")
+                health.state = OPEN
+                health.open_until = time.monotonic() + self.reset_seconds
+
+    def _attempt(self, endpoint, func, stream=False, race=None):
+        # a streamed request is called as func(endpoint, race) and must claim the
+        # race before it emits its first token
+        self._claim(endpoint)
+        start = time.monotonic()
+        try:
+            if stream:
+                race = race if race is not None else StreamRace()
+                result = func(endpoint, race)
+            else:
+                result = func(endpoint)
+        except RequestCancelled:
+            self._release(endpoint)
+            raise
+        except Exception as e:
+            # a rejected request (bad input, content moderation, auth) says nothing
+            # about the endpoint's health
+            if status_code(e) in PERMANENT_STATUS:
+                self._release(endpoint)
+            else:
+                self.record_failure(endpoint, e)
+            raise
+        if stream and race.first_token_at is not None:
+            self.record_first_token(endpoint, race.first_token_at - start)
+        self.record_success(endpoint, time.monotonic() - start, stream)
+        return result
+
+    def _hedge_delay(self, endpoint, stream=False):
+        # the endpoint's own p95, or the best known one while it has too few
+        # samples; a stream is measured to its first token
+        health = self.health(endpoint)
+        with self._lock:
+            if len(health.samples(first_token=stream)) >= self.hedge_min_samples:
+                p95 = health.p95(first_token=stream)
+            else:
+                known = [h.p95(first_token=stream) for h in self._health.values()
+                         if len(h.samples(first_token=stream)) >= self.hedge_min_samples]
+                p95 = min(known) if known else None
+        return None if p95 is None else max(self.hedge_min_delay, p95)
+
+    def _spawn(self, endpoint, func, stream, race):
+        # each hedged attempt gets its own daemon thread rather than a slot in a
+        # bounded pool: a loser stuck until the read timeout must not make new
+        # calls queue behind it
+        future = Future()
+
+        def run():
+            try:
+                future.set_result(self._attempt(endpoint, func, stream, race))
+            except BaseException as e:
+                future.set_exception(e)
+
+        threading.Thread(target=run, daemon=True, name="hedge").start()
+        return future
+
+    def _hedged(self, primary, secondary, func, stream=False):
+        # fire the primary; if it has not answered (or, streamed, not sent its
+        # first token) within its p95, fire the same request at the secondary and
+        # return whichever succeeds first. A complete request cannot be aborted
+        # and simply finishes in the background; a losing stream is closed
+        delay = self._hedge_delay(primary, stream)
+        if delay is None:
+            # too few samples to hedge on: no reason to leave the calling thread
+            return self._attempt(primary, func, stream), primary
+        started = threading.Event()
+        race = StreamRace(on_claim=started.set) if stream else None
+        first = self._spawn(primary, func, stream, race)
+        first.add_done_callback(lambda _: started.set())
+        if started.wait(delay):
+            return first.result(), primary
+        self.hedges += 1
+        second = self._spawn(secondary, func, stream, race)
+        owners = {first: primary, second: secondary}
+        pending = set(owners)
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is second:
+                        self.hedge_wins += 1
+                    return future.result(), owners[future]
+                # a stream closed for losing the race is not why the request failed
+                if error is None or not isinstance(future.exception(), RequestCancelled):
+                    error = future.exception()
+        raise error
+
+    def call(self, endpoints, func, hedge=False, retries=None, stream=False):
+        # returns (result, endpoint used); raises the last error once every attempt
+        # failed. `stream` marks calls whose latency covers a whole streamed reply
+        retries = self.retries if retries is None else retries
+        error = None
+        for attempt in range(retries + 1):
+            ordered = self.order(endpoints)
+            # each retry moves one endpoint further down the list
+            index = min(attempt, len(ordered) - 1) if len(ordered) > 1 else 0
+            endpoint = ordered[index]
+            if endpoint is not endpoints[0]:
+                self.failovers += 1
+            try:
+                if hedge and self.hedging and len(ordered) > 1:
+                    # the next endpoint, or the first one once a retry has reached the end
+                    return self._hedged(endpoint, ordered[(index + 1) % len(ordered)], func, stream)
+                return self._attempt(endpoint, func, stream), endpoint
+            except RequestCancelled:
+                raise
+            except CircuitOpenError as e:
+                # another caller is probing it; the next attempt skips it without a backoff
+                error = e
+                continue
+            except Exception as e:
+                error = e
+                print(f"[Router] 请求失败 ({attempt + 1}/{retries + 1}) {endpoint_key(endpoint)}: {e}")
+                if status_code(e) in PERMANENT_STATUS:
+                    # the same request would be rejected again, elsewhere too
+                    break
+            if attempt < retries:
+                time.sleep(min(self.backoff_max, self.backoff_base * 2 ** attempt) * random.uniform(0.5, 1.0))
+        raise error
+
+    def get_stats(self):
+        with self._lock:
+            endpoints = {
+                key: {
+                    "state": h.state,
+                    "successes": h.successes,
+                    "failures": h.failures,
+                    "p95": h.p95(),
+                    "stream_p95": h.p95(stream=True),
+                    "first_token_p95": h.p95(first_token=True),
+                    "last_error": h.last_error
+                }
+                for key, h in self._health.items()
+            }
+        return {
+            "endpoints": endpoints,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "failovers": self.failovers
+        }
@@ -0,0 +1,353 @@
+import sqlite3
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+SESSION_FILE = Path(__file__).parent / "sessions.db"
+
+COLUMNS = "idx, original, translated, start, end, created"
+
+def _row_to_entry(row):
+    return {
+        "index": row[0],
+        "original": row[1],
+        "translated": row[2],
+        "start": row[3],
+        "end": row[4],
+        "time": row[5]
+    }
+
+def _bigrams(text):
+    # every two-character window of each run of letters/digits, space separated, so
+    # two-character terms (most CJK words) can be looked up in their own FTS table
+    grams = []
+    run = []
+    for ch in (text or "") + " ":
+        if ch.isalnum():
+            run.append(ch)
+            continue
+        grams += [run[i] + run[i + 1] for i in range(len(run) - 1)]
+        run = []
+    return " ".join(grams)
+
+def _fts_phrase(terms):
+    return " AND ".join('"' + t.replace('"', '""') + '"' for t in terms)
+
+def _wall_times(timing, wall_now, mono_now):
+    # timing stamps are monotonic; map them onto wall-clock time
+    if not timing:
+        return wall_now, wall_now
+    # cues start where speech was first recognized, not at the silence before it
+    start = timing.get("speech_start", timing.get("capture", timing.get("endpoint")))
+    end = timing.get("endpoint", start)
+    if start is None:
+        return wall_now, wall_now
+    return wall_now - (mono_now - start), wall_now - (mono_now - end)
+
+class SessionStore:
+    # append-only transcript log; only the last `window` entries stay in memory,
+    # everything else is read back from SQLite page by page
+    def __init__(self, path=SESSION_FILE, window=200, retention_days=30):
+        self.path = path
+        self.window = window
+        self.retention = retention_days * 86400
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=window)
+        self._count = 0
+        self._listeners = []
+        self._conn = sqlite3.connect(str(path) if path else ":memory:", check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.create_function("bigrams", 1, _bigrams, deterministic=True)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, started REAL, ended REAL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, session_id INTEGER, idx INTEGER, "
+            "original TEXT, translated TEXT, start REAL, end REAL, created REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_session ON entries(session_id, idx)")
+        self.fts_available = self._init_fts()
+        self.bigram_available = self.fts_available and self._init_bigram_index()
+        self.session_id = None
+        self._prune()
+        self.new_session()
+
+    def _init_fts(self):
+        # trigram tokens index CJK text without word segmentation; needs SQLite 3.34+
+        exists = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'entries_fts'"
+        ).fetchone()
+        if exists:
+            return True
+        try:
+            self._conn.execute(
+                "CREATE VIRTUAL TABLE entries_fts USING fts5("
+                "original, translated, content='entries', content_rowid='id', tokenize='trigram')"
+            )
+        except sqlite3.OperationalError as e:
+            print(f"[Store] 全文索引不可用，搜索将使用逐条匹配: {e}")
+            return False
+        self._conn.execute(
+            "CREATE TRIGGER entries_fts_insert AFTER INSERT ON entries BEGIN "
+            "INSERT INTO entries_fts(rowid, original, translated) VALUES (new.id, new.original, new.translated); END"
+        )
+        self._conn.execute(
+            "CREATE TRIGGER entries_fts_delete AFTER DELETE ON entries BEGIN "
+            "INSERT INTO entries_fts(entries_fts, rowid, original, translated) "
+            "VALUES ('delete', old.id, old.original, old.translated); END"
+        )
+        self._conn.execute("INSERT INTO entries_fts(entries_fts) VALUES ('rebuild')")
+        self._conn.commit()
+        return True
+
+    def _init_bigram_index(self):
+        # trigrams cannot match two-character terms; a contentless table of
+        # pre-split bigrams covers them. The bigrams() SQL function is registered
+        # on this connection, so only this store may write to the entries table
+        exists = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'entries_bigram'"
+        ).fetchone()
+        if exists:
+            return True
+        try:
+            self._conn.execute(
+                "CREATE VIRTUAL TABLE entries_bigram USING fts5(grams, content='', tokenize='unicode61')"
+            )
+        except sqlite3.OperationalError as e:
+            print(f"[Store] 双字索引不可用，两字搜索将使用逐条匹配: {e}")
+            return False
+        self._conn.execute(
+            "CREATE TRIGGER entries_bigram_insert AFTER INSERT ON entries BEGIN "
+            "INSERT INTO entries_bigram(rowid, grams) "
+            "VALUES (new.id, bigrams(new.original) || ' ' || bigrams(new.translated)); END"
+        )
+        self._conn.execute(
+            "CREATE TRIGGER entries_bigram_delete AFTER DELETE ON entries BEGIN "
+            "INSERT INTO entries_bigram(entries_bigram, rowid, grams) "
+            "VALUES ('delete', old.id, bigrams(old.original) || ' ' || bigrams(old.translated)); END"
+        )
+        self._conn.execute(
+            "INSERT INTO entries_bigram(rowid, grams) "
+            "SELECT id, bigrams(original) || ' ' || bigrams(translated) FROM entries"
+        )
+        self._conn.commit()
+        return True
+
+    def _prune(self):
+        # the session being recorded is never pruned, however old or empty
+        cutoff = time.time() - self.retention
+        old = [row[0] for row in self._conn.execute(
+            "SELECT id FROM sessions WHERE started < ? AND id IS NOT ?", (cutoff, self.session_id)
+        )]
+        for session_id in old:
+            self._conn.execute("DELETE FROM entries WHERE session_id = ?", (session_id,))
+            self._conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+        self._conn.execute(
+            "DELETE FROM sessions WHERE id NOT IN (SELECT DISTINCT session_id FROM entries) AND id IS NOT ?",
+            (self.session_id,)
+        )
+        self._conn.commit()
+        if old:
+            print(f"[Store] 清理过期会话 {len(old)} 个")
+
+    def configure(self, window=None, retention_days=None):
+        # settings saved while running: resize the window and prune to the new retention
+        with self._lock:
+            if window is not None and window != self.window:
+                self.window = window
+                self._recent = deque(self._recent, maxlen=window)
+            if retention_days is not None and retention_days * 86400 != self.retention:
+                self.retention = retention_days * 86400
+                self._prune()
+
+    def new_session(self):
+        with self._lock:
+            now = time.time()
+            if self.session_id is not None:
+                self._conn.execute("UPDATE sessions SET ended = ? WHERE id = ?", (now, self.session_id))
+            cursor = self._conn.execute("INSERT INTO sessions (started) VALUES (?)", (now,))
+            self._conn.commit()
+            self.session_id = cursor.lastrowid
+            self._recent.clear()
+            self._count = 0
+
+    def mark_recording_start(self):
+        # subtitle timestamps are relative to the session start; move it to the
+        # moment capture begins as long as nothing has been recorded yet
+        with self._lock:
+            if self._count == 0:
+                self._conn.execute("UPDATE sessions SET started = ? WHERE id = ?", (time.time(), self.session_id))
+                self._conn.commit()
+
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def append(self, result):
+        wall_now = time.time()
+        start, end = _wall_times(result.get("timing"), wall_now, time.monotonic())
+        with self._lock:
+            self._count += 1
+            entry = {
+                "index": self._count,
+                "original": result.get("original", ""),
+                "translated": result.get("translated", ""),
+                "start": start,
+                "end": end,
+                "time": wall_now
+            }
+            self._conn.execute(
+                "INSERT INTO entries (session_id, idx, original, translated, start, end, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self.session_id, entry["index"], entry["original"], entry["translated"], start, end, wall_now)
+            )
+            self._conn.commit()
+            self._recent.append(entry)
+        for callback in list(self._listeners):
+            try:
+                callback(entry)
+            except Exception as e:
+                print(f"[Store] 监听回调错误: {e}")
+        return entry
+
+    def count(self, session_id=None):
+        if session_id is None or session_id == self.session_id:
+            return self._count
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM entries WHERE session_id = ?", (session_id,)
+            ).fetchone()[0]
+
+    def recent(self, n=None):
+        with self._lock:
+            entries = list(self._recent)
+        return entries if n is None else entries[-n:]
+
+    def _window_after(self, offset, session_id):
+        # the current session's entries after `offset` straight from memory, or
+        # None when some of them have already left the window. Caller holds the lock
+        if session_id != self.session_id:
+            return None
+        missing = self._count - offset
+        if missing <= 0:
+            return []
+        if missing > len(self._recent):
+            return None
+        return list(self._recent)[-missing:]
+
+    def page(self, offset, limit, session_id=None):
+        # the live tail (the last page, the rolling organizer's new lines) is
+        # served from the window; older pages are read from SQLite
+        session_id = self.session_id if session_id is None else session_id
+        with self._lock:
+            entries = self._window_after(offset, session_id)
+            if entries is not None:
+                return entries[:limit]
+            rows = self._conn.execute(
+                f"SELECT {COLUMNS} FROM entries WHERE session_id = ? AND idx > ? ORDER BY idx LIMIT ?",
+                (session_id, offset, limit)
+            ).fetchall()
+        return [_row_to_entry(row) for row in rows]
+
+    def iter_entries(self, session_id=None, batch=500):
+        offset = 0
+        while True:
+            entries = self.page(offset, batch, session_id)
+            if not entries:
+                return
+            yield from entries
+            offset = entries[-1]["index"]
+
+    def get_all(self, session_id=None):
+        return list(self.iter_entries(session_id))
+
+    def find(self, query, session_id=None, limit=200, newest_first=True):
+        # terms of three or more characters go through the trigram index, two-character
+        # ones (most CJK words) through the bigram index; anything else uses LIKE
+        terms = query.split()
+        if not terms:
+            return []
+        trigram = [t for t in terms if len(t) >= 3] if self.fts_available else []
+        bigram = [t for t in terms if len(t) == 2 and t.isalnum()] if self.bigram_available else []
+        scanned = [t for t in terms if t not in trigram and t not in bigram]
+        
+        where = []
+        params = []
+        if bigram:
+            # mixed queries run on the bigram index alone: longer terms add their own
+            # bigrams to the MATCH, so FTS intersects every term's postings, and are
+            # then confirmed with LIKE on the few rows left
+            grams = list(bigram)
+            for term in trigram:
+                grams += [g for g in _bigrams(term).split() if g not in grams]
+            scanned += trigram
+            source = "entries_bigram b JOIN entries e ON e.id = b.rowid"
+            key = "b.rowid"
+            where.append("entries_bigram MATCH ?")
+            params.append(_fts_phrase(grams))
+        elif trigram:
+            source = "entries_fts f JOIN entries e ON e.id = f.rowid"
+            key = "f.rowid"
+            where.append("entries_fts MATCH ?")
+            params.append(_fts_phrase(trigram))
+        else:
+            source = "entries e"
+            key = "e.id"
+        for term in scanned:
+            pattern = "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            where.append("(e.original LIKE ? ESCAPE '\\' OR e.translated LIKE ? ESCAPE '\\')")
+            params += [pattern, pattern]
+        if session_id is not None:
+            where.append("e.session_id = ?")
+            params.append(session_id)
+        # ordering on the FTS rowid lets the index stream hits instead of sorting them all
+        order = f"{key} DESC" if newest_first else key
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT e.session_id, e.idx, e.original, e.translated, e.start, e.end, e.created FROM {source} "
+                f"WHERE {' AND '.join(where)} ORDER BY {order} LIMIT ?",
+                params + [limit]
+            ).fetchall()
+        return [dict(_row_to_entry(row[1:]), session_id=row[0]) for row in rows]
+    
+    def search(self, query, session_id=None, limit=1000):
+        session_id = self.session_id if session_id is None else session_id
+        return [hit["index"] for hit in self.find(query, session_id, limit, newest_first=False)]
+    
+    def session_started(self, session_id=None):
+        session_id = self.session_id if session_id is None else session_id
+        with self._lock:
+            row = self._conn.execute("SELECT started FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        return row[0] if row else 0.0
+
+    def sessions(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT s.id, s.started, s.ended, COUNT(e.id) FROM sessions s "
+                "LEFT JOIN entries e ON e.session_id = s.id GROUP BY s.id ORDER BY s.id DESC"
+            ).fetchall()
+        return [{"id": r[0], "started": r[1], "ended": r[2], "count": r[3]} for r in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.execute("UPDATE sessions SET ended = ? WHERE id = ?", (time.time(), self.session_id))
+            self._conn.commit()
+            self._conn.close()
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_store(path=SESSION_FILE, **kwargs):
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = SessionStore(path, **kwargs)
+        elif kwargs:
+            _stores[path].configure(**kwargs)
+        return _stores[path]
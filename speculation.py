@@ -0,0 +1,176 @@
+import re
+import threading
+import time
+
+def normalize_text(text):
+    return re.sub(r"[\W_]+", "", text.lower())
+
+def _common_prefix(a, b):
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    return a[:i]
+
+class Speculation:
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.normalized = normalize_text(prefix)
+        self.translation = None
+        self.cancelled = False
+        self.sent = False
+        self.done = threading.Event()
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        self.cancelled = True
+
+    def mark_sent(self):
+        # called right before the request goes out; False if it was cancelled first
+        with self._lock:
+            if self.cancelled:
+                return False
+            self.sent = True
+            return True
+
+    def cancel_unsent(self):
+        # a request still queued in the rate limiter runs at speculation priority,
+        # so a final should not wait for it; returns whether it was cancelled
+        with self._lock:
+            if self.sent:
+                return False
+            self.cancelled = True
+            return True
+
+    def wait(self, timeout=None):
+        if not self.done.wait(timeout):
+            return None
+        return None if self.cancelled else self.translation
+
+class SpeculativeTranslator:
+    # Translates the stable prefix of ASR partials ahead of the endpoint. A prefix
+    # is stable once every partial for `debounce` seconds has started with it.
+    def __init__(self, translator, target_language="中文", debounce=0.4, min_interval=1.0,
+                 min_chars=6, min_growth=4, display_callback=None):
+        self.translator = translator
+        self.target_language = target_language
+        self.debounce = debounce
+        self.min_interval = min_interval
+        self.min_chars = min_chars
+        self.min_growth = min_growth
+        self.display_callback = display_callback
+
+        self.is_running = False
+        self.thread = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._partials = []
+        self._current = None
+        self._last_request = 0.0
+        self.requests = 0
+        self.cancelled = 0
+        self.reused = 0
+
+    def start(self):
+        if self.is_running:
+            return
+        self.is_running = True
+        self.thread = threading.Thread(target=self._process_thread, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.is_running = False
+        self._wakeup.set()
+        with self._lock:
+            self._cancel_current()
+            self._partials = []
+        if self.thread:
+            self.thread.join(timeout=2)
+
+    def on_partial(self, text):
+        with self._lock:
+            self._partials.append((time.monotonic(), text))
+        self._wakeup.set()
+
+    def on_final(self, text):
+        # hand an in-flight or finished speculation to the final if it covers the
+        # whole utterance; anything else, including one that was never sent, is superseded
+        with self._lock:
+            spec = self._current
+            self._current = None
+            self._partials = []
+        if spec is None:
+            return None
+        if not spec.cancelled and spec.normalized == normalize_text(text) and not spec.cancel_unsent():
+            self.reused += 1
+            return spec
+        spec.cancel()
+        self.cancelled += 1
+        return None
+
+    def _cancel_current(self):
+        if self._current is not None and not self._current.done.is_set():
+            self._current.cancel()
+            self.cancelled += 1
+        self._current = None
+
+    def _stable_prefix(self, now):
+        if not self._partials:
+            return ""
+        cutoff = now - self.debounce
+        window = [text for t, text in self._partials if t >= cutoff]
+        older = [text for t, text in self._partials if t < cutoff]
+        if not older:
+            return ""
+        # keep only the state at the start of the window, older history is irrelevant
+        self._partials = self._partials[len(older) - 1:]
+        prefix = older[-1]
+        for text in window:
+            prefix = _common_prefix(prefix, text)
+        latest = self._partials[-1][1]
+        if len(prefix) < len(latest) and prefix and prefix[-1].isalnum() and latest[len(prefix)].isalnum() \
+                and prefix[-1].isascii():
+            # do not cut a latin word in half
+            prefix = prefix[:prefix.rfind(" ") + 1] if " " in prefix else ""
+        return prefix.strip()
+
+    def _process_thread(self):
+        while self.is_running:
+            self._wakeup.wait(timeout=0.1)
+            self._wakeup.clear()
+            now = time.monotonic()
+            with self._lock:
+                prefix = self._stable_prefix(now)
+                if len(normalize_text(prefix)) < self.min_chars:
+                    continue
+                if self._current is not None:
+                    if not prefix.startswith(self._current.prefix):
+                        self._cancel_current()
+                    elif len(prefix) - len(self._current.prefix) < self.min_growth:
+                        continue
+                if now - self._last_request < self.min_interval:
+                    continue
+                self._cancel_current()
+                spec = Speculation(prefix)
+                self._current = spec
+                self._last_request = now
+                self.requests += 1
+            threading.Thread(target=self._run_speculation, args=(spec,), daemon=True).start()
+
+    def _run_speculation(self, spec):
+        try:
+            spec.translation = self.translator.translate_cancellable(
+                spec.prefix, self.target_language, lambda: spec.cancelled, spec.mark_sent)
+        except Exception as e:
+            print(f"[Speculation] 预翻译错误: {e}")
+            spec.translation = None
+        finally:
+            spec.done.set()
+        if spec.translation and not spec.cancelled and self.display_callback and self.translator.is_idle():
+            try:
+                self.display_callback(spec.prefix, spec.translation + " …")
+            except Exception as e:
+                print(f"[Speculation] 显示回调错误: {e}")
+
+    def get_stats(self):
+        return {"requests": self.requests, "cancelled": self.cancelled, "reused": self.reused}
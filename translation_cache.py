@@ -0,0 +1,190 @@
+import hashlib
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+
+CACHE_FILE = Path(__file__).parent / "translation_cache.db"
+
+def normalize_source(text):
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+class TranslationCache:
+    def __init__(self, path=CACHE_FILE, memory_size=2000, max_entries=100000, max_age_days=30):
+        self.path = path
+        self.memory_size = memory_size
+        self.max_entries = max_entries
+        self.max_age = max_age_days * 86400
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._puts_since_evict = 0
+        # last_used updates for hits, written to disk in batches
+        self._touched = {}
+        self._last_flush = time.time()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._open()
+
+    def _open(self):
+        if self.path is None:
+            return
+        try:
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS translations ("
+                "key TEXT PRIMARY KEY, source TEXT, translated TEXT, target_language TEXT, "
+                "model TEXT, created REAL, last_used REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON translations(last_used)")
+            self._conn.commit()
+        except Exception as e:
+            print(f"[Cache] 打开缓存数据库失败，仅使用内存缓存: {e}")
+            self._conn = None
+
+    def _key(self, text, target_language, model, prompt_version):
+        raw = "\x1f".join([normalize_source(text), target_language, model, str(prompt_version)])
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def get(self, text, target_language, model, prompt_version):
+        key = self._key(text, target_language, model, prompt_version)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[1] <= self.max_age:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                self._touch(key, now)
+                return entry[0]
+
+            if self._conn is not None:
+                try:
+                    row = self._conn.execute(
+                        "SELECT translated, created FROM translations WHERE key = ?", (key,)
+                    ).fetchone()
+                except Exception as e:
+                    # a locked or unreadable database is a miss, not a failed translation
+                    print(f"[Cache] 读取缓存失败: {e}")
+                    row = None
+                if row and now - row[1] <= self.max_age:
+                    self._touch(key, now)
+                    self._remember(key, row[0], row[1])
+                    self.disk_hits += 1
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    def put(self, text, translated, target_language, model, prompt_version):
+        key = self._key(text, target_language, model, prompt_version)
+        now = time.time()
+        with self._lock:
+            self._remember(key, translated, now)
+            if self._conn is None:
+                return
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, normalize_source(text), translated, target_language, model, now, now)
+                )
+                self._touched.pop(key, None)
+                self._puts_since_evict += 1
+                if self._puts_since_evict >= 100:
+                    # pending hits must reach disk first, or eviction sees stale last_used
+                    self._flush_touched(now)
+                    self._evict(now)
+                self._conn.commit()
+            except Exception as e:
+                print(f"[Cache] 写入缓存失败: {e}")
+
+    def _touch(self, key, now):
+        if self._conn is None:
+            return
+        self._touched[key] = now
+        if len(self._touched) >= 50 or now - self._last_flush >= 30:
+            try:
+                self._flush_touched(now)
+                self._conn.commit()
+            except Exception as e:
+                print(f"[Cache] 更新缓存使用时间失败: {e}")
+
+    def _flush_touched(self, now):
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE translations SET last_used = ? WHERE key = ?",
+                [(used, key) for key, used in self._touched.items()]
+            )
+            self._touched = {}
+        self._last_flush = now
+
+    def _remember(self, key, translated, created):
+        self._memory[key] = (translated, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _evict(self, now):
+        self._puts_since_evict = 0
+        self._conn.execute("DELETE FROM translations WHERE created < ?", (now - self.max_age,))
+        count = self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM translations WHERE key IN "
+                "(SELECT key FROM translations ORDER BY last_used LIMIT ?)",
+                (count - self.max_entries,)
+            )
+
+    def configure(self, memory_size=None, max_entries=None, max_age_days=None):
+        # settings saved while running: new limits apply at once, not at the next eviction
+        with self._lock:
+            if memory_size is not None:
+                self.memory_size = memory_size
+            if max_entries is not None:
+                self.max_entries = max_entries
+            if max_age_days is not None:
+                self.max_age = max_age_days * 86400
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+            if self._conn is None:
+                return
+            now = time.time()
+            try:
+                self._flush_touched(now)
+                self._evict(now)
+                self._conn.commit()
+            except Exception as e:
+                print(f"[Cache] 清理缓存失败: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._touched = {}
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM translations")
+                self._conn.commit()
+
+    def get_stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory)
+        }
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+def get_cache(path=CACHE_FILE, **kwargs):
+    with _caches_lock:
+        if path not in _caches:
+            _caches[path] = TranslationCache(path, **kwargs)
+        elif kwargs:
+            _caches[path].configure(**kwargs)
+        return _caches[path]
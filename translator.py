@@ -1,14 +1,156 @@
 import threading
 import queue
 import os
-from openai import OpenAI
-import httpx
+import json
+import time
+from contextlib import contextmanager, nullcontext
+
+import latency
+import http_pool
+from translation_cache import get_cache
+from session_store import SessionStore, get_store
+from glossary import get_glossary
+from local_mt import get_local_backend, language_pair
+from router import EndpointRouter, RequestCancelled, status_code
+from rate_limiter import RateLimiter, retry_after_seconds, PRIORITY_LIVE, PRIORITY_SPECULATION, PRIORITY_ORGANIZE
+
+# bump whenever the translation prompt changes so cached results are not reused
+PROMPT_VERSION = 3
+
+# how long a final waits for an adopted speculation that is still streaming:
+# the endpoint's p95 for a whole streamed reply, or the default until it has one
+SPECULATION_WAIT = 5.0
+SPECULATION_MIN_WAIT = 0.5
+
+def estimate_tokens(text):
+    # rough: one token per CJK character, about four characters per token otherwise
+    cjk = sum(1 for ch in text if ord(ch) > 0x2e80)
+    return cjk + (len(text) - cjk + 3) // 4
+
+def _parse_batch_response(content, expected):
+    start = content.find("[")
+    end = content.rfind("]")
+    if start < 0 or end <= start:
+        return None
+    try:
+        items = json.loads(content[start:end + 1])
+    except ValueError:
+        return None
+    if not isinstance(items, list) or len(items) != expected:
+        return None
+    if not all(isinstance(item, str) and item.strip() for item in items):
+        return None
+    return [item.strip() for item in items]
+
+class ContextWindow:
+    # recent source/translation pairs replayed as earlier chat turns. The window
+    # only grows until it hits a limit and then drops its older half at once, so
+    # consecutive requests share a byte-identical prefix that provider-side
+    # prompt caching can reuse, instead of shifting by one pair every time
+    def __init__(self, max_pairs=20, max_tokens=1200):
+        self.max_pairs = max_pairs
+        self.max_tokens = max_tokens
+        self.language = None
+        self._pairs = []
+        self._tokens = 0
+        self._lock = threading.Lock()
+    
+    def add(self, source, target, language):
+        cost = estimate_tokens(source) + estimate_tokens(target)
+        with self._lock:
+            if language != self.language:
+                self._pairs = []
+                self._tokens = 0
+                self.language = language
+            self._pairs.append((source, target, cost))
+            self._tokens += cost
+            if len(self._pairs) > self.max_pairs or self._tokens > self.max_tokens:
+                keep = []
+                kept_tokens = 0
+                for pair in reversed(self._pairs[len(self._pairs) // 2:]):
+                    if kept_tokens + pair[2] > self.max_tokens // 2:
+                        break
+                    keep.append(pair)
+                    kept_tokens += pair[2]
+                self._pairs = keep[::-1]
+                self._tokens = kept_tokens
+    
+    def messages(self, language):
+        with self._lock:
+            if language != self.language:
+                return []
+            pairs = list(self._pairs)
+        turns = []
+        for source, target, _ in pairs:
+            turns.append({"role": "user", "content": source})
+            turns.append({"role": "assistant", "content": target})
+        return turns
+    
+    def clear(self):
+        with self._lock:
+            self._pairs = []
+            self._tokens = 0
+    
+    def __len__(self):
+        return len(self._pairs)
+
+class ApiBackend:
+    # A translation backend handles the language pairs it supports():
+    #   translate(items, check_cache) returns one result dict per item, in order
+    #   accepts_fallback(pair) tells whether it may retry what another backend failed
+    #   translate_cancellable(...) streams a speculation, or returns None if it does not
+    # The chat-completion endpoints support every pair, so this one goes last
+    name = "api"
+    
+    def __init__(self, translator):
+        self.translator = translator
+        self.translations = 0
+    
+    def supports(self, pair):
+        return True
+    
+    def accepts_fallback(self, pair):
+        # a pair routed to another backend stays off the network
+        return False
+    
+    def translate(self, items, check_cache=True):
+        with self.translator._endpoints() as endpoints:
+            if len(items) == 1:
+                results = [self.translator._translate_with(endpoints, items[0], check_cache)]
+            else:
+                results = self.translator._translate_batch_with(endpoints, items, check_cache)
+        self.translations += sum(1 for r in results if r["success"] and not r.get("cached"))
+        return results
+    
+    def translate_cancellable(self, text, target_language, is_cancelled, on_send=None):
+        translator = self.translator
+        with translator._endpoints() as endpoints:
+            if not endpoints:
+                return None
+            try:
+                translated, _ = translator.router.call(
+                    endpoints,
+                    lambda endpoint, race: translator._translate_cancellable_with(endpoint, text, target_language,
+                                                                                  is_cancelled, on_send, race),
+                    retries=0,
+                    stream=True
+                )
+            except RequestCancelled:
+                return None
+            return translated
 
 class Translator:
     def __init__(self, 
                  api_key="", api_base="https://api.deepseek.com", model="deepseek-chat", bypass_proxy=False,
                  translate_api_key="", translate_api_base="https://api.siliconflow.cn/v1", translate_model="Qwen/Qwen3-8B",
-                 organize_api_key="", organize_api_base="https://api.deepseek.com", organize_model="deepseek-chat"):
+                 organize_api_key="", organize_api_base="https://api.deepseek.com", organize_model="deepseek-chat",
+                 workers=1, endpoint_concurrency=4, stream_output=True, cache=None, cache_with_context=False,
+                 cache_context_max_tokens=16,
+                 batching=False, batch_max_items=8, batch_max_tokens=800, batch_max_wait=0.05,
+                 organize_concurrency=4, organize_chunk_tokens=3000, organize_retries=2, store=None,
+                 context_pairs=20, context_tokens=1200, glossary=None, local_backend=None, local_fallback=True,
+                 failover=True, hedging=True, request_retries=2, circuit_failure_threshold=3, circuit_reset_seconds=30,
+                 rate_limit_rpm=0, rate_limit_tpm=0, rate_limit_overrides=None, rate_limit_reserve=0.2):
         
         self.api_key = api_key
         self.api_base = api_base
@@ -26,127 +168,749 @@ class Translator:
         self.translate_client = None
         self.organize_client = None
         self.client = None
+        self._config_lock = threading.Lock()
+        self._active_requests = 0
+        self._retired_clients = []
         
         self.translate_queue = queue.Queue()
         self.result_queue = queue.Queue()
         self.is_running = False
-        self.thread = None
-        self.all_results = []
+        self.threads = []
+        self.store = store if store is not None else SessionStore(path=None)
+        self.result_callback = None
+        self.delta_callback = None
+        self.stream_output = stream_output
+        self.cache = cache
+        # translations depend on the context turns sent with them; while there is
+        # context only short sentences (greetings, fillers, stock phrases) use the
+        # cache, since they repeat most and depend least on earlier sentences.
+        # cache_with_context reuses entries for every sentence regardless
+        self.cache_with_context = cache_with_context
+        self.cache_context_max_tokens = cache_context_max_tokens
+        self.glossary = glossary
+        self.failover = failover
+        self.router = EndpointRouter(
+            retries=request_retries,
+            failure_threshold=circuit_failure_threshold,
+            reset_seconds=circuit_reset_seconds,
+            hedging=hedging
+        )
+        # client-side RPM/TPM budget per API base; 0 leaves a limit unenforced
+        self.rate_limiter = RateLimiter(rate_limit_rpm, rate_limit_tpm, rate_limit_overrides, rate_limit_reserve)
+        # backends in order of preference, the API last; with `fallback` the
+        # others retry what the chosen one failed
+        self.api_backend = ApiBackend(self)
+        self.backends = self._build_backends(local_backend)
+        self.fallback = local_fallback
+        self.context = ContextWindow(context_pairs, context_tokens) if context_pairs > 0 else None
+        self.prompt_tokens = 0
+        self.cached_prompt_tokens = 0
+        
+        self.batching = batching
+        self.batch_max_items = batch_max_items
+        self.batch_max_tokens = batch_max_tokens
+        self.batch_max_wait = batch_max_wait
+        self.batch_requests = 0
+        self.batch_fallbacks = 0
+        
+        self.organize_concurrency = organize_concurrency
+        self.organize_chunk_tokens = organize_chunk_tokens
+        self.organize_retries = organize_retries
+        from organizer import OrganizeCache
+        self._organize_cache = OrganizeCache()
+        self.last_organized = ""
+        
+        self.workers = workers
+        self.endpoint_concurrency = endpoint_concurrency
+        self._endpoint_slots = {}
+        self._seq_lock = threading.Lock()
+        self._next_seq = 0
+        self._reorder_lock = threading.Lock()
+        self._next_emit_seq = 0
+        self._pending_results = {}
+        self._partial_texts = {}
         
         self._init_clients()
     
-    def _create_client(self, api_key, api_base):
-        if not api_key:
-            return None
-        if self.bypass_proxy:
-            http_client = httpx.Client(trust_env=False)
-            return OpenAI(api_key=api_key, base_url=api_base, http_client=http_client)
-        else:
-            return OpenAI(api_key=api_key, base_url=api_base)
+    def _build_backends(self, *backends):
+        return [b for b in backends if b is not None] + [self.api_backend]
     
     def _init_clients(self):
         print(f"[Translator] 初始化客户端: bypass_proxy={self.bypass_proxy}")
         
-        self.translate_client = self._create_client(self.translate_api_key, self.translate_api_base)
-        self.organize_client = self._create_client(self.organize_api_key, self.organize_api_base)
-        
-        if self.api_key:
-            self.client = self._create_client(self.api_key, self.api_base)
+        self.translate_client = http_pool.acquire(self.translate_api_key, self.translate_api_base, self.bypass_proxy)
+        self.organize_client = http_pool.acquire(self.organize_api_key, self.organize_api_base, self.bypass_proxy)
+        self.client = http_pool.acquire(self.api_key, self.api_base, self.bypass_proxy) if self.api_key else None
+    
+    def _candidates(self, kind):
+        # the dedicated endpoint for `kind` first, then the general one, then the
+        # other dedicated one; without failover only the first configured is used
+        translate = (self.translate_client, self.translate_model, self.translate_api_base)
+        organize = (self.organize_client, self.organize_model, self.organize_api_base)
+        own, other = (translate, organize) if kind == "translate" else (organize, translate)
+        ordered = [own, (self.client, self.model, self.api_base), other]
+        endpoints = []
+        seen = set()
+        for endpoint in ordered[:3 if self.failover else 2]:
+            key = (id(endpoint[0]), endpoint[1])
+            if endpoint[0] is None or key in seen:
+                continue
+            seen.add(key)
+            endpoints.append(endpoint)
+        return endpoints if self.failover else endpoints[:1]
+    
+    @contextmanager
+    def _endpoints(self, kind="translate"):
+        # a consistent list of (client, model, api_base) snapshots in failover
+        # order; clients replaced by update_config stay open until every request
+        # holding one has finished
+        with self._config_lock:
+            endpoints = self._candidates(kind)
+            self._active_requests += 1
+        try:
+            yield endpoints
+        finally:
+            with self._config_lock:
+                self._active_requests -= 1
+                retired = []
+                if self._active_requests == 0:
+                    retired, self._retired_clients = self._retired_clients, []
+            for client in retired:
+                http_pool.release(client)
+    
+    def warm_up(self):
+        with self._config_lock:
+            clients = {id(c): c for c in (self.translate_client, self.organize_client, self.client) if c is not None}
+        for client in clients.values():
+            http_pool.warm_up(client)
+    
+    def close(self):
+        with self._config_lock:
+            clients = [self.translate_client, self.organize_client, self.client]
+            if self._active_requests == 0:
+                clients += self._retired_clients
+                self._retired_clients = []
+            else:
+                self._retired_clients += clients
+                clients = []
+            self.translate_client = None
+            self.organize_client = None
+            self.client = None
+        for client in clients:
+            http_pool.release(client)
     
     def update_config(self, **kwargs):
-        if 'api_key' in kwargs:
-            self.api_key = kwargs['api_key']
-        if 'api_base' in kwargs:
-            self.api_base = kwargs['api_base']
-        if 'model' in kwargs:
-            self.model = kwargs['model']
-        if 'bypass_proxy' in kwargs:
-            self.bypass_proxy = kwargs['bypass_proxy']
-        if 'translate_api_key' in kwargs:
-            self.translate_api_key = kwargs['translate_api_key']
-        if 'translate_api_base' in kwargs:
-            self.translate_api_base = kwargs['translate_api_base']
-        if 'translate_model' in kwargs:
-            self.translate_model = kwargs['translate_model']
-        if 'organize_api_key' in kwargs:
-            self.organize_api_key = kwargs['organize_api_key']
-        if 'organize_api_base' in kwargs:
-            self.organize_api_base = kwargs['organize_api_base']
-        if 'organize_model' in kwargs:
-            self.organize_model = kwargs['organize_model']
+        # live reconfiguration: the queue, in-flight requests and results are kept,
+        # endpoints and models are swapped in one step
+        fields = ["api_key", "api_base", "model", "bypass_proxy",
+                  "translate_api_key", "translate_api_base", "translate_model",
+                  "organize_api_key", "organize_api_base", "organize_model"]
+        new = {name: kwargs.get(name, getattr(self, name)) for name in fields}
+        if "translate_api_key" in kwargs or "api_key" in kwargs:
+            new["translate_api_key"] = new["translate_api_key"] or new["api_key"]
+        if "organize_api_key" in kwargs or "api_key" in kwargs:
+            new["organize_api_key"] = new["organize_api_key"] or new["api_key"]
         
-        self._init_clients()
+        clients = None
+        if any(new[name] != getattr(self, name) for name in fields):
+            print(f"[Translator] 更新客户端: bypass_proxy={new['bypass_proxy']}")
+            clients = (
+                http_pool.acquire(new["translate_api_key"], new["translate_api_base"], new["bypass_proxy"]),
+                http_pool.acquire(new["organize_api_key"], new["organize_api_base"], new["bypass_proxy"]),
+                http_pool.acquire(new["api_key"], new["api_base"], new["bypass_proxy"]) if new["api_key"] else None
+            )
+        
+        release = []
+        with self._config_lock:
+            for name in fields:
+                setattr(self, name, new[name])
+            if clients is not None:
+                old = [self.translate_client, self.organize_client, self.client]
+                self.translate_client, self.organize_client, self.client = clients
+                self._retired_clients += [c for c in old if c is not None]
+                if self._active_requests == 0:
+                    release, self._retired_clients = self._retired_clients, []
+            
+            if "endpoint_concurrency" in kwargs and kwargs["endpoint_concurrency"] != self.endpoint_concurrency:
+                self.endpoint_concurrency = kwargs["endpoint_concurrency"]
+                with self._seq_lock:
+                    self._endpoint_slots = {}
+            if "context_pairs" in kwargs or "context_tokens" in kwargs:
+                pairs = kwargs.get("context_pairs", self.context.max_pairs if self.context else 0)
+                tokens = kwargs.get("context_tokens", self.context.max_tokens if self.context else 1200)
+                if pairs <= 0:
+                    self.context = None
+                elif self.context is None:
+                    self.context = ContextWindow(pairs, tokens)
+                else:
+                    self.context.max_pairs = pairs
+                    self.context.max_tokens = tokens
+            for name in ("stream_output", "batching", "batch_max_items", "batch_max_tokens", "batch_max_wait",
+                         "organize_concurrency", "organize_chunk_tokens", "organize_retries"):
+                if name in kwargs:
+                    setattr(self, name, kwargs[name])
+            if "cache" in kwargs:
+                self.cache = kwargs["cache"]
+            if "cache_with_context" in kwargs:
+                self.cache_with_context = kwargs["cache_with_context"]
+            if "cache_context_max_tokens" in kwargs:
+                self.cache_context_max_tokens = kwargs["cache_context_max_tokens"]
+            if "glossary" in kwargs:
+                self.glossary = kwargs["glossary"]
+            if "local_backend" in kwargs:
+                self.backends = self._build_backends(kwargs["local_backend"])
+            if "local_fallback" in kwargs:
+                self.fallback = kwargs["local_fallback"]
+            if "failover" in kwargs:
+                self.failover = kwargs["failover"]
+            for name, attr in (("hedging", "hedging"), ("request_retries", "retries"),
+                               ("circuit_failure_threshold", "failure_threshold"),
+                               ("circuit_reset_seconds", "reset_seconds")):
+                if name in kwargs:
+                    setattr(self.router, attr, kwargs[name])
+            limits = ("rate_limit_rpm", "rate_limit_tpm", "rate_limit_overrides", "rate_limit_reserve")
+            if any(name in kwargs for name in limits):
+                self.rate_limiter.configure(
+                    kwargs.get("rate_limit_rpm", self.rate_limiter.rpm),
+                    kwargs.get("rate_limit_tpm", self.rate_limiter.tpm),
+                    kwargs.get("rate_limit_overrides", self.rate_limiter.overrides),
+                    kwargs.get("rate_limit_reserve", self.rate_limiter.reserve)
+                )
+        for client in release:
+            http_pool.release(client)
+        
+        if "workers" in kwargs:
+            self.workers = kwargs["workers"]
+            if self.is_running:
+                self._spawn_workers()
     
-    def add_text(self, text, target_language="中文"):
-        self.translate_queue.put({"text": text, "target_language": target_language})
+    def add_text(self, text, target_language="中文", timing=None, speculation=None):
+        with self._seq_lock:
+            seq = self._next_seq
+            self._next_seq += 1
+        self.translate_queue.put({
+            "seq": seq,
+            "text": text,
+            "target_language": target_language,
+            "timing": timing,
+            "speculation": speculation
+        })
     
-    def _process_thread(self):
-        while self.is_running:
+    def is_idle(self):
+        with self._reorder_lock:
+            return self._next_emit_seq == self._next_seq
+    
+    def _translation_messages(self, text, target_language):
+        return [
+            {
+                "role": "system", 
+                "content": f"你是一个翻译助手。请将用户输入的文本翻译成{target_language}。\n\n注意：输入文本来自语音识别，可能存在识别错误。之前的对话是同一段语音中较早的句子及其翻译，可用于理解指代、统一术语和纠错。请在翻译时：\n1. 根据上下文推断并纠正可能的识别错误\n2. 输出通顺自然的翻译结果\n3. 只输出翻译结果，不要输出其他内容\n4. 如果输入已经是{target_language}，请直接输出原文\n5. 如果用户消息以【术语】开头，其中的术语必须使用给出的译法，只翻译【原文】之后的内容"
+            },
+            *self._context_turns(target_language),
+            {"role": "user", "content": self._glossary_header(text, target_language) + text}
+        ]
+    
+    def _glossary_header(self, text, target_language):
+        # terms go into the user message, not the system prompt, so the cached prefix stays stable
+        if self.glossary is None:
+            return ""
+        terms = self.glossary.terms(text, target_language)
+        if not terms:
+            return ""
+        return "【术语】\n" + "\n".join(f"{s} → {t}" for s, t in terms) + "\n【原文】\n"
+    
+    def _prompt_version(self, text, target_language):
+        if self.glossary is None:
+            return PROMPT_VERSION
+        signature = self.glossary.signature(text, target_language)
+        return f"{PROMPT_VERSION}:{signature}" if signature else PROMPT_VERSION
+    
+    def _post_edit(self, result, target_language):
+        if self.glossary is not None and result.get("success"):
+            result["translated"] = self.glossary.post_edit(result["original"], result["translated"], target_language)
+        return result
+    
+    def _context_turns(self, target_language):
+        return self.context.messages(target_language) if self.context is not None else []
+    
+    def _cache_for(self, text, target_language):
+        if self.cache is None or self.cache_with_context or estimate_tokens(text) <= self.cache_context_max_tokens:
+            return self.cache
+        return self.cache if not self._context_turns(target_language) else None
+    
+    def _record_usage(self, response):
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return
+        self.prompt_tokens += getattr(usage, "prompt_tokens", 0) or 0
+        # DeepSeek reports prompt_cache_hit_tokens, OpenAI-style APIs prompt_tokens_details.cached_tokens
+        cached = getattr(usage, "prompt_cache_hit_tokens", None)
+        if cached is None:
+            details = getattr(usage, "prompt_tokens_details", None)
+            cached = getattr(details, "cached_tokens", None) if details is not None else None
+        self.cached_prompt_tokens += cached or 0
+    
+    def get_usage_stats(self):
+        return {
+            "prompt_tokens": self.prompt_tokens,
+            "cached_prompt_tokens": self.cached_prompt_tokens,
+            "context_pairs": len(self.context) if self.context is not None else 0,
+            "backends": {b.name: b.translations for b in self.backends},
+            "router": self.router.get_stats(),
+            "rate_limits": self.rate_limiter.get_stats()
+        }
+    
+    @contextmanager
+    def _completion(self, endpoint, messages, priority=PRIORITY_LIVE, max_tokens=4096, stream=False,
+                    slot=True, is_cancelled=None, on_send=None, timing=None):
+        # every API call first waits for its share of the base's RPM/TPM budget and
+        # only then takes an endpoint slot, so a request held back by the limiter
+        # never blocks a higher-priority one on the slot. Yields the response, or
+        # None when is_cancelled() turned true, or on_send() returned False, before
+        # it was sent; a streamed response keeps the slot until the block exits
+        client, model, api_base = endpoint
+        limiter = self.rate_limiter.limiter(api_base)
+        # the reply is assumed to be about as long as the user message until usage is known
+        estimated = sum(estimate_tokens(m["content"]) for m in messages) + estimate_tokens(messages[-1]["content"])
+        if limiter.acquire(estimated, priority, is_cancelled) is None:
+            yield None
+            return
+        with self._endpoint_slot(api_base) if slot else nullcontext():
+            if (is_cancelled is not None and is_cancelled()) or (on_send is not None and not on_send()):
+                limiter.refund(estimated)
+                yield None
+                return
+            if timing is not None:
+                timing.setdefault("translate_request", latency.now())
             try:
-                item = self.translate_queue.get(timeout=0.5)
-                text = item["text"]
-                target_language = item["target_language"]
-                
-                client = self.translate_client or self.client
-                model = self.translate_model if self.translate_client else self.model
-                
-                if not client or not (self.translate_api_key or self.api_key):
-                    self.result_queue.put({
-                        "original": text,
-                        "translated": "[未配置API密钥]",
-                        "success": False
-                    })
+                response = client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=0.3,
+                    max_tokens=max_tokens,
+                    stream=stream
+                )
+            except Exception as e:
+                if status_code(e) == 429:
+                    # the server knows its window better than our estimate does
+                    limiter.pause(retry_after_seconds(e) or 1.0)
+                raise
+            if not stream:
+                usage = getattr(response, "usage", None)
+                limiter.settle(estimated, getattr(usage, "total_tokens", None))
+            yield response
+    
+    def _create_completion(self, endpoint, messages, **kwargs):
+        with self._completion(endpoint, messages, **kwargs) as response:
+            return response
+    
+    def _endpoint_slot(self, api_base):
+        with self._seq_lock:
+            if api_base not in self._endpoint_slots:
+                self._endpoint_slots[api_base] = threading.BoundedSemaphore(self.endpoint_concurrency)
+            return self._endpoint_slots[api_base]
+    
+    def _backend_chain(self, item):
+        # the first backend that supports the pair translates it; with fallback,
+        # the others that accept the pair take over whatever it failed
+        pair = language_pair(item["text"], item["target_language"])
+        chain = [b for b in self.backends if b.supports(pair)][:1]
+        if self.fallback:
+            chain += [b for b in self.backends if b not in chain and b.accepts_fallback(pair)]
+        return chain
+    
+    def _translate_items(self, items, check_cache=True):
+        # each step hands every still-failed item to the next backend in its
+        # chain, so items sharing a backend are still translated as one batch
+        results = [None] * len(items)
+        chains = [self._backend_chain(item) for item in items]
+        pending = list(range(len(items)))
+        step = 0
+        while pending:
+            groups = {}
+            for i in pending:
+                if step < len(chains[i]):
+                    groups.setdefault(chains[i][step], []).append(i)
+            if not groups:
+                break
+            for backend, indices in groups.items():
+                if step:
+                    print(f"[Translator] 翻译失败，改用 {backend.name}: {len(indices)} 句")
+                for i, result in zip(indices, backend.translate([items[i] for i in indices], check_cache)):
+                    if results[i] is None or result["success"]:
+                        results[i] = result
+            pending = [i for i in pending if not results[i]["success"]]
+            step += 1
+        return results
+    
+    def _translate_item(self, item, check_cache=True):
+        return self._translate_items([item], check_cache)[0]
+    
+    def _primary_model(self, endpoints):
+        return endpoints[0][1] if endpoints else (self.translate_model or self.model)
+    
+    def _request_translation(self, endpoint, item, race=None):
+        # called with a race when streamed
+        messages = self._translation_messages(item["text"], item["target_language"])
+        with self._completion(endpoint, messages, stream=race is not None, timing=item.get("timing")) as response:
+            if race is not None:
+                return self._stream_completion(response, item, race)
+        self._record_usage(response)
+        return response.choices[0].message.content
+    
+    def _speculation_wait(self, endpoints):
+        p95 = self.router.p95(endpoints[0], stream=True) if endpoints else None
+        return SPECULATION_WAIT if p95 is None else max(SPECULATION_MIN_WAIT, p95)
+    
+    def _translate_with(self, endpoints, item, check_cache):
+        text = item["text"]
+        target_language = item["target_language"]
+        timing = item.get("timing")
+        model = self._primary_model(endpoints)
+        cache = self._cache_for(text, target_language)
+        
+        if check_cache and cache is not None:
+            cached = cache.get(text, target_language, model, self._prompt_version(text, target_language))
+            if cached is not None:
+                if timing is not None:
+                    timing["translate_request"] = timing["translate_response"] = latency.now()
+                return {
+                    "original": text,
+                    "translated": cached,
+                    "success": True,
+                    "cached": True,
+                    "timing": timing
+                }
+        
+        speculation = item.get("speculation")
+        if speculation is not None:
+            if timing is not None:
+                timing["translate_request"] = latency.now()
+            translated = speculation.wait(timeout=self._speculation_wait(endpoints))
+            if translated:
+                if timing is not None:
+                    timing["translate_response"] = latency.now()
+                translated = translated.strip()
+                if cache is not None:
+                    cache.put(text, translated, target_language, model, self._prompt_version(text, target_language))
+                return {
+                    "original": text,
+                    "translated": translated,
+                    "success": True,
+                    "timing": timing
+                }
+        
+        if not endpoints:
+            return {
+                "original": text,
+                "translated": "[未配置API密钥]",
+                "success": False,
+                "timing": timing
+            }
+        
+        try:
+            # a streamed reply is hedged on its first token: whichever stream starts
+            # first draws on screen and the other is closed before it emits anything
+            streaming = bool(self.stream_output and self.delta_callback and "seq" in item)
+            translated, used = self.router.call(
+                endpoints,
+                lambda endpoint, race=None: self._request_translation(endpoint, item, race),
+                hedge=True,
+                stream=streaming
+            )
+            
+            if timing is not None:
+                timing["translate_response"] = latency.now()
+            translated = (translated or "").strip()
+            if cache is not None and translated:
+                cache.put(text, translated, target_language, used[1], self._prompt_version(text, target_language))
+            return {
+                "original": text,
+                "translated": translated,
+                "success": True,
+                "timing": timing
+            }
+            
+        except Exception as e:
+            import traceback
+            print(f"[Translator] 翻译错误: {e}")
+            traceback.print_exc()
+            return {
+                "original": text,
+                "translated": f"[翻译错误: {str(e)}]",
+                "success": False,
+                "timing": timing
+            }
+    
+    def _batch_messages(self, texts, target_language):
+        return [
+            {
+                "role": "system",
+                "content": f"你是一个翻译助手。用户会给你一个JSON数组，每个元素是一句语音识别文本。请逐句翻译成{target_language}。\n\n注意：输入文本来自语音识别，可能存在识别错误。之前的对话是同一段语音中较早的句子及其翻译，仅供参考。请在翻译时：\n1. 根据上下文推断并纠正可能的识别错误\n2. 输出通顺自然的翻译结果\n3. 只输出一个与输入等长的JSON字符串数组，第i个元素是第i句的翻译，不要输出其他内容\n4. 如果某句已经是{target_language}，请直接输出原文\n5. 如果用户消息以【术语】开头，其中的术语必须使用给出的译法，只翻译【原文】之后的内容"
+            },
+            *self._context_turns(target_language),
+            {
+                "role": "user",
+                "content": self._glossary_header("\n".join(texts), target_language) + json.dumps(texts, ensure_ascii=False)
+            }
+        ]
+    
+    def _collect_batch(self, item):
+        # coalesce finals that are already waiting behind `item`; when the queue is
+        # empty nothing is held back, so batching only kicks in under backlog
+        batch = [item]
+        if not self.batching or item.get("speculation") is not None:
+            return batch, None
+        tokens = estimate_tokens(item["text"])
+        deadline = time.monotonic() + self.batch_max_wait
+        while len(batch) < self.batch_max_items:
+            try:
+                if len(batch) == 1:
+                    nxt = self.translate_queue.get_nowait()
+                else:
+                    nxt = self.translate_queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            cost = estimate_tokens(nxt["text"])
+            if nxt.get("speculation") is not None or nxt["target_language"] != item["target_language"] \
+                    or tokens + cost > self.batch_max_tokens:
+                return batch, nxt
+            batch.append(nxt)
+            tokens += cost
+        return batch, None
+    
+    def _translate_batch_with(self, endpoints, items, check_cache=True):
+        target_language = items[0]["target_language"]
+        model = self._primary_model(endpoints)
+        caches = [self._cache_for(item["text"], target_language) for item in items]
+        
+        results = [None] * len(items)
+        pending = []
+        for i, item in enumerate(items):
+            cache = caches[i]
+            cached = cache.get(item["text"], target_language, model, self._prompt_version(item["text"], target_language)) \
+                if check_cache and cache is not None else None
+            if cached is not None:
+                timing = item.get("timing")
+                if timing is not None:
+                    timing["translate_request"] = timing["translate_response"] = latency.now()
+                results[i] = {
+                    "original": item["text"],
+                    "translated": cached,
+                    "success": True,
+                    "cached": True,
+                    "timing": timing
+                }
+            else:
+                pending.append(i)
+        
+        if len(pending) == 1:
+            results[pending[0]] = self._translate_with(endpoints, items[pending[0]], False)
+            pending = []
+        if not pending or not endpoints:
+            for i in pending:
+                results[i] = self._translate_with(endpoints, items[i], False)
+            return results
+        
+        texts = [items[i]["text"] for i in pending]
+        messages = self._batch_messages(texts, target_language)
+        
+        def request(endpoint):
+            response = self._create_completion(endpoint, messages)
+            self.batch_requests += 1
+            self._record_usage(response)
+            # an unparseable reply is the model's fault, not the endpoint's
+            return _parse_batch_response(response.choices[0].message.content or "", len(texts))
+        
+        translated = None
+        sent = latency.now()
+        try:
+            translated, used = self.router.call(endpoints, request, hedge=True)
+        except Exception as e:
+            print(f"[Translator] 批量翻译错误: {e}")
+        received = latency.now()
+        
+        if translated is None:
+            self.batch_fallbacks += 1
+            print(f"[Translator] 批量结果无法解析，逐条翻译 {len(texts)} 句")
+            for i in pending:
+                results[i] = self._translate_with(endpoints, items[i], False)
+            return results
+        
+        for i, text in zip(pending, translated):
+            item = items[i]
+            timing = item.get("timing")
+            if timing is not None:
+                timing["translate_request"] = sent
+                timing["translate_response"] = received
+            if caches[i] is not None:
+                caches[i].put(item["text"], text, target_language, used[1],
+                              self._prompt_version(item["text"], target_language))
+            results[i] = {
+                "original": item["text"],
+                "translated": text,
+                "success": True,
+                "timing": timing
+            }
+        return results
+    
+    def _stream_completion(self, response, item, race):
+        seq = item["seq"]
+        timing = item.get("timing")
+        parts = []
+        race.attach(response)
+        try:
+            for chunk in response:
+                if not chunk.choices:
                     continue
-                
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                if not parts:
+                    if not race.claim(response):
+                        raise RequestCancelled()
+                    if timing is not None:
+                        timing["translate_first_token"] = latency.now()
+                parts.append(delta)
+                self._on_delta(seq, item["text"], "".join(parts).strip())
+        except RequestCancelled:
+            raise
+        except Exception:
+            # closed by the hedge that reached its first token first
+            if race.lost(response):
+                raise RequestCancelled()
+            raise
+        if not parts and not race.claim(response):
+            raise RequestCancelled()
+        return "".join(parts)
+    
+    def translate_cancellable(self, text, target_language, is_cancelled, on_send=None):
+        backend = self._backend_chain({"text": text, "target_language": target_language})[0]
+        return backend.translate_cancellable(text, target_language, is_cancelled, on_send)
+    
+    def _translate_cancellable_with(self, endpoint, text, target_language, is_cancelled, on_send=None, race=None):
+        parts = []
+        messages = self._translation_messages(text, target_language)
+        with self._completion(endpoint, messages, priority=PRIORITY_SPECULATION, stream=True,
+                              is_cancelled=is_cancelled, on_send=on_send) as response:
+            if response is None:
+                raise RequestCancelled()
+            try:
+                for chunk in response:
+                    if is_cancelled():
+                        raise RequestCancelled()
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        if not parts and race is not None:
+                            # not hedged, but its first token still feeds the endpoint's p95
+                            race.claim(response)
+                        parts.append(chunk.choices[0].delta.content)
+            finally:
+                close = getattr(response, "close", None)
+                if close:
+                    close()
+        return "".join(parts).strip()
+    
+    def _on_delta(self, seq, original, text):
+        # only the utterance at the head of the order may draw on screen
+        with self._reorder_lock:
+            self._partial_texts[seq] = (original, text)
+            if seq == self._next_emit_seq:
+                self._emit_delta(original, text)
+    
+    def _emit_delta(self, original, text):
+        try:
+            self.delta_callback(original, text)
+        except Exception as e:
+            print(f"[Translator] 增量回调错误: {e}")
+    
+    def _deliver(self, seq, result):
+        # workers finish out of order; release results strictly in utterance order
+        with self._reorder_lock:
+            self._pending_results[seq] = result
+            while self._next_emit_seq in self._pending_results:
+                result = self._pending_results.pop(self._next_emit_seq)
+                self._partial_texts.pop(self._next_emit_seq, None)
+                self._next_emit_seq += 1
+                if result["success"]:
+                    self.store.append(result)
+                    if self.context is not None and result.get("target_language"):
+                        self.context.add(result["original"], result["translated"], result["target_language"])
+                self._emit_result(result)
+            partial = self._partial_texts.get(self._next_emit_seq)
+            if partial and self.delta_callback:
+                self._emit_delta(*partial)
+    
+    def _process_thread(self, index):
+        leftover = None
+        # workers above the configured count retire after their current item
+        while self.is_running and index < max(1, self.workers):
+            if leftover is not None:
+                item, leftover = leftover, None
+            else:
                 try:
-                    response = client.chat.completions.create(
-                        model=model,
-                        messages=[
-                            {
-                                "role": "system", 
-                                "content": f"你是一个翻译助手。请将用户输入的文本翻译成{target_language}。\n\n注意：输入文本来自语音识别，可能存在识别错误。请在翻译时：\n1. 根据上下文推断并纠正可能的识别错误\n2. 输出通顺自然的翻译结果\n3. 只输出翻译结果，不要输出其他内容\n4. 如果输入已经是{target_language}，请直接输出原文"
-                            },
-                            {"role": "user", "content": text}
-                        ],
-                        temperature=0.3,
-                        max_tokens=4096
-                    )
-                    
-                    translated = response.choices[0].message.content.strip()
-                    result = {
-                        "original": text,
-                        "translated": translated,
-                        "success": True
-                    }
-                    self.all_results.append(result)
-                    self.result_queue.put(result)
-                    
-                except Exception as e:
-                    import traceback
-                    print(f"[Translator] 翻译错误: {e}")
-                    traceback.print_exc()
-                    self.result_queue.put({
-                        "original": text,
-                        "translated": f"[翻译错误: {str(e)}]",
-                        "success": False
-                    })
-                    
-            except queue.Empty:
-                continue
+                    item = self.translate_queue.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+            
+            batch, leftover = self._collect_batch(item)
+            results = []
+            try:
+                results = self._translate_items(batch)
             except Exception as e:
-                print(f"翻译处理错误: {e}")
+                print(f"[Translator] 翻译处理错误: {e}")
+            finally:
+                for i, item in enumerate(batch):
+                    result = results[i] if i < len(results) else None
+                    if result is None:
+                        result = {
+                            "original": item["text"],
+                            "translated": "[翻译错误]",
+                            "success": False,
+                            "timing": item.get("timing")
+                        }
+                    result.setdefault("target_language", item["target_language"])
+                    self._deliver(item["seq"], self._post_edit(result, item["target_language"]))
+        if leftover is not None:
+            self.translate_queue.put(leftover)
     
     def start(self):
         if self.is_running:
             return
         self.is_running = True
-        self.thread = threading.Thread(target=self._process_thread, daemon=True)
-        self.thread.start()
+        self.threads = []
+        self._spawn_workers()
+    
+    def _spawn_workers(self):
+        for i in range(max(1, self.workers)):
+            if i < len(self.threads) and self.threads[i].is_alive():
+                continue
+            thread = threading.Thread(target=self._process_thread, args=(i,), daemon=True, name=f"translator-{i}")
+            thread.start()
+            if i < len(self.threads):
+                self.threads[i] = thread
+            else:
+                self.threads.append(thread)
     
     def stop(self):
         self.is_running = False
-        if self.thread:
-            self.thread.join(timeout=2)
+        for thread in self.threads:
+            thread.join(timeout=2)
+        self.threads = []
+    
+    def _emit_result(self, result):
+        if self.result_callback:
+            try:
+                self.result_callback(result)
+            except Exception as e:
+                print(f"[Translator] 结果回调错误: {e}")
+            return
+        self.result_queue.put(result)
+    
+    def set_result_callback(self, callback):
+        self.result_callback = callback
+    
+    def set_delta_callback(self, callback):
+        self.delta_callback = callback
     
     def get_result(self, timeout=None):
         try:
@@ -154,126 +918,139 @@ class Translator:
         except queue.Empty:
             return None
     
+    def get_cache_stats(self):
+        if self.cache is None:
+            return None
+        return self.cache.get_stats()
+    
     def get_all_results(self):
-        return self.all_results.copy()
+        return self.store.get_all()
     
     def clear_results(self):
-        self.all_results = []
+        self.store.new_session()
+        if self.context is not None:
+            self.context.clear()
     
     def translate_sync(self, text, target_language="中文"):
-        client = self.translate_client or self.client
-        model = self.translate_model if self.translate_client else self.model
+        result = self._translate_item({"text": text, "target_language": target_language})
+        result = self._post_edit(result, target_language)
+        result.pop("timing", None)
+        return result
+    
+    def _organize_chunk(self, text_chunk, endpoints, context=""):
+        if not endpoints:
+            return None, "未配置整理API密钥"
         
-        if not client or not (self.translate_api_key or self.api_key):
-            return {"original": text, "translated": "[未配置API密钥]", "success": False}
+        content = text_chunk
+        if context:
+            content = f"【上文，仅供理解语境，不要输出】\n{context}\n\n【需要整理的文本】\n{text_chunk}"
         
-        try:
-            response = client.chat.completions.create(
-                model=model,
-                messages=[
-                    {
-                        "role": "system", 
-                        "content": f"你是一个翻译助手。请将用户输入的文本翻译成{target_language}。\n\n注意：输入文本来自语音识别，可能存在识别错误。请在翻译时：\n1. 根据上下文推断并纠正可能的识别错误\n2. 输出通顺自然的翻译结果\n3. 只输出翻译结果，不要输出其他内容\n4. 如果输入已经是{target_language}，请直接输出原文"
-                    },
-                    {"role": "user", "content": text}
-                ],
-                temperature=0.3,
-                max_tokens=4096
-            )
-            
-            translated = response.choices[0].message.content.strip()
-            return {"original": text, "translated": translated, "success": True}
-            
-        except Exception as e:
-            return {"original": text, "translated": f"[翻译错误: {str(e)}]", "success": False}
+        return self._organize_request(endpoints, [
+            {
+                "role": "system", 
+                "content": "你是一个文本整理助手。用户会给你一段来自语音识别翻译的文本，可能存在以下问题：\n1. 识别错误导致的错别字\n2. 翻译不准确\n3. 句子不连贯\n\n请整理这段文本：\n- 保留所有内容，不要删除任何信息\n- 纠正明显的识别错误\n- 使句子通顺连贯\n- 保持原意不变\n- 输出完整连贯的段落"
+            },
+            {"role": "user", "content": content}
+        ])
     
-    def _organize_chunk(self, text_chunk):
-        client = self.organize_client or self.client
-        model = self.organize_model if self.organize_client else self.model
-        
-        if not client:
-            return None, "未配置整理API密钥"
+    def _merge_chunks(self, texts, endpoints):
+        return self._organize_request(endpoints, [
+            {
+                "role": "system", 
+                "content": "你是一个文本整合助手。用户会给你多段已整理的文本，请将它们整合成一篇完整连贯的文章。\n- 保留所有内容，不要删除任何信息\n- 保持内容连贯\n- 合并成一段完整的文本\n- 只输出整合后的文本"
+            },
+            {"role": "user", "content": "\n\n".join(texts)}
+        ])
+    
+    def _organize_request(self, endpoints, messages):
+        # the pipeline retries on its own; the router only skips endpoints whose circuit is open
+        def request(endpoint):
+            response = self._create_completion(endpoint, messages, priority=PRIORITY_ORGANIZE, max_tokens=8192, slot=False)
+            return response.choices[0].message.content.strip()
         
         try:
-            response = client.chat.completions.create(
-                model=model,
-                messages=[
-                    {
-                        "role": "system", 
-                        "content": "你是一个文本整理助手。用户会给你一段来自语音识别翻译的文本，可能存在以下问题：\n1. 识别错误导致的错别字\n2. 翻译不准确\n3. 句子不连贯\n\n请整理这段文本：\n- 保留所有内容，不要删除任何信息\n- 纠正明显的识别错误\n- 使句子通顺连贯\n- 保持原意不变\n- 输出完整连贯的段落"
-                    },
-                    {"role": "user", "content": text_chunk}
-                ],
-                temperature=0.3,
-                max_tokens=8192
-            )
-            
-            return response.choices[0].message.content.strip(), None
-            
+            result, _ = self.router.call(endpoints, request, retries=0)
+            return result, None
         except Exception as e:
             return None, str(e)
     
-    def organize_results(self, translations):
+    def organize_results(self, translations, progress_callback=None, is_cancelled=None):
         if not translations:
             return None, "没有翻译结果"
         
-        client = self.organize_client or self.client
-        if not client:
-            return None, "未配置API密钥"
-        
-        all_text = "\n".join([t.get("translated", "") for t in translations])
-        
-        max_chunk_chars = 6000
-        if len(all_text) <= max_chunk_chars:
-            return self._organize_chunk(all_text)
-        
-        chunks = []
-        lines = all_text.split("\n")
-        current_chunk = ""
-        
-        for line in lines:
-            if len(current_chunk) + len(line) + 1 > max_chunk_chars:
-                if current_chunk:
-                    chunks.append(current_chunk)
-                current_chunk = line
-            else:
-                current_chunk += "\n" + line if current_chunk else line
-        
-        if current_chunk:
-            chunks.append(current_chunk)
-        
-        print(f"[Translator] 分段整理: {len(chunks)} 段, 总字符: {len(all_text)}")
-        
-        organized_chunks = []
-        for i, chunk in enumerate(chunks):
-            print(f"[Translator] 整理第 {i+1}/{len(chunks)} 段 ({len(chunk)}字符)...")
-            result, error = self._organize_chunk(chunk)
-            if error:
-                return None, f"第{i+1}段整理错误: {error}"
-            organized_chunks.append(result)
-        
-        if len(organized_chunks) == 1:
-            return organized_chunks[0], None
-        
-        final_text = "\n\n".join(organized_chunks)
-        
-        try:
-            print(f"[Translator] 最终整合 {len(organized_chunks)} 段...")
-            response = client.chat.completions.create(
-                model=self.organize_model if self.organize_client else self.model,
-                messages=[
-                    {
-                        "role": "system", 
-                        "content": "你是一个文本整合助手。用户会给你多段已整理的文本，请将它们整合成一篇完整连贯的文章。\n- 保留所有内容，不要删除任何信息\n- 保持内容连贯\n- 合并成一段完整的文本\n- 只输出整合后的文本"
-                    },
-                    {"role": "user", "content": final_text}
-                ],
-                temperature=0.3,
-                max_tokens=8192
+        from organizer import OrganizePipeline
+        with self._endpoints("organize") as endpoints:
+            if not endpoints:
+                return None, "未配置API密钥"
+            pipeline = OrganizePipeline(
+                self, endpoints,
+                concurrency=self.organize_concurrency,
+                chunk_tokens=self.organize_chunk_tokens,
+                retries=self.organize_retries,
+                progress_callback=progress_callback,
+                is_cancelled=is_cancelled,
+                cache=self._organize_cache
             )
-            
-            return response.choices[0].message.content.strip(), None
-            
-        except Exception as e:
-            print(f"[Translator] 最终整合失败: {e}")
-            return final_text, None
+            result, error = pipeline.run(translations)
+        if error is None:
+            self.last_organized = result
+        return result, error
+
+def translator_options(config):
+    cache = None
+    if config.get("translation_cache", True):
+        cache = get_cache(
+            max_entries=config.get("translation_cache_max_entries", 100000),
+            max_age_days=config.get("translation_cache_max_age_days", 30)
+        )
+    return dict(
+        api_key=config.get("api_key", ""),
+        api_base=config.get("api_base", "https://api.deepseek.com"),
+        model=config.get("model", "deepseek-chat"),
+        bypass_proxy=config.get("bypass_proxy", False),
+        translate_api_key=config.get("translate_api_key", ""),
+        translate_api_base=config.get("translate_api_base", "https://api.siliconflow.cn/v1"),
+        translate_model=config.get("translate_model", "Qwen/Qwen3-8B"),
+        organize_api_key=config.get("organize_api_key", ""),
+        organize_api_base=config.get("organize_api_base", "https://api.deepseek.com"),
+        organize_model=config.get("organize_model", "deepseek-chat"),
+        workers=config.get("translate_workers", 3),
+        endpoint_concurrency=config.get("endpoint_max_concurrency", 4),
+        stream_output=config.get("stream_translation", True),
+        cache=cache,
+        cache_with_context=config.get("translation_cache_with_context", False),
+        cache_context_max_tokens=config.get("translation_cache_context_max_tokens", 16),
+        batching=config.get("batch_translation", True),
+        batch_max_items=config.get("batch_max_items", 8),
+        batch_max_tokens=config.get("batch_max_tokens", 800),
+        batch_max_wait=config.get("batch_max_wait", 0.05),
+        organize_concurrency=config.get("organize_concurrency", 4),
+        organize_chunk_tokens=config.get("organize_chunk_tokens", 3000),
+        organize_retries=config.get("organize_retries", 2),
+        store=get_store(
+            window=config.get("session_memory_window", 200),
+            retention_days=config.get("session_retention_days", 30)
+        ),
+        context_pairs=config.get("context_max_pairs", 20) if config.get("translation_context", True) else 0,
+        context_tokens=config.get("context_max_tokens", 1200),
+        glossary=get_glossary() if config.get("glossary_enabled", True) else None,
+        local_backend=get_local_backend(
+            pairs=config.get("local_translation_pairs", []),
+            threads=config.get("local_translation_threads", 2),
+            max_batch=config.get("local_translation_batch", 16),
+            cache=cache
+        ),
+        local_fallback=config.get("local_translation_fallback", True),
+        failover=config.get("endpoint_failover", True),
+        hedging=config.get("hedged_requests", True),
+        request_retries=config.get("request_retries", 2),
+        circuit_failure_threshold=config.get("circuit_failure_threshold", 3),
+        circuit_reset_seconds=config.get("circuit_reset_seconds", 30),
+        rate_limit_rpm=config.get("rate_limit_rpm", 0),
+        rate_limit_tpm=config.get("rate_limit_tpm", 0),
+        rate_limit_overrides=config.get("rate_limits", {}),
+        rate_limit_reserve=config.get("rate_limit_reserve", 0.2)
+    )
+
+def create_translator(config):
+    return Translator(**translator_options(config))
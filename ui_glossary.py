@@ -0,0 +1,155 @@
+from PySide6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
+    QTableWidget, QTableWidgetItem, QHeaderView, QMessageBox
+)
+
+COLUMNS = ["术语", "译法", "常见误识别（逗号分隔）", "需替换的错误译法（逗号分隔）"]
+
+class GlossaryDialog(QDialog):
+    def __init__(self, glossary, parent=None):
+        super().__init__(parent)
+        self.glossary = glossary
+        self._init_ui()
+        self._load()
+
+    def _init_ui(self):
+        self.setWindowTitle("术语表")
+        self.setMinimumSize(820, 460)
+
+        layout = QVBoxLayout(self)
+        layout.setSpacing(10)
+
+        hint = QLabel("识别结果中的误识别写法会被替换为术语；翻译时按给定译法翻译，并替换译文中的错误译法")
+        hint.setWordWrap(True)
+        layout.addWidget(hint)
+
+        self.table = QTableWidget(0, len(COLUMNS))
+        self.table.setHorizontalHeaderLabels(COLUMNS)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        header = self.table.horizontalHeader()
+        for col in range(len(COLUMNS)):
+            header.setSectionResizeMode(col, QHeaderView.ResizeMode.Stretch)
+        layout.addWidget(self.table)
+
+        btn_layout = QHBoxLayout()
+        add_btn = QPushButton("添加")
+        add_btn.setFixedWidth(80)
+        add_btn.clicked.connect(self._add_row)
+        btn_layout.addWidget(add_btn)
+
+        remove_btn = QPushButton("删除")
+        remove_btn.setFixedWidth(80)
+        remove_btn.clicked.connect(self._remove_rows)
+        btn_layout.addWidget(remove_btn)
+
+        self.count_label = QLabel()
+        btn_layout.addWidget(self.count_label)
+        btn_layout.addStretch()
+
+        save_btn = QPushButton("保存")
+        save_btn.setFixedWidth(80)
+        save_btn.clicked.connect(self._save)
+        btn_layout.addWidget(save_btn)
+
+        close_btn = QPushButton("关闭")
+        close_btn.setFixedWidth(80)
+        close_btn.clicked.connect(self.reject)
+        btn_layout.addWidget(close_btn)
+        layout.addLayout(btn_layout)
+
+        self.setStyleSheet("""
+            QDialog {
+                background-color: #2b2b2b;
+            }
+            QTableWidget {
+                background-color: #1e1e1e;
+                color: #ffffff;
+                border: 1px solid #3c3c3c;
+                border-radius: 6px;
+                padding: 4px;
+                font-size: 12px;
+                gridline-color: #3c3c3c;
+            }
+            QHeaderView::section {
+                background-color: #3c3c3c;
+                color: #ffffff;
+                border: none;
+                padding: 4px;
+            }
+            QLabel {
+                color: #aaaaaa;
+                font-size: 12px;
+            }
+            QPushButton {
+                background-color: #3c3c3c;
+                color: #ffffff;
+                border: none;
+                border-radius: 4px;
+                padding: 8px 16px;
+                font-size: 12px;
+            }
+            QPushButton:hover {
+                background-color: #4a4a4a;
+            }
+            QPushButton:pressed {
+                background-color: #555555;
+            }
+        """)
+
+    def _load(self):
+        entries = self.glossary.entries
+        self.table.setRowCount(len(entries))
+        for row, entry in enumerate(entries):
+            target = entry["target"]
+            if isinstance(target, dict):
+                # per-language targets are shown as language=translation pairs
+                target = ", ".join(f"{k}={v}" for k, v in target.items())
+            values = [entry["source"], target, ", ".join(entry["aliases"]), ", ".join(entry["variants"])]
+            for col, value in enumerate(values):
+                self.table.setItem(row, col, QTableWidgetItem(value))
+        self.count_label.setText(f"{len(entries)} 条")
+
+    def _add_row(self):
+        row = self.table.rowCount()
+        self.table.insertRow(row)
+        self.table.setCurrentCell(row, 0)
+        self.table.editItem(self.table.item(row, 0) or QTableWidgetItem())
+
+    def _remove_rows(self):
+        rows = sorted({index.row() for index in self.table.selectedIndexes()}, reverse=True)
+        for row in rows:
+            self.table.removeRow(row)
+
+    def _cell(self, row, col):
+        item = self.table.item(row, col)
+        return item.text().strip() if item else ""
+
+    def _parse_target(self, text):
+        if "=" not in text:
+            return text
+        target = {}
+        for part in text.replace("，", ",").split(","):
+            if "=" in part:
+                language, value = part.split("=", 1)
+                target[language.strip()] = value.strip()
+        return target
+
+    def _save(self):
+        entries = []
+        for row in range(self.table.rowCount()):
+            source = self._cell(row, 0)
+            if not source:
+                continue
+            entries.append({
+                "source": source,
+                "target": self._parse_target(self._cell(row, 1)),
+                "aliases": self._cell(row, 2),
+                "variants": self._cell(row, 3)
+            })
+        try:
+            self.glossary.save(entries)
+        except Exception as e:
+            QMessageBox.warning(self, "保存失败", str(e))
+            return
+        self.count_label.setText(f"{len(self.glossary.entries)} 条, 已保存")
@@ -12,10 +12,11 @@ class TranslationBar(QWidget):
     topmost_changed = Signal(bool)
     settings_clicked = Signal()
     result_clicked = Signal()
+    stats_clicked = Signal()
+    glossary_clicked = Signal()
     
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.translations = []
         self._init_ui()
     
     def _init_ui(self):
@@ -57,6 +58,16 @@ class TranslationBar(QWidget):
         self.result_btn.clicked.connect(self.result_clicked.emit)
         control_layout.addWidget(self.result_btn)
         
+        self.stats_btn = QPushButton("延迟")
+        self.stats_btn.setFixedWidth(50)
+        self.stats_btn.clicked.connect(self.stats_clicked.emit)
+        control_layout.addWidget(self.stats_btn)
+        
+        self.glossary_btn = QPushButton("术语")
+        self.glossary_btn.setFixedWidth(50)
+        self.glossary_btn.clicked.connect(self.glossary_clicked.emit)
+        control_layout.addWidget(self.glossary_btn)
+        
         control_layout.addStretch()
         
         self.status_label = QLabel("就绪")
@@ -137,10 +148,6 @@ class TranslationBar(QWidget):
     
     def update_translated(self, original, translated):
         self.translated_label.setText(f"译文: {translated}")
-        self.translations.append({
-            "original": original,
-            "translated": translated
-        })
     
     def update_status(self, status):
         self.status_label.setText(status)
@@ -158,19 +165,14 @@ class TranslationBar(QWidget):
     
     def set_translated_text(self, original, translated):
         self.translated_label.setText(f"译文: {translated}")
-        self.translations.append({
-            "original": original,
-            "translated": translated
-        })
+    
+    def set_translated_partial(self, partial):
+        self.translated_label.setText(f"译文: {partial}")
     
     def set_status(self, status):
         self.status_label.setText(status)
     
-    def get_translations(self):
-        return self.translations.copy()
-    
     def clear_translations(self):
-        self.translations = []
         self.original_label.setText("原文: 等待音频...")
         self.translated_label.setText("译文: 等待翻译...")
     
@@ -1,37 +1,128 @@
 from PySide6.QtWidgets import (
-    QDialog, QVBoxLayout, QHBoxLayout, QLabel, 
-    QTextEdit, QPushButton, QFileDialog, QSplitter
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QWidget,
+    QTextEdit, QPushButton, QFileDialog, QSplitter, QListView, QAbstractItemView
 )
-from PySide6.QtCore import Qt, QThread, Signal
+from PySide6.QtCore import Qt, QThread, Signal, QAbstractListModel, QModelIndex
 from PySide6.QtGui import QFont
-import json
+from collections import OrderedDict
 from datetime import datetime
 
+from ui_search import SearchDialog
+import exporter
+
+PAGE_SIZE = 500
+MAX_CACHED_PAGES = 8
+
+def _format_entry(item):
+    return f"[{item['index']}] 原文: {item['original']}\n    译文: {item['translated']}"
+
+class TranscriptModel(QAbstractListModel):
+    # rows are fetched from the session store a page at a time, only for the
+    # part of the list the view actually paints
+    entry_appended = Signal(int)
+    
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.session_id = store.session_id
+        self._rows = store.count()
+        self._pages = OrderedDict()
+        self.entry_appended.connect(self._on_appended)
+        store.add_listener(self._listener)
+    
+    def detach(self):
+        self.store.remove_listener(self._listener)
+    
+    def _listener(self, entry):
+        # called on the translator thread; the queued signal hops to the GUI thread
+        if self.store.session_id == self.session_id:
+            self.entry_appended.emit(entry["index"])
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._rows
+    
+    def entry(self, row):
+        page_no = row // PAGE_SIZE
+        page = self._pages.get(page_no)
+        if page is None:
+            page = self.store.page(page_no * PAGE_SIZE, PAGE_SIZE, self.session_id)
+            self._pages[page_no] = page
+            while len(self._pages) > MAX_CACHED_PAGES:
+                self._pages.popitem(last=False)
+        else:
+            self._pages.move_to_end(page_no)
+        offset = row - page_no * PAGE_SIZE
+        return page[offset] if offset < len(page) else None
+    
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        if role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.ToolTipRole):
+            entry = self.entry(index.row())
+            return _format_entry(entry) if entry else None
+        return None
+    
+    def _on_appended(self, index):
+        if index <= self._rows:
+            return
+        first = self._rows
+        self.beginInsertRows(QModelIndex(), first, index - 1)
+        for page_no in range(first // PAGE_SIZE, (index - 1) // PAGE_SIZE + 1):
+            self._pages.pop(page_no, None)
+        self._rows = index
+        self.endInsertRows()
+
+# organize threads whose dialog closed before they finished; cancelled requests still
+# have to return, so the thread objects are kept alive here until they do
+_detached_threads = []
+
+def _detach_thread(thread):
+    _detached_threads[:] = [t for t in _detached_threads if t.isRunning()]
+    _detached_threads.append(thread)
+
 class OrganizeThread(QThread):
     finished = Signal(str)
     error = Signal(str)
+    progress = Signal(str, str)
     
-    def __init__(self, translator, translations):
+    def __init__(self, translator, store):
         super().__init__()
         self.translator = translator
-        self.translations = translations
+        self.store = store
+        self.cancelled = False
+    
+    def cancel(self):
+        self.cancelled = True
     
     def run(self):
-        result, error = self.translator.organize_results(self.translations)
+        result, error = self.translator.organize_results(
+            self.store.get_all(),
+            progress_callback=self.progress.emit,
+            is_cancelled=lambda: self.cancelled
+        )
         if error:
             self.error.emit(error)
         else:
             self.finished.emit(result)
 
 class ResultDialog(QDialog):
-    def __init__(self, translations, translator=None, parent=None):
+    def __init__(self, store, translator=None, parent=None):
         super().__init__(parent)
-        self.translations = translations
+        self.store = store
         self.translator = translator
+        self.model = TranscriptModel(store, self)
+        self.finished.connect(lambda _: self.model.detach())
+        # accept()/reject() (Esc, buttons) end the dialog without a closeEvent
+        self.finished.connect(lambda _: self._detach_organize())
+        self._matches = []
+        self._match_pos = -1
         self.organized_text = ""
         self.organize_thread = None
         self._init_ui()
-        self._display_results()
+        if translator is not None and translator.last_organized:
+            # latest background (rolling) or previous organize result
+            self.organized_text = translator.last_organized
+            self.organized_text_edit.setText(self.organized_text)
     
     def _init_ui(self):
         self.setWindowTitle("翻译结果")
@@ -43,11 +134,33 @@ class ResultDialog(QDialog):
         
         splitter = QSplitter(Qt.Orientation.Horizontal)
         
-        self.original_text = QTextEdit()
-        self.original_text.setReadOnly(True)
-        self.original_text.setLineWrapMode(QTextEdit.LineWrapMode.WidgetWidth)
-        self.original_text.setPlaceholderText("原文和译文")
-        splitter.addWidget(self.original_text)
+        left = QWidget()
+        left_layout = QVBoxLayout(left)
+        left_layout.setContentsMargins(0, 0, 0, 0)
+        left_layout.setSpacing(6)
+        
+        search_layout = QHBoxLayout()
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("搜索原文或译文，回车查找下一个")
+        self.search_edit.returnPressed.connect(self._on_search)
+        self.search_edit.textChanged.connect(self._on_search_changed)
+        search_layout.addWidget(self.search_edit)
+        self.count_label = QLabel()
+        search_layout.addWidget(self.count_label)
+        left_layout.addLayout(search_layout)
+        
+        self.transcript_view = QListView()
+        self.transcript_view.setModel(self.model)
+        self.transcript_view.setUniformItemSizes(True)
+        self.transcript_view.setWordWrap(False)
+        self.transcript_view.setTextElideMode(Qt.TextElideMode.ElideRight)
+        self.transcript_view.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.transcript_view.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        left_layout.addWidget(self.transcript_view)
+        splitter.addWidget(left)
+        
+        self.model.rowsInserted.connect(self._on_rows_inserted)
+        self._update_count()
         
         self.organized_text_edit = QTextEdit()
         self.organized_text_edit.setReadOnly(True)
@@ -62,10 +175,15 @@ class ResultDialog(QDialog):
         btn_layout.addStretch()
         
         self.organize_btn = QPushButton("整理")
-        self.organize_btn.setFixedWidth(80)
+        self.organize_btn.setFixedWidth(110)
         self.organize_btn.clicked.connect(self._on_organize)
         btn_layout.addWidget(self.organize_btn)
         
+        history_btn = QPushButton("历史搜索")
+        history_btn.setFixedWidth(80)
+        history_btn.clicked.connect(self._on_history)
+        btn_layout.addWidget(history_btn)
+        
         copy_btn = QPushButton("复制全部")
         copy_btn.setFixedWidth(80)
         copy_btn.clicked.connect(self._on_copy)
@@ -76,6 +194,13 @@ class ResultDialog(QDialog):
         export_btn.clicked.connect(self._on_export)
         btn_layout.addWidget(export_btn)
         
+        self.live_export_btn = QPushButton()
+        self.live_export_btn.setFixedWidth(80)
+        self.live_export_btn.setToolTip("边录制边写入字幕文件，关闭窗口后继续导出")
+        self.live_export_btn.clicked.connect(self._on_live_export)
+        btn_layout.addWidget(self.live_export_btn)
+        self._update_live_export_btn()
+        
         close_btn = QPushButton("关闭")
         close_btn.setFixedWidth(80)
         close_btn.clicked.connect(self.accept)
@@ -90,7 +215,7 @@ class ResultDialog(QDialog):
             QDialog {
                 background-color: #2b2b2b;
             }
-            QTextEdit {
+            QTextEdit, QListView, QLineEdit {
                 background-color: #1e1e1e;
                 color: #ffffff;
                 border: 1px solid #3c3c3c;
@@ -98,6 +223,16 @@ class ResultDialog(QDialog):
                 padding: 8px;
                 font-size: 13px;
             }
+            QListView::item {
+                padding: 4px 0px;
+            }
+            QListView::item:selected {
+                background-color: #3a4a5a;
+            }
+            QLabel {
+                color: #aaaaaa;
+                font-size: 12px;
+            }
             QPushButton {
                 background-color: #3c3c3c;
                 color: #ffffff;
@@ -123,32 +258,55 @@ class ResultDialog(QDialog):
         """)
         
         font = QFont("Microsoft YaHei", 11)
-        self.original_text.setFont(font)
+        self.transcript_view.setFont(font)
         self.organized_text_edit.setFont(font)
     
-    def _display_results(self):
-        if not self.translations:
-            self.original_text.setText("暂无翻译结果")
+    def _update_count(self):
+        text = f"{self.model.rowCount()} 条"
+        if self._matches:
+            text = f"匹配 {self._match_pos + 1}/{len(self._matches)} · " + text
+        self.count_label.setText(text)
+    
+    def _on_rows_inserted(self, parent, first, last):
+        bar = self.transcript_view.verticalScrollBar()
+        if bar.value() >= bar.maximum() - 2 and not self._matches:
+            self.transcript_view.scrollToBottom()
+        self._update_count()
+    
+    def _on_search_changed(self, text):
+        self._matches = []
+        self._match_pos = -1
+        self._update_count()
+    
+    def _on_search(self):
+        query = self.search_edit.text().strip()
+        if not query:
             return
-        
-        lines = []
-        lines.append(f"=== 翻译结果 ({len(self.translations)} 条) ===\n")
-        
-        for i, item in enumerate(self.translations, 1):
-            original = item.get("original", "")
-            translated = item.get("translated", "")
-            lines.append(f"[{i}] 原文: {original}")
-            lines.append(f"    译文: {translated}")
-            lines.append("")
-        
-        self.original_text.setText("\n".join(lines))
+        if not self._matches:
+            self._matches = self.store.search(query, self.model.session_id)
+            self._match_pos = -1
+            if not self._matches:
+                self.count_label.setText("无匹配")
+                return
+        self._match_pos = (self._match_pos + 1) % len(self._matches)
+        index = self.model.index(self._matches[self._match_pos] - 1)
+        self.transcript_view.setCurrentIndex(index)
+        self.transcript_view.scrollTo(index, QAbstractItemView.ScrollHint.PositionAtCenter)
+        self._update_count()
+    
+    def _on_history(self):
+        self.search_dialog = SearchDialog(self.store, self)
+        self.search_dialog.exec()
+    
+    def _format_entries(self, entries):
+        return "\n\n".join(_format_entry(item) for item in entries) + "\n"
     
     def _on_organize(self):
         if not self.translator:
             self.organized_text_edit.setText("[错误: 未配置翻译器]")
             return
         
-        if not self.translations:
+        if not self.store.count():
             self.organized_text_edit.setText("[没有翻译结果]")
             return
         
@@ -156,11 +314,16 @@ class ResultDialog(QDialog):
         self.organize_btn.setText("整理中...")
         self.organized_text_edit.setText("正在整理...")
         
-        self.organize_thread = OrganizeThread(self.translator, self.translations)
+        self.organize_thread = OrganizeThread(self.translator, self.store)
         self.organize_thread.finished.connect(self._on_organize_finished)
         self.organize_thread.error.connect(self._on_organize_error)
+        self.organize_thread.progress.connect(self._on_organize_progress)
         self.organize_thread.start()
     
+    def _on_organize_progress(self, text, stage):
+        self.organized_text_edit.setText(text)
+        self.organize_btn.setText(stage)
+    
     def _on_organize_finished(self, result):
         self.organized_text = result
         self.organized_text_edit.setText(result)
@@ -172,39 +335,59 @@ class ResultDialog(QDialog):
         self.organize_btn.setEnabled(True)
         self.organize_btn.setText("整理")
     
+    def _full_text(self):
+        return f"=== 翻译结果 ({self.store.count()} 条) ===\n\n" + self._format_entries(self.store.iter_entries())
+    
     def _on_copy(self):
-        text = "=== 原始翻译 ===\n" + self.original_text.toPlainText()
+        text = "=== 原始翻译 ===\n" + self._full_text()
         if self.organized_text:
             text += "\n\n=== 整理后 ===\n" + self.organized_text
         from PySide6.QtWidgets import QApplication
         clipboard = QApplication.clipboard()
         clipboard.setText(text)
     
+    def _export_filter(self):
+        return ";;".join(f"{name} (*{ext})" for ext, name in exporter.FORMATS.items())
+    
     def _on_export(self):
         file_path, _ = QFileDialog.getSaveFileName(
             self,
             "导出翻译结果",
-            f"translation_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt",
-            "文本文件 (*.txt);;JSON文件 (*.json)"
+            f"translation_{datetime.now().strftime('%Y%m%d_%H%M%S')}.srt",
+            self._export_filter()
         )
         
         if file_path:
-            if file_path.endswith(".json"):
-                export_data = {
-                    "translations": self.translations,
-                    "organized": self.organized_text if self.organized_text else None
-                }
-                with open(file_path, "w", encoding="utf-8") as f:
-                    json.dump(export_data, f, ensure_ascii=False, indent=2)
-            else:
-                text = "=== 原始翻译 ===\n" + self.original_text.toPlainText()
-                if self.organized_text:
-                    text += "\n\n=== 整理后 ===\n" + self.organized_text
-                with open(file_path, "w", encoding="utf-8") as f:
-                    f.write(text)
+            exporter.export_session(self.store, file_path, self.model.session_id, self.organized_text or None)
     
-    def closeEvent(self, event):
+    def _on_live_export(self):
+        if exporter.get_live_export(self.store):
+            exporter.stop_live_export(self.store)
+        else:
+            file_path, _ = QFileDialog.getSaveFileName(
+                self,
+                "实时导出",
+                f"live_{datetime.now().strftime('%Y%m%d_%H%M%S')}.srt",
+                self._export_filter()
+            )
+            if file_path:
+                exporter.start_live_export(self.store, file_path)
+        self._update_live_export_btn()
+    
+    def _update_live_export_btn(self):
+        self.live_export_btn.setText("停止导出" if exporter.get_live_export(self.store) else "实时导出")
+    
+    def _detach_organize(self):
         if self.organize_thread and self.organize_thread.isRunning():
-            self.organize_thread.terminate()
-            self.organize_thread.wait()
+            # never terminate(): the thread may hold the store or config lock, or be inside
+            # Translator._endpoints() with a client checked out
+            self.organize_thread.cancel()
+            for signal in (self.organize_thread.finished, self.organize_thread.error, self.organize_thread.progress):
+                signal.disconnect()
+            _detach_thread(self.organize_thread)
+            self.organize_thread = None
+    
+    def closeEvent(self, event):
+        self.model.detach()
+        self._detach_organize()
         event.accept()
@@ -0,0 +1,122 @@
+from PySide6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLineEdit, QLabel, QPushButton,
+    QTableWidget, QTableWidgetItem, QHeaderView
+)
+from PySide6.QtCore import QTimer
+from datetime import datetime
+import time
+
+COLUMNS = ["时间", "会话", "原文", "译文"]
+
+class SearchDialog(QDialog):
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self._init_ui()
+
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.timeout.connect(self._run_search)
+
+    def _init_ui(self):
+        self.setWindowTitle("历史搜索")
+        self.setMinimumSize(820, 460)
+
+        layout = QVBoxLayout(self)
+        layout.setSpacing(10)
+
+        search_layout = QHBoxLayout()
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("在所有会话的原文和译文中搜索，多个词用空格分隔")
+        self.search_edit.textChanged.connect(lambda _: self.search_timer.start(200))
+        self.search_edit.returnPressed.connect(self._run_search)
+        search_layout.addWidget(self.search_edit)
+        self.status_label = QLabel()
+        search_layout.addWidget(self.status_label)
+        layout.addLayout(search_layout)
+
+        self.table = QTableWidget(0, len(COLUMNS))
+        self.table.setHorizontalHeaderLabels(COLUMNS)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        header = self.table.horizontalHeader()
+        header.setSectionResizeMode(0, QHeaderView.ResizeMode.ResizeToContents)
+        header.setSectionResizeMode(1, QHeaderView.ResizeMode.ResizeToContents)
+        header.setSectionResizeMode(2, QHeaderView.ResizeMode.Stretch)
+        header.setSectionResizeMode(3, QHeaderView.ResizeMode.Stretch)
+        layout.addWidget(self.table)
+
+        btn_layout = QHBoxLayout()
+        btn_layout.addStretch()
+        close_btn = QPushButton("关闭")
+        close_btn.setFixedWidth(80)
+        close_btn.clicked.connect(self.accept)
+        btn_layout.addWidget(close_btn)
+        layout.addLayout(btn_layout)
+
+        self.setStyleSheet("""
+            QDialog {
+                background-color: #2b2b2b;
+            }
+            QLineEdit, QTableWidget {
+                background-color: #1e1e1e;
+                color: #ffffff;
+                border: 1px solid #3c3c3c;
+                border-radius: 6px;
+                padding: 4px;
+                font-size: 12px;
+            }
+            QTableWidget {
+                gridline-color: #3c3c3c;
+            }
+            QHeaderView::section {
+                background-color: #3c3c3c;
+                color: #ffffff;
+                border: none;
+                padding: 4px;
+            }
+            QLabel {
+                color: #aaaaaa;
+                font-size: 12px;
+            }
+            QPushButton {
+                background-color: #3c3c3c;
+                color: #ffffff;
+                border: none;
+                border-radius: 4px;
+                padding: 8px 16px;
+                font-size: 12px;
+            }
+            QPushButton:hover {
+                background-color: #4a4a4a;
+            }
+            QPushButton:pressed {
+                background-color: #555555;
+            }
+        """)
+
+    def _run_search(self):
+        query = self.search_edit.text().strip()
+        if not query:
+            self.table.setRowCount(0)
+            self.status_label.setText("")
+            return
+
+        start = time.perf_counter()
+        hits = self.store.find(query)
+        elapsed = (time.perf_counter() - start) * 1000
+
+        self.table.setRowCount(len(hits))
+        for row, hit in enumerate(hits):
+            values = [
+                datetime.fromtimestamp(hit["start"]).strftime("%Y-%m-%d %H:%M:%S"),
+                f"#{hit['session_id']}",
+                hit["original"],
+                hit["translated"]
+            ]
+            for col, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                item.setToolTip(value)
+                self.table.setItem(row, col, item)
+        self.status_label.setText(f"{len(hits)} 条 · {elapsed:.1f}ms")
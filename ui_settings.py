@@ -4,8 +4,9 @@ from PySide6.QtWidgets import (
     QFormLayout, QMessageBox, QCheckBox
 )
 from PySide6.QtCore import Qt, QThread, Signal
-from openai import OpenAI
-import httpx
+import http_pool
+from local_mt import available_pairs
+from config import LATENCY_PROFILES
 
 WHISPER_MODELS = ["tiny", "base", "small", "medium", "large-v2", "large-v3"]
 TARGET_LANGUAGES = [
@@ -25,17 +26,19 @@ class ModelLoaderThread(QThread):
         self.bypass_proxy = bypass_proxy
     
     def run(self):
+        client = None
         try:
-            if self.bypass_proxy:
-                http_client = httpx.Client(proxy=None)
-                client = OpenAI(api_key=self.api_key, base_url=self.api_base, http_client=http_client)
-            else:
-                client = OpenAI(api_key=self.api_key, base_url=self.api_base)
+            client = http_pool.acquire(self.api_key, self.api_base, self.bypass_proxy)
+            if client is None:
+                self.error_occurred.emit("未配置API密钥")
+                return
             models = client.models.list()
             model_ids = sorted([m.id for m in models.data])
             self.models_loaded.emit(model_ids)
         except Exception as e:
             self.error_occurred.emit(str(e))
+        finally:
+            http_pool.release(client)
 
 class SettingsDialog(QDialog):
     config_saved = Signal(dict)
@@ -49,7 +52,7 @@ class SettingsDialog(QDialog):
     
     def _init_ui(self):
         self.setWindowTitle("设置")
-        self.setFixedSize(450, 450)
+        self.setFixedSize(450, 490)
         self.setWindowModality(Qt.WindowModality.ApplicationModal)
         
         layout = QVBoxLayout(self)
@@ -96,6 +99,10 @@ class SettingsDialog(QDialog):
         self.whisper_model_combo.addItems(WHISPER_MODELS)
         whisper_layout.addRow("Whisper模型:", self.whisper_model_combo)
         
+        self.latency_profile_combo = QComboBox()
+        self.latency_profile_combo.addItems(list(LATENCY_PROFILES.keys()))
+        whisper_layout.addRow("延迟模式:", self.latency_profile_combo)
+        
         whisper_group.setLayout(whisper_layout)
         layout.addWidget(whisper_group)
         
@@ -106,6 +113,17 @@ class SettingsDialog(QDialog):
         self.target_lang_combo.addItems(TARGET_LANGUAGES)
         translate_layout.addRow("目标语言:", self.target_lang_combo)
         
+        pairs = available_pairs()
+        self.local_pairs_edit = QLineEdit()
+        self.local_pairs_edit.setPlaceholderText(
+            f"例如 en-zh, zh-en；已安装: {', '.join(pairs)}" if pairs else "mt-models 目录下没有本地翻译模型"
+        )
+        translate_layout.addRow("本地翻译:", self.local_pairs_edit)
+        
+        self.local_fallback_cb = QCheckBox("接口不可用时使用本地模型")
+        self.local_fallback_cb.setChecked(True)
+        translate_layout.addRow("", self.local_fallback_cb)
+        
         translate_group.setLayout(translate_layout)
         layout.addWidget(translate_group)
         
@@ -268,10 +286,18 @@ class SettingsDialog(QDialog):
         if index >= 0:
             self.whisper_model_combo.setCurrentIndex(index)
         
+        latency_profile = self.config.get("latency_profile", "balanced")
+        index = self.latency_profile_combo.findText(latency_profile)
+        if index >= 0:
+            self.latency_profile_combo.setCurrentIndex(index)
+        
         target_lang = self.config.get("target_language", "中文")
         index = self.target_lang_combo.findText(target_lang)
         if index >= 0:
             self.target_lang_combo.setCurrentIndex(index)
+        
+        self.local_pairs_edit.setText(", ".join(self.config.get("local_translation_pairs", [])))
+        self.local_fallback_cb.setChecked(self.config.get("local_translation_fallback", True))
     
     def _on_save(self):
         self.config["api_key"] = self.api_key_edit.text().strip()
@@ -279,7 +305,12 @@ class SettingsDialog(QDialog):
         self.config["bypass_proxy"] = self.bypass_proxy_cb.isChecked()
         self.config["model"] = self.model_combo.currentText().strip()
         self.config["whisper_model"] = self.whisper_model_combo.currentText()
+        self.config["latency_profile"] = self.latency_profile_combo.currentText()
         self.config["target_language"] = self.target_lang_combo.currentText()
+        self.config["local_translation_pairs"] = [
+            p.strip() for p in self.local_pairs_edit.text().replace("，", ",").split(",") if p.strip()
+        ]
+        self.config["local_translation_fallback"] = self.local_fallback_cb.isChecked()
         self.config_saved.emit(self.config)
         self.accept()
     
@@ -1,6 +1,7 @@
 from PySide6.QtWidgets import QWidget, QVBoxLayout, QLabel, QProgressBar
 from PySide6.QtCore import Qt, Signal, QThread
-from pathlib import Path
+
+import model_loader
 
 class LoadingThread(QThread):
     progress = Signal(str, int)
@@ -14,43 +15,11 @@ class LoadingThread(QThread):
             
             self.progress.emit("正在加载语音识别模型...", 30)
             
-            base_dir = Path(__file__).parent
-            model_dir = base_dir / "sherpa-onnx-streaming-zipformer-bilingual-zh-en-2023-02-20"
-            
-            encoder = str(model_dir / "encoder-epoch-99-avg-1.int8.onnx")
-            decoder = str(model_dir / "decoder-epoch-99-avg-1.int8.onnx")
-            joiner = str(model_dir / "joiner-epoch-99-avg-1.int8.onnx")
-            tokens = str(model_dir / "tokens.txt")
-            
-            self.progress.emit("初始化识别引擎...", 50)
-            
-            recognizer = sherpa_onnx.OnlineRecognizer.from_transducer(
-                encoder=encoder,
-                decoder=decoder,
-                joiner=joiner,
-                tokens=tokens,
-                num_threads=4,
-                sample_rate=16000,
-                feature_dim=80,
-                decoding_method="greedy_search"
-            )
+            recognizer = model_loader.get_recognizer()
             
             self.progress.emit("正在加载标点模型...", 70)
             
-            punct_model = None
-            punct_dir = base_dir / "sherpa-onnx-punct-ct-transformer-zh-en-vocab272727-2024-04-12"
-            punct_model_path = str(punct_dir / "model.onnx")
-            
-            if punct_dir.exists():
-                try:
-                    model_config = sherpa_onnx.OfflinePunctuationModelConfig(
-                        ct_transformer=punct_model_path,
-                        num_threads=2
-                    )
-                    config = sherpa_onnx.OfflinePunctuationConfig(model=model_config)
-                    punct_model = sherpa_onnx.OfflinePunctuation(config)
-                except Exception as e:
-                    print(f"标点模型加载失败 (可选): {e}")
+            punct_model = model_loader.get_punct_model()
             
             self.progress.emit("模型加载完成", 100)
             
@@ -0,0 +1,192 @@
+from PySide6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QLabel,
+    QTableWidget, QTableWidgetItem, QHeaderView, QFileDialog
+)
+from PySide6.QtCore import Qt, QTimer
+from datetime import datetime
+
+from latency import HISTOGRAM_EDGES_MS
+
+COLUMNS = ["阶段", "次数", "平均(ms)", "P50", "P90", "P99", "最大", "分布"]
+BARS = " ▁▂▃▄▅▆▇█"
+
+def _sparkline(counts):
+    peak = max(counts) if counts else 0
+    if peak == 0:
+        return ""
+    return "".join(BARS[round(c / peak * (len(BARS) - 1))] for c in counts)
+
+class StatsDialog(QDialog):
+    def __init__(self, tracker, cache_stats=None, usage_stats=None, parent=None):
+        super().__init__(parent)
+        self.tracker = tracker
+        self.cache_stats = cache_stats
+        self.usage_stats = usage_stats
+        self._init_ui()
+        self._refresh()
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self._refresh)
+        self.timer.start(1000)
+
+    def _init_ui(self):
+        self.setWindowTitle("延迟统计")
+        self.setMinimumSize(760, 360)
+
+        layout = QVBoxLayout(self)
+        layout.setSpacing(10)
+
+        self.table = QTableWidget(0, len(COLUMNS))
+        self.table.setHorizontalHeaderLabels(COLUMNS)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        edges = ", ".join(str(e) for e in HISTOGRAM_EDGES_MS)
+        self.table.horizontalHeaderItem(len(COLUMNS) - 1).setToolTip(f"区间边界(ms): {edges}, ∞")
+        layout.addWidget(self.table)
+
+        self.cache_label = QLabel()
+        layout.addWidget(self.cache_label)
+        self.usage_label = QLabel()
+        layout.addWidget(self.usage_label)
+        self.router_label = QLabel()
+        self.router_label.setWordWrap(True)
+        layout.addWidget(self.router_label)
+
+        btn_layout = QHBoxLayout()
+        btn_layout.addStretch()
+
+        reset_btn = QPushButton("重置")
+        reset_btn.setFixedWidth(80)
+        reset_btn.clicked.connect(self._on_reset)
+        btn_layout.addWidget(reset_btn)
+
+        export_btn = QPushButton("导出JSON")
+        export_btn.setFixedWidth(80)
+        export_btn.clicked.connect(self._on_export)
+        btn_layout.addWidget(export_btn)
+
+        close_btn = QPushButton("关闭")
+        close_btn.setFixedWidth(80)
+        close_btn.clicked.connect(self.accept)
+        btn_layout.addWidget(close_btn)
+
+        layout.addLayout(btn_layout)
+
+        self.setStyleSheet("""
+            QDialog {
+                background-color: #2b2b2b;
+            }
+            QTableWidget {
+                background-color: #1e1e1e;
+                color: #ffffff;
+                gridline-color: #3c3c3c;
+                border: 1px solid #3c3c3c;
+                border-radius: 6px;
+                font-size: 12px;
+            }
+            QLabel {
+                color: #aaaaaa;
+                font-size: 12px;
+            }
+            QHeaderView::section {
+                background-color: #3c3c3c;
+                color: #ffffff;
+                border: none;
+                padding: 4px;
+            }
+            QPushButton {
+                background-color: #3c3c3c;
+                color: #ffffff;
+                border: none;
+                border-radius: 4px;
+                padding: 8px 16px;
+                font-size: 12px;
+            }
+            QPushButton:hover {
+                background-color: #4a4a4a;
+            }
+            QPushButton:pressed {
+                background-color: #555555;
+            }
+        """)
+
+    def _refresh(self):
+        summary = self.tracker.summary()
+        self.table.setRowCount(len(summary))
+        for row, (metric, stats) in enumerate(summary.items()):
+            values = [
+                metric,
+                str(stats["count"]),
+                f"{stats['mean']:.1f}",
+                f"{stats['p50']:.1f}",
+                f"{stats['p90']:.1f}",
+                f"{stats['p99']:.1f}",
+                f"{stats['max']:.1f}",
+                _sparkline(stats["histogram"])
+            ]
+            for col, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if col > 0:
+                    item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+                self.table.setItem(row, col, item)
+
+        stats = self.cache_stats() if self.cache_stats else None
+        if stats is None:
+            self.cache_label.setText("翻译缓存: 未启用")
+        else:
+            self.cache_label.setText(
+                f"翻译缓存: 命中 {stats['memory_hits'] + stats['disk_hits']} "
+                f"(内存 {stats['memory_hits']} / 磁盘 {stats['disk_hits']}), "
+                f"未命中 {stats['misses']}, 命中率 {stats['hit_rate'] * 100:.1f}%"
+            )
+
+        usage = self.usage_stats() if self.usage_stats else None
+        if usage is None:
+            self.usage_label.setText("")
+            self.router_label.setText("")
+        else:
+            prompt = usage["prompt_tokens"]
+            cached = usage["cached_prompt_tokens"]
+            ratio = cached / prompt * 100 if prompt else 0.0
+            self.usage_label.setText(
+                f"上下文: {usage['context_pairs']} 句, 提示词 {prompt} tokens, "
+                f"前缀缓存命中 {cached} ({ratio:.1f}%), 本地翻译 {usage['backends'].get('local', 0)} 句"
+            )
+            router = usage["router"]
+            states = {"closed": "正常", "open": "熔断", "half_open": "探测"}
+            lines = [
+                f"对冲 {router['hedges']} 次 (备用胜出 {router['hedge_wins']}), 故障转移 {router['failovers']} 次"
+            ]
+            for key, endpoint in router["endpoints"].items():
+                p95 = f"{endpoint['p95'] * 1000:.0f}ms" if endpoint["p95"] is not None else "-"
+                lines.append(
+                    f"{key}: {states.get(endpoint['state'], endpoint['state'])}, 成功 {endpoint['successes']}, "
+                    f"失败 {endpoint['failures']}, p95 {p95}"
+                )
+            for key, limit in usage["rate_limits"].items():
+                queue = ", ".join(f"{name} {count}" for name, count in limit["queue"].items()) or "无"
+                lines.append(
+                    f"限速 {key}: 排队 {queue}, 等待 {limit['throttled']}/{limit['acquired']} 次, "
+                    f"平均 {limit['avg_wait'] * 1000:.0f}ms, 最长 {limit['max_wait'] * 1000:.0f}ms, "
+                    f"429 暂停 {limit['pauses']} 次, 取消 {limit['cancelled']} 次"
+                )
+            self.router_label.setText("\n".join(lines))
+
+    def _on_reset(self):
+        self.tracker.reset()
+        self._refresh()
+
+    def _on_export(self):
+        file_path, _ = QFileDialog.getSaveFileName(
+            self,
+            "导出延迟统计",
+            f"latency_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+            "JSON文件 (*.json)"
+        )
+        if file_path:
+            self.tracker.export_json(file_path)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)